@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Backfill several years of daily market_chart history into the local store.
+
+Walks ``market_chart/range`` backwards in yearly windows for the top coins,
+checkpointing after every batch (``data/raw/backfill.json``), so rerunning
+the same command resumes where the last run stopped. Set
+``CRYPTO_GRAPHS_DROP_DAYS`` to let the drop chart use the longer history.
+"""
+import argparse
+import asyncio
+import logging
+import sys
+from pathlib import Path
+
+# Add the project root to the Python path
+sys.path.append(str(Path(__file__).parent))
+
+from src.utils.backfill import backfill
+from src.utils.coingecko_api import get_client
+from src.utils.markets import fetch_snapshot
+from src.utils.store import MarketChartStore, today_index
+
+async def backfill_top_coins(args):
+    """Backfill the top ``args.coins`` coins; returns how many are not done yet."""
+    client = get_client()
+    snapshot = await fetch_snapshot(client, args.coins)
+    coin_ids = snapshot.table['id'][:args.coins].tolist()
+    start_day = today_index() - int(args.years * 365)
+    max_seconds = args.max_minutes * 60 if args.max_minutes else None
+    store = MarketChartStore()
+    state = await backfill(client, store, coin_ids, start_day, max_seconds=max_seconds)
+    return sum(not state.done(store, coin_id, start_day) for coin_id in coin_ids)
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill daily market_chart history, resumably.")
+    parser.add_argument("--years", type=float, default=5, help="years of history to reach (default 5)")
+    parser.add_argument("--coins", type=int, default=200, help="top coins by market cap to backfill (default 200)")
+    parser.add_argument("--max-minutes", type=float,
+                        help="stop after the batch that passes this many minutes; rerun to resume")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    remaining = asyncio.run(backfill_top_coins(args))
+    if remaining:
+        print(f"{remaining} coins still to backfill; run the same command again to resume")
+    else:
+        print("Backfill complete!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""
+Local stand-in for the CoinGecko API and Yahoo Finance.
+
+``FakeCoinGecko`` is a requests transport adapter: mounted on a
+``CoinGeckoAPI`` session it answers ``coins/markets``, ``market_chart``,
+``market_chart/range`` and ``history`` requests without the network, so the
+real request, cache and rate-limit code paths still run. Payloads are
+synthetic random walks (deterministic per coin) unless a recorded response
+exists under ``fixtures_dir``. Latency and 429 responses can be injected.
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+import pandas as pd
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+from src.utils.store import MS_PER_DAY, today_index
+
+# A few real ids so symbol filters and BTC/ETH lookups behave as in production
+KNOWN_COINS = [
+    ('bitcoin', 'btc'), ('ethereum', 'eth'), ('tether', 'usdt'), ('ripple', 'xrp'),
+    ('binancecoin', 'bnb'), ('solana', 'sol'), ('usd-coin', 'usdc'), ('dogecoin', 'doge'),
+    ('cardano', 'ada'), ('tron', 'trx'), ('staked-ether', 'steth'), ('sui', 'sui'),
+]
+FIRST_DAY = 15_000  # 2011-01-26, before any chart's history window
+
+
+class FakeCoinGecko(BaseAdapter):
+    """
+    Transport adapter serving synthetic or recorded CoinGecko responses.
+
+    Args:
+        n_coins: Size of the coins/markets universe.
+        latency: Seconds to sleep before answering each request.
+        rate_limit_every: Answer every n-th request with a 429 (0 disables).
+        retry_after: ``Retry-After`` header sent with injected 429s.
+        fixtures_dir: Directory of recorded payloads, ``<endpoint>.json``
+            (e.g. ``coins/bitcoin/market_chart.json``), served instead of
+            synthetic data when present.
+        seed: Seed for the synthetic price walks.
+        history_days: Answer requests reaching further back than this many
+            days with the 401 CoinGecko sends for plan-limited ranges.
+        listed: First UTC day with data for some coins, which then answer
+            market_chart requests from that day only.
+    """
+
+    def __init__(self, n_coins: int = 300, latency: float = 0.0, rate_limit_every: int = 0,
+                 retry_after: int = 1, fixtures_dir: Optional[Path] = None, seed: int = 0,
+                 history_days: Optional[int] = None, listed: Optional[Dict[str, int]] = None):
+        super().__init__()
+        self.coins = (KNOWN_COINS + [(f'coin-{i}', f'c{i}') for i in range(n_coins)])[:n_coins]
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.fixtures_dir = Path(fixtures_dir) if fixtures_dir else None
+        self.seed = seed
+        self.history_days = history_days
+        self.listed = listed or {}
+        self.stats = {'requests': 0, 'rate_limited': 0, 'not_modified': 0, 'bytes': 0}
+        self._walks: Dict[str, np.ndarray] = {}
+        self._market: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    def send(self, request: requests.PreparedRequest, **kwargs: Any) -> requests.Response:
+        with self._lock:
+            self.stats['requests'] += 1
+            count = self.stats['requests']
+        if self.latency:
+            time.sleep(self.latency)
+
+        url = urlsplit(request.url)
+        endpoint = url.path.split('/api/v3/', 1)[-1].strip('/')
+        params = dict(parse_qsl(url.query))
+
+        if self.rate_limit_every and count % self.rate_limit_every == 0:
+            with self._lock:
+                self.stats['rate_limited'] += 1
+            return self._response(request, 429, {'status': {'error_code': 429}},
+                                  {'Retry-After': str(self.retry_after)})
+        try:
+            payload = self.payload(endpoint, params)
+        except KeyError as e:
+            return self._response(request, 404, {'error': f'not found: {e}'})
+        except ValueError as e:
+            return self._response(request, 400, {'error': str(e)})
+        except PermissionError as e:
+            return self._response(request, 401, {'error': {'status': {'error_code': 10012,
+                                                                      'error_message': str(e)}}})
+
+        body = json.dumps(payload).encode()
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        if request.headers.get('If-None-Match') == etag:
+            with self._lock:
+                self.stats['not_modified'] += 1
+            return self._response(request, 304, None, {'ETag': etag})
+        with self._lock:
+            self.stats['bytes'] += len(body)
+        return self._response(request, 200, body, {'ETag': etag})
+
+    def close(self) -> None:
+        pass
+
+    def _response(self, request: requests.PreparedRequest, status: int, body: Any,
+                  headers: Optional[Dict[str, str]] = None) -> requests.Response:
+        response = requests.Response()
+        response.status_code = status
+        response._content = body if isinstance(body, bytes) else json.dumps(body).encode() if body else b''
+        response.headers = CaseInsensitiveDict({'Content-Type': 'application/json', **(headers or {})})
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        return response
+
+    # Payloads
+
+    def payload(self, endpoint: str, params: Dict[str, str]) -> Any:
+        """Return the JSON payload for a request: a recorded fixture or synthetic data."""
+        if self.fixtures_dir is not None:
+            path = self.fixtures_dir / f"{endpoint}.json"
+            if path.exists():
+                return json.loads(path.read_text())
+
+        if endpoint == 'coins/markets':
+            return self.markets(int(params.get('per_page', 100)), int(params.get('page', 1)))
+        match = re.fullmatch(r'coins/([^/]+)/(market_chart/range|market_chart|history)', endpoint)
+        if not match:
+            raise KeyError(endpoint)
+        coin_id, kind = match.groups()
+        if coin_id not in dict(self.coins):
+            raise KeyError(coin_id)
+        if kind == 'history':
+            return self.history(coin_id, params['date'])
+        oldest_ms = (int(params['from']) * 1000 if kind == 'market_chart/range'
+                     else (today_index() - int(params.get('days', 0))) * MS_PER_DAY)
+        if self.history_days is not None and oldest_ms < (today_index() - self.history_days) * MS_PER_DAY:
+            raise PermissionError(f"Your request exceeds the allowed time range. Limited to querying "
+                                  f"historical data within the past {self.history_days} days.")
+        if kind == 'market_chart':
+            now_ms = int(time.time() * 1000)
+            days = np.arange(today_index() - int(params['days']), today_index() + 1)
+            return self.market_chart(coin_id, np.append(days * MS_PER_DAY, now_ms))
+        start, end = int(params['from']) * 1000, int(params['to']) * 1000
+        # CoinGecko returns hourly points for ranges up to 90 days, daily beyond
+        step = 3_600_000 if end - start <= 90 * MS_PER_DAY else MS_PER_DAY
+        return self.market_chart(coin_id, np.arange(start - start % step + step, end + 1, step))
+
+    def markets(self, per_page: int, page: int) -> List[Dict[str, Any]]:
+        now = np.array([time.time() / 86_400])
+        listing = []
+        for rank, (coin_id, symbol) in enumerate(self.coins[(page - 1) * per_page: page * per_page],
+                                                 start=(page - 1) * per_page + 1):
+            price = float(self.prices(coin_id, now)[0])
+            listing.append({'id': coin_id, 'symbol': symbol, 'name': coin_id.replace('-', ' ').title(),
+                            'current_price': price, 'market_cap': price * self._supply(coin_id, rank),
+                            'market_cap_rank': rank})
+        return listing
+
+    def market_chart(self, coin_id: str, timestamps_ms: np.ndarray) -> Dict[str, List[List[float]]]:
+        if coin_id in self.listed:
+            timestamps_ms = timestamps_ms[timestamps_ms >= self.listed[coin_id] * MS_PER_DAY]
+        prices = self.prices(coin_id, timestamps_ms / MS_PER_DAY)
+        rank = [coin for coin, _ in self.coins].index(coin_id) + 1
+        caps = prices * self._supply(coin_id, rank)
+        ts = timestamps_ms.astype(np.int64).tolist()
+        return {'prices': [list(pair) for pair in zip(ts, prices.tolist())],
+                'market_caps': [list(pair) for pair in zip(ts, caps.tolist())],
+                'total_volumes': [list(pair) for pair in zip(ts, (caps * 0.05).tolist())]}
+
+    def history(self, coin_id: str, date: str) -> Dict[str, Any]:
+        match = re.fullmatch(r'(\d{2})-(\d{2})-(\d{4})', date)
+        if not match:
+            raise ValueError(f"invalid date {date!r}, expected dd-mm-yyyy")
+        day, month, year = (int(part) for part in match.groups())
+        day_index = (pd.Timestamp(year=year, month=month, day=day) - pd.Timestamp(0)).days
+        price = float(self.prices(coin_id, np.array([float(day_index)]))[0])
+        return {'id': coin_id, 'market_data': {'current_price': {'usd': price}}}
+
+    def prices(self, coin_id: str, days: np.ndarray) -> np.ndarray:
+        """Price at fractional UTC day numbers, interpolated along the coin's daily walk."""
+        walk = self._walk(coin_id)
+        return np.exp(np.interp(days, np.arange(FIRST_DAY, FIRST_DAY + len(walk)), walk))
+
+    def _walk(self, coin_id: str) -> np.ndarray:
+        """Daily log prices: a shared market factor plus coin-specific noise, so crashes happen together."""
+        with self._lock:
+            n_days = today_index() + 2 - FIRST_DAY
+            if self._market is None:
+                self._market = np.random.default_rng(self.seed).normal(0.0005, 0.035, n_days)
+            if coin_id not in self._walks:
+                rng = np.random.default_rng([self.seed, zlib.crc32(coin_id.encode())])
+                steps = rng.uniform(0.8, 1.5) * self._market + rng.normal(0, 0.02, n_days)
+                self._walks[coin_id] = np.log(rng.uniform(0.01, 1000)) + np.cumsum(steps)
+            return self._walks[coin_id]
+
+    def _supply(self, coin_id: str, rank: int) -> float:
+        # Roughly rank-ordered market caps: about $1T / rank at the coin's starting price
+        return 1e12 / rank / float(np.exp(self._walk(coin_id)[0]))
+
+
+def fake_closes(symbols: Sequence[str], start: str, seed: int = 0) -> pd.DataFrame:
+    """Synthetic batched ``yf.download`` closes: business days since ``start`` x symbols."""
+    index = pd.date_range(start, pd.Timestamp.now().normalize(), freq='B')
+    columns = {}
+    for symbol in symbols:
+        rng = np.random.default_rng([seed, zlib.crc32(symbol.encode())])
+        columns[symbol] = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.01, len(index))))
+    return pd.DataFrame(columns, index=index)
+
+
+def install(api: Any, adapter: FakeCoinGecko) -> Tuple[Any, Any]:
+    """
+    Route ``api``'s session and the yfinance downloads to the fakes.
+
+    Returns ``(adapter, original_download)`` so callers can restore Yahoo
+    downloads with ``yahoo._download_closes = original_download``.
+    """
+    from src.utils import yahoo
+
+    api.session.mount('https://', adapter)
+    api.session.mount('http://', adapter)
+    original = yahoo._download_closes
+    yahoo._download_closes = fake_closes
+    return adapter, original
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Time each chart's fetch, parse, compute and render stages against a local
+CoinGecko/yfinance stand-in.
+
+Every chart is run ``--repeat`` times in two scenarios: ``cold`` starts from
+an empty data directory (every request goes to the fake API), ``warm`` reuses
+the store and response cache left by the cold run. Charts write into a
+scratch directory, never into public/charts. Results are written as JSON.
+
+Usage:
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --repeat 5 --latency 0.05 --rate-limit-every 40
+"""
+import argparse
+import asyncio
+import contextlib
+import importlib
+import io
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+STAGES = ["fetch", "parse", "compute", "render", "total"]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--charts", nargs="+", help="registered chart names to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per chart and scenario")
+    parser.add_argument("--coins", type=int, default=300, help="size of the fake coins/markets universe")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every fake response")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="answer every n-th request with a 429")
+    parser.add_argument("--calls-per-minute", type=float, default=1e6,
+                        help="client rate limit (the real Demo quota is 30)")
+    parser.add_argument("--fixtures", type=Path, help="directory of recorded <endpoint>.json payloads")
+    parser.add_argument("--output", type=Path, help="JSON results file (default: logs/benchmark.json)")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch directory")
+    parser.add_argument("--verbose", action="store_true", help="show chart output and logging")
+    return parser.parse_args()
+
+
+def clear_data(raw_dir: Path) -> None:
+    """Delete stored responses and history but keep the directory layout."""
+    for path in raw_dir.rglob("*"):
+        if path.is_file():
+            path.unlink()
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def run_once(chart: Any, args: argparse.Namespace) -> Dict[str, Any]:
+    """Fetch and render one chart, returning per-stage seconds and request counts."""
+    from benchmarks.fake_coingecko import FakeCoinGecko, install
+    from src.utils import scheduler, yahoo
+    from src.utils.coingecko_api import AsyncCoinGeckoClient, CoinGeckoAPI
+    from src.utils.timing import stage_timings
+
+    adapter = FakeCoinGecko(n_coins=args.coins, latency=args.latency,
+                            rate_limit_every=args.rate_limit_every, fixtures_dir=args.fixtures)
+    api = CoinGeckoAPI(calls_per_minute=args.calls_per_minute)
+    _, original_download = install(api, adapter)
+    client = AsyncCoinGeckoClient(api)
+    needs = chart.data_needs()
+    output = io.StringIO()
+    error = ""
+    stage_timings()
+
+    start = time.perf_counter()
+    fetched = None
+    try:
+        results, errors = asyncio.run(scheduler.fetch_all(needs.values(), client))
+        fetched = time.perf_counter()
+        if errors:
+            error = "; ".join(sorted(set(errors.values())))
+        else:
+            data = {key: results[need] for key, need in needs.items()}
+            with contextlib.redirect_stdout(sys.stdout if args.verbose else output):
+                chart.render_chart(data)
+    except (Exception, SystemExit) as e:
+        fetched = fetched or time.perf_counter()
+        error = error or f"{type(e).__name__}: {e}"
+    finally:
+        yahoo._download_closes = original_download
+    total = time.perf_counter() - start
+
+    stages = {"fetch": fetched - start, "total": total}
+    stages.update(stage_timings())
+    return {"stages": stages, "error": error, **adapter.stats}
+
+
+def summarize(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Collapse repeated runs into min/median/max seconds per stage."""
+    stages = {}
+    for name in STAGES:
+        samples = [run["stages"][name] for run in runs if name in run["stages"]]
+        if samples:
+            stages[name] = {"min": min(samples), "median": statistics.median(samples), "max": max(samples)}
+    last = runs[-1]
+    return {
+        "runs": len(runs),
+        "stages": stages,
+        "requests": last["requests"],
+        "bytes": last["bytes"],
+        "rate_limited": last["rate_limited"],
+        "not_modified": last["not_modified"],
+        "errors": sorted({run["error"] for run in runs if run["error"]}),
+    }
+
+
+def print_table(results: List[Dict[str, Any]]) -> None:
+    header = f"{'chart':<36} {'scenario':<8}" + "".join(f"{name:>9}" for name in STAGES) + f"{'requests':>10}"
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        cells = "".join(f"{result['stages'][name]['median']:>9.3f}" if name in result["stages"] else f"{'-':>9}"
+                        for name in STAGES)
+        flag = "  FAILED" if result["errors"] else ""
+        print(f"{result['chart']:<36} {result['scenario']:<8}{cells}{result['requests']:>10}{flag}")
+    print("(median seconds per stage)")
+
+
+def main() -> int:
+    args = parse_args()
+    workdir = Path(tempfile.mkdtemp(prefix="crypto-graphs-bench-"))
+    # Must be set before src.config is imported so every store and cache lands in the scratch copy
+    os.environ["CRYPTO_GRAPHS_DATA_DIR"] = str(workdir / "data")
+    (workdir / "public" / "charts").mkdir(parents=True)
+    os.chdir(workdir)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    from src.charts.registry import select
+    from src.config import LOG_DIR, RAW_DATA_DIR
+
+    results = []
+    try:
+        for chart in select(args.charts):
+            module = importlib.import_module(chart.module)
+            module.HTML_FILE = str(workdir / "public" / "charts" / Path(module.HTML_FILE).name)
+            runs: Dict[str, List[Dict[str, Any]]] = {"cold": [], "warm": []}
+            for _ in range(args.repeat):
+                clear_data(RAW_DATA_DIR)
+                runs["cold"].append(run_once(chart, args))
+                runs["warm"].append(run_once(chart, args))
+            for scenario, scenario_runs in runs.items():
+                results.append({"chart": chart.name, "scenario": scenario, **summarize(scenario_runs)})
+    finally:
+        os.chdir(ROOT)
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    import numpy as np
+    import pandas as pd
+    import plotly
+
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "versions": {"numpy": np.__version__, "pandas": pd.__version__, "plotly": plotly.__version__},
+        "settings": {key: str(value) if isinstance(value, Path) else value
+                     for key, value in vars(args).items() if key not in ("output", "keep", "verbose")},
+        "results": results,
+    }
+    output = args.output or LOG_DIR / "benchmark.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print_table(results)
+    print(f"Results written to {output}")
+    if args.keep:
+        print(f"Scratch directory kept at {workdir}")
+    return 1 if any(result["errors"] for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,36 +1,60 @@
 #!/usr/bin/env python3
 """
 Script to run all chart generation scripts.
+
+Data shared by several charts is fetched once, then the charts are rendered
+in parallel worker processes. A failing chart does not stop the others.
+Charts come from ``src/charts/registry.py`` and only the selected ones are
+imported.
 """
+import argparse
 import sys
 import logging
 from pathlib import Path
 
-# Add src directory to Python path
-src_dir = Path(__file__).parent / "src"
-sys.path.append(str(src_dir))
+# Add the project root to the Python path
+sys.path.append(str(Path(__file__).parent))
 
-from charts import crypto_performance, trump_election, liberation_day_performance
+from src.charts.registry import CHARTS, select
 
 def main():
+    parser = argparse.ArgumentParser(description="Generate all charts.")
+    parser.add_argument("--only", nargs="+", metavar="CHART",
+                        help="render only these charts (see --list)")
+    parser.add_argument("--list", action="store_true", help="list the registered charts and exit")
+    parser.add_argument("--offline", action="store_true",
+                        help="replay cached API responses and stored data without network access")
+    parser.add_argument("--incremental", action="store_true",
+                        help="add today's point from coins/markets to stored series instead of recomputing")
+    args = parser.parse_args()
+    if args.list:
+        for chart in CHARTS:
+            print(f"{chart.name:<30} {chart.description}")
+        return
     try:
-        # Run crypto performance chart
-        print("Generating crypto performance chart...")
-        crypto_performance.main()
-        
-        # Run Trump election chart
-        print("Generating Trump election chart...")
-        trump_election.main()
-        
-        # Run Liberation Day performance chart
-        print("Generating Liberation Day performance chart...")
-        liberation_day_performance.generate_liberation_day_chart()
-        
-        print("All charts generated successfully!")
-        
-    except Exception as e:
-        logging.error(f"Error generating charts: {e}")
+        charts = select(args.only)
+    except ValueError as e:
+        parser.error(str(e))
+
+    # Deferred so --help and --list stay instant
+    from src.utils.http_cache import set_offline
+    from src.utils.incremental import set_incremental
+    from src.utils.scheduler import run_charts
+
+    if args.offline:
+        set_offline(True)
+    if args.incremental:
+        set_incremental(True)
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    results = run_charts(charts)
+    if not all(result.ok for result in results):
+        logging.error("Some charts failed to generate")
         sys.exit(1)
+    print("All charts generated successfully!")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -1,150 +1,210 @@
-import requests
-import time
-import pandas as pd
 import numpy as np
 import plotly.graph_objs as go
-import json
 import os
+import sys
 
-BASE_URL = "https://api.coingecko.com/api/v3"
-CACHE_FILE = "historical_data.json"
-HTML_FILE = "public/charts/crypto_performance.html"
-API_KEY = os.getenv("COINGECKO_API_KEY", "CG-1KR3Wbo6yQfvUD9EHQoeECet")  # Fallback for local runs
-
-def fetch_top_coins(limit=200):
-    url = f"{BASE_URL}/coins/markets"
-    headers = {"x-cg-demo-api-key": API_KEY}
-    params = {"vs_currency": "usd", "order": "market_cap_desc", "per_page": limit, "page": 1, "sparkline": False}
-    response = requests.get(url, params=params, headers=headers)
-    if response.status_code == 200:
-        return [coin["id"] for coin in response.json()]
-    print(f"Failed to fetch top coins: {response.status_code}")
-    return []
-
-def fetch_historical_data(coin_id, days=365):
-    url = f"{BASE_URL}/coins/{coin_id}/market_chart"
-    headers = {"x-cg-demo-api-key": API_KEY}
-    params = {"vs_currency": "usd", "days": days, "interval": "daily"}
-    try:
-        response = requests.get(url, params=params, headers=headers)
-        response.raise_for_status()
-        data = response.json()
-        prices = data.get("prices", [])
-        market_caps = data.get("market_caps", [])
-        if not prices or not market_caps:
-            print(f"No data found for {coin_id}")
-        return prices, market_caps
-    except requests.exceptions.HTTPError as e:
-        print(f"Failed to fetch data for {coin_id}: {e}")
-        return [], []
-
-def save_to_cache(data):
-    with open(CACHE_FILE, 'w') as f:
-        json.dump(data, f)
-    print(f"Data saved to {CACHE_FILE}")
+# Add the project root to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-def main():
-    # Fetch fresh data
-    print("Fetching list of top 200 coins...")
-    top_coins = fetch_top_coins(limit=200)
+from src.config import CHART_ZOOM_TIERS, DROP_DAYS
+from src.utils.chart_output import write_chart
+from src.utils.downsample import ZOOM_SCRIPT, trace_points
+from src.utils.events import DropIndex, average_performance, bootstrap_mean_ci, event_windows, percentile_bands
+from src.utils.incremental import daily_series
+from src.utils.matrix import DayMatrix, from_store
+from src.utils.scheduler import DataNeed, fetch_needs
+from src.utils.store import MarketChartStore, today_index
+from src.utils.timing import stage
+
+HTML_FILE = "public/charts/crypto_performance.html"
+STORE = MarketChartStore()
+TOP_COINS = 200
+DAYS = DROP_DAYS  # longer than a year once backfill.py has filled the store
+
+SERIES_COLUMNS = ['bitcoin', 'ethereum', 'total3', 'total']
+# Stored series: BTC/ETH prices, then one market cap column per listed coin
+PRICE_COLUMNS = ['price:bitcoin', 'price:ethereum']
+
+# Drop definitions published as a dropdown; DEFAULT_VARIANT is shown first
+THRESHOLDS = (0.05, 0.10, 0.20)
+LOOKBACKS = (3, 7, 14)
+DEFAULT_VARIANT = (0.10, 7)
+HORIZON = 90
+ASSETS = (('BTC', (255, 165, 0)), ('ETH', (128, 0, 128)), ('TOTAL3', (0, 0, 255)))
+
+# Spread around the average: bootstrap interval of the mean (shown) and the
+# interquartile fan with the median (in the legend, off until clicked)
+CONFIDENCE = 0.90
+BOOTSTRAP_RESAMPLES = 2000
+FAN = (25, 50, 75)
+
+def data_needs():
+    """Daily history for the top 200 coins, kept up to date in the local store."""
+    return {
+        "markets": DataNeed.of("markets", limit=TOP_COINS),
+        "coins": DataNeed.of("market_chart", limit=TOP_COINS, days=DAYS),
+    }
+
+def load_market_data(coin_ids, days=365):
+    """Return days x coins market cap and BTC/ETH price matrices from the store."""
+    market_caps = from_store(STORE, coin_ids, days, "market_caps")
+    prices = from_store(STORE, ['bitcoin', 'ethereum'], days, "prices")
+    missing = ~market_caps.mask.any(axis=0)
+    if missing.any():
+        print(f"No data found for {np.count_nonzero(missing)} coins")
+    return market_caps, prices
+
+def daily_totals(coin_ids, markets):
+    """
+    Days x [BTC price, ETH price, TOTAL3, total market cap] over the last DAYS days.
+
+    The stored series keeps each listed coin's market cap, keyed on the top-N
+    rule rather than the coins, so a coin entering or leaving the top 200
+    only loads or drops its own column. In incremental mode only today's row
+    is added, from the coins/markets listing.
+    """
+    columns = PRICE_COLUMNS + list(coin_ids)
+
+    def load_caps(ids, days):
+        caps = from_store(STORE, ids, today_index() - int(days[0]), "market_caps").ffill()
+        return caps.values[np.searchsorted(caps.days, days)]
+
+    def compute():
+        market_caps, prices = load_market_data(coin_ids, days=DAYS)
+        # Interior gaps are forward-filled rather than zeroed
+        values = np.column_stack([prices.column('bitcoin'), prices.column('ethereum'), market_caps.ffill().values])
+        return DayMatrix(market_caps.days, columns, values), {}
+
+    def latest(series, extras):
+        table = markets.table[np.isin(markets.table['id'], coin_ids)]
+        price = dict(zip(table['id'].tolist(), table['price'].tolist()))
+        cap = dict(zip(table['id'].tolist(), table['market_cap'].tolist()))
+        row = np.array([price.get('bitcoin', np.nan), price.get('ethereum', np.nan)]
+                       + [cap.get(coin_id, np.nan) for coin_id in coin_ids])
+        # A coin without a current market cap keeps its last value, as the forward fill would
+        earlier = series.values[series.days < today_index()]
+        return np.where(np.isnan(row), earlier[-1], row) if len(earlier) else row
+
+    series, _ = daily_series("crypto_performance", {"top": TOP_COINS, "days": DAYS}, compute, latest,
+                             columns=columns, load_columns=load_caps)
+    series = series.since(today_index() - DAYS)
+    caps = series.select(list(coin_ids))
+    values = np.column_stack([series.column('price:bitcoin'), series.column('price:ethereum'),
+                              caps.total(exclude=['bitcoin', 'ethereum']), caps.total()])
+    return DayMatrix(series.days, SERIES_COLUMNS, values)
+
+def rgba(rgb, alpha=1.0):
+    return f"rgba({rgb[0]}, {rgb[1]}, {rgb[2]}, {alpha})"
+
+def band_trace(x, lower, upper, name, fillcolor, **kwargs):
+    """A shaded band between two lines, drawn as one closed shape over the days where both exist."""
+    keep = np.isfinite(lower) & np.isfinite(upper)
+    return go.Scatter(x=np.concatenate([x[keep], x[keep][::-1]]),
+                      y=np.round(np.concatenate([upper[keep], lower[keep][::-1]]), 2),
+                      fill='toself', fillcolor=fillcolor, line=dict(width=0), mode='lines',
+                      name=name, hoverinfo='skip', **kwargs)
+
+def variant_traces(variant_stats):
+    """Traces for one drop definition: per asset its average, confidence band, median and quartile fan."""
+    days = np.arange(HORIZON + 1)
+    lower, upper = variant_stats["ci"]
+    q1, median, q3 = variant_stats["fan"]
+    traces = []
+    for col, (name, rgb) in enumerate(ASSETS):
+        fan = f"{name} median & quartiles"
+        traces += [
+            band_trace(days, lower[:, col], upper[:, col], f"{name} {CONFIDENCE:.0%} CI", rgba(rgb, 0.15),
+                       legendgroup=name, showlegend=False),
+            go.Scatter(**trace_points(days, np.round(variant_stats["mean"][:, col], 2)), mode='lines',
+                       name=name, line=dict(color=rgba(rgb)), legendgroup=name),
+            band_trace(days, q1[:, col], q3[:, col], fan, rgba(rgb, 0.08),
+                       legendgroup=fan, showlegend=False, visible='legendonly'),
+            go.Scatter(**trace_points(days, np.round(median[:, col], 2)), mode='lines', name=fan,
+                       line=dict(color=rgba(rgb), dash='dot'), legendgroup=fan, visible='legendonly'),
+        ]
+    return traces
+
+def drop_title(threshold, lookback):
+    """Chart title for one drop definition."""
+    years = DAYS / 365
+    period = "1 Year" if years == 1 else f"{years:g} Years"
+    return f"Average Performance After >{threshold:.0%} Market Cap Drop in {lookback} Days ({period})"
+
+def render(data):
+    """Compute the drop events from stored history and write the chart."""
+    top_coins = data["coins"]
     if not top_coins:
         print("No top coins fetched. Exiting.")
         exit()
 
-    historical_data = {}
-    for coin in top_coins:
-        print(f"Fetching data for {coin}...")
-        prices, market_caps = fetch_historical_data(coin, days=365)
-        historical_data[coin] = {'prices': prices, 'market_caps': market_caps}
-        time.sleep(2)  # 2-second delay
- 
-    save_to_cache(historical_data)
-
-    # Process market cap data
-    market_cap_dfs = []
-    for coin in historical_data.keys():
-        market_caps = historical_data[coin]['market_caps']
-        if market_caps:
-            df = pd.DataFrame(market_caps, columns=['timestamp', 'market_cap'])
-            df['date'] = pd.to_datetime(df['timestamp'], unit='ms').dt.date
-            df = df.groupby('date')['market_cap'].mean().rename(coin)
-            market_cap_dfs.append(df)
-
-    market_cap_df = pd.concat(market_cap_dfs, axis=1).fillna(0)
-    total_market_cap = market_cap_df.sum(axis=1)
-
-    if 'bitcoin' in market_cap_df.columns and 'ethereum' in market_cap_df.columns:
-        total3 = total_market_cap - market_cap_df['bitcoin'] - market_cap_df['ethereum']
-    else:
-        total3 = total_market_cap
-
-    # Process BTC and ETH prices
-    btc_prices = historical_data['bitcoin']['prices']
-    df_btc = pd.DataFrame(btc_prices, columns=['timestamp', 'price'])
-    df_btc['date'] = pd.to_datetime(df_btc['timestamp'], unit='ms').dt.date
-    df_btc = df_btc.groupby('date')['price'].mean().rename('btc_price')
-
-    eth_prices = historical_data['ethereum']['prices']
-    df_eth = pd.DataFrame(eth_prices, columns=['timestamp', 'price'])
-    df_eth['date'] = pd.to_datetime(df_eth['timestamp'], unit='ms').dt.date
-    df_eth = df_eth.groupby('date')['price'].mean().rename('eth_price')
-
-    price_df = pd.concat([df_btc, df_eth], axis=1)
-
-    # Identify drop events
-    total_market_cap_pct_change = total_market_cap.pct_change(periods=7)
-    drop_dates = total_market_cap_pct_change[total_market_cap_pct_change < -0.10].index
-
-    # Calculate performance
-    btc_performances = []
-    eth_performances = []
-    total3_performances = []
-
-    for drop_date in drop_dates:
-        if isinstance(drop_date, pd.Timestamp):
-            drop_date = drop_date.date()
-        end_date = pd.Timestamp(drop_date) + pd.DateOffset(days=90)
-        if end_date.date() <= price_df.index.max() and drop_date in price_df.index:
-            btc_perf = (price_df['btc_price'].loc[drop_date:] / price_df['btc_price'].loc[drop_date] - 1) * 100
-            eth_perf = (price_df['eth_price'].loc[drop_date:] / price_df['eth_price'].loc[drop_date] - 1) * 100
-            total3_perf = (total3.loc[drop_date:] / total3.loc[drop_date] - 1) * 100
-            btc_perf = btc_perf.head(90).reset_index(drop=True)
-            eth_perf = eth_perf.head(90).reset_index(drop=True)
-            total3_perf = total3_perf.head(90).reset_index(drop=True)
-            btc_performances.append(btc_perf)
-            eth_performances.append(eth_perf)
-            total3_performances.append(total3_perf)
+    with stage("parse"):
+        totals = daily_totals(top_coins, data["markets"])
+
+    with stage("compute"):
+        total_market_cap = totals.column('total')
+        matrix = np.column_stack([totals.column('bitcoin'), totals.column('ethereum'), totals.column('total3')])
+
+        # Drop events for every variant from one index: a fall of more than the
+        # threshold over the lookback, merged per crash, Day 0 = lowest point
+        events = DropIndex(total_market_cap, LOOKBACKS).grid(THRESHOLDS, LOOKBACKS, horizon=HORIZON)
+        print(f"Found {len(events[DEFAULT_VARIANT])} drop events")
+
+        # Calculate performance, with its spread across events
+        stats = {}
+        for variant, day0 in events.items():
+            windows = event_windows(matrix, day0, horizon=HORIZON)
+            stats[variant] = {
+                "mean": average_performance(windows),
+                "ci": bootstrap_mean_ci(windows, CONFIDENCE, BOOTSTRAP_RESAMPLES),
+                "fan": percentile_bands(windows, FAN),
+            }
 
     # Plot results
-    if btc_performances:
-        avg_btc_performance = pd.concat(btc_performances, axis=1).mean(axis=1)
-        avg_eth_performance = pd.concat(eth_performances, axis=1).mean(axis=1)
-        avg_total3_performance = pd.concat(total3_performances, axis=1).mean(axis=1)
-
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(x=avg_btc_performance.index, y=avg_btc_performance.round(2), mode='lines', name='BTC', line=dict(color='orange')))
-        fig.add_trace(go.Scatter(x=avg_eth_performance.index, y=avg_eth_performance.round(2), mode='lines', name='ETH', line=dict(color='purple')))
-        fig.add_trace(go.Scatter(x=avg_total3_performance.index, y=avg_total3_performance.round(2), mode='lines', name='TOTAL3', line=dict(color='blue')))
-        fig.update_layout(
-            title="Average Performance After >10% Market Cap Drop (1 Year)",
-            xaxis_title="Days After Drop",
-            yaxis_title="Percentage Change (%)",
-            legend_title="Assets",
-            template="simple_white",
-            showlegend=True,
-            hovermode='x unified'
-        )
-        fig.write_html(
-            HTML_FILE,
-            include_plotlyjs='cdn',  # Use CDN version of plotly.js
-            full_html=True,
-            include_mathjax=False,
-            validate=False,
-            config={'displayModeBar': False}  # Hide the mode bar
-        )
-        print(f"Chart saved to {HTML_FILE}")
+    if len(events[DEFAULT_VARIANT]):
+        with stage("render"):
+            fig = go.Figure()
+            buttons = []
+            variants = list(stats)
+            shown = []  # visibility of each trace when its variant is selected
+            for variant in variants:
+                traces = variant_traces(stats[variant])
+                shown.append([True if trace.visible is None else trace.visible for trace in traces])
+                for trace in traces:
+                    if variant != DEFAULT_VARIANT:
+                        trace.visible = False
+                    fig.add_trace(trace)
+            for i, (threshold, lookback) in enumerate(variants):
+                visible = [flag if j == i else False for j, flags in enumerate(shown) for flag in flags]
+                label = f"{threshold:.0%} over {lookback}d ({len(events[threshold, lookback])} events)"
+                buttons.append(dict(label=label, method='update',
+                                    args=[{'visible': visible}, {'title': drop_title(threshold, lookback)}]))
+            fig.update_layout(
+                title=drop_title(*DEFAULT_VARIANT),
+                xaxis_title="Days After Drop",
+                yaxis_title="Percentage Change (%)",
+                legend_title="Assets",
+                template="simple_white",
+                showlegend=True,
+                hovermode='x unified',
+                updatemenus=[dict(buttons=buttons, active=variants.index(DEFAULT_VARIANT),
+                                  x=1.0, xanchor='right', y=1.12, yanchor='top')]
+            )
+            written = write_chart(
+                fig,
+                HTML_FILE,
+                include_plotlyjs='cdn',  # Use CDN version of plotly.js
+                full_html=True,
+                include_mathjax=False,
+                validate=False,
+                config={'displayModeBar': False},  # Hide the mode bar
+                post_script=ZOOM_SCRIPT if CHART_ZOOM_TIERS else None
+            )
+        print(f"Chart saved to {HTML_FILE}" if written else f"{HTML_FILE} unchanged")
     else:
         print("No drop events found with sufficient data.")
 
+def main():
+    render(fetch_needs(data_needs()))
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,259 @@
+"""
+"Asset performance since <event>" line charts, defined by configuration.
+
+An ``EventChart`` names the anchor date, the coins (by symbol, picked from
+the top of the coins/markets listing) and the Yahoo Finance symbols to
+compare. ``data_needs`` and ``render`` plug into the scheduler like a chart
+module, and the % changes come from ``src.utils.performance.since``.
+"""
+import os
+import sys
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+# Add the project root to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.config import CHART_ZOOM_TIERS
+from src.utils.chart_output import write_chart
+from src.utils.downsample import ZOOM_SCRIPT, trace_points
+from src.utils.incremental import daily_series
+from src.utils.matrix import DayMatrix, from_store
+from src.utils.performance import base_values, percent_change, since
+from src.utils.scheduler import DataNeed
+from src.utils.store import MarketChartStore, today_index
+from src.utils.timing import stage
+
+CHARTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                          'public', 'charts')
+STORE = MarketChartStore()
+
+TRADITIONAL_COLORS = {
+    'S&P 500': '#2E86C1',
+    'Nasdaq 100': '#2874A6',
+    'Gold': '#F1C40F',
+}
+CRYPTO_COLORS = ['#E74C3C', '#27AE60', '#8E44AD', '#F39C12', '#16A085',
+                 '#D35400', '#2980B9', '#C0392B', '#1ABC9C', '#7D3C98']
+
+
+def history_days(start_date: datetime) -> int:
+    """Number of days of CoinGecko history needed to cover start_date."""
+    # 'days' param for Coingecko is "Data up to 'days' ago from today"
+    delta_days = (datetime.now().date() - start_date.date()).days
+    if delta_days < 0:
+        # start_date is in the future; the single day fetched is dropped as before the anchor
+        return 1
+    # Fetch one more day to increase chance of getting start_date
+    return delta_days + 2
+
+
+def day_number(date: datetime) -> int:
+    return (date.date() - datetime(1970, 1, 1).date()).days
+
+
+@dataclass(frozen=True)
+class EventChart:
+    """
+    A performance-since-anchor chart.
+
+    Args:
+        name: Output file stem under public/charts.
+        title: Chart title.
+        anchor: Event date every series is normalized to.
+        coin_symbols: Coin symbols to plot, in listing order.
+        listing_size: Ranked coins to search for ``coin_symbols``.
+        traditional: ``(yfinance symbol, label)`` pairs.
+    """
+    name: str
+    title: str
+    anchor: datetime
+    coin_symbols: Tuple[str, ...] = ()
+    listing_size: int = 20
+    traditional: Tuple[Tuple[str, str], ...] = ()
+
+    @property
+    def html_file(self) -> str:
+        return os.path.join(CHARTS_DIR, f"{self.name}.html")
+
+    def data_needs(self) -> Dict[str, DataNeed]:
+        """Crypto listing and daily history, plus Yahoo Finance closes for traditional assets."""
+        needs = {}
+        if self.coin_symbols:
+            needs["markets"] = DataNeed.of("markets", limit=self.listing_size)
+            needs["coins"] = DataNeed.of("market_chart", limit=self.listing_size, symbols=self.coin_symbols,
+                                         days=history_days(self.anchor))
+        if self.traditional:
+            # Start a few days early so a weekend or holiday anchor still has a close before it
+            buffer_start = self.anchor - timedelta(days=5)
+            needs["traditional"] = DataNeed.of("yfinance", symbols=tuple(symbol for symbol, _ in self.traditional),
+                                               start=buffer_start.strftime('%Y-%m-%d'))
+        return needs
+
+    def traditional_performance(self, closes: DayMatrix) -> DayMatrix:
+        """% change since the anchor per traditional asset, forward-filled over non-trading days."""
+        anchor_day = day_number(self.anchor)
+        labels = dict(self.traditional)
+        after = closes.since(anchor_day).mask
+        for symbol, observed in zip(closes.columns, after.T):
+            if not observed.any():
+                print(f"  Warning: No data available for {labels[symbol]}")
+            elif not observed[0]:
+                print(f"  Warning: No data for {labels[symbol]} on the anchor date. Using first available data point.")
+        pct = since(closes, anchor_day).select([s for s, observed in zip(closes.columns, after.T) if observed.any()])
+        return DayMatrix(pct.days, [labels[symbol] for symbol in pct.columns], pct.values)
+
+    def crypto_performance(self, markets: Any, store: Optional[MarketChartStore] = None) -> DayMatrix:
+        """
+        % change since the anchor for the listed coins among ``coin_symbols``.
+
+        In incremental mode the stored series only gets today's row, from the
+        listing's current prices and the stored anchor prices.
+        """
+        coins = markets.select(limit=self.listing_size, symbols=self.coin_symbols)
+        ids = coins.table['id'].tolist()
+        print(f"Filtered coins: {coins.table['symbol'].tolist()}")
+        anchor_day = day_number(self.anchor)
+
+        def compute():
+            prices = from_store(store or STORE, ids, history_days(self.anchor))
+            return since(prices, anchor_day), {"base": base_values(prices, anchor_day)}
+
+        def latest(series, extras):
+            # A coin without a current price keeps its last value, as the forward fill would
+            row = percent_change(extras["base"], coins.table['price'])
+            earlier = series.values[series.days < today_index()]
+            if len(earlier):
+                row = np.where(np.isnan(row), earlier[-1], row)
+            return row
+
+        pct, _ = daily_series(f"{self.name}_crypto", {"anchor": anchor_day, "coins": ids}, compute, latest)
+        symbols = dict(zip(ids, (symbol.upper() for symbol in coins.table['symbol'].tolist())))
+        has_data = ~np.isnan(pct.values).all(axis=0)
+        for coin_id in np.asarray(pct.columns)[~has_data]:
+            print(f"  Warning: No data for {symbols[coin_id]} on or after the anchor date.")
+        kept = [coin_id for coin_id, ok in zip(pct.columns, has_data) if ok]
+        pct = pct.select(kept)
+        return DayMatrix(pct.days, [symbols[coin_id] for coin_id in kept], pct.values)
+
+    def render(self, data: Dict[str, Any], html_file: Optional[str] = None) -> str:
+        """Compute every series since the anchor and write the chart; returns the HTML path."""
+        with stage("parse"):
+            traditional = self.traditional_performance(data["traditional"]).to_frame() \
+                if self.traditional else pd.DataFrame()
+            crypto = self.crypto_performance(data["markets"]).to_frame() if self.coin_symbols else pd.DataFrame()
+
+        with stage("compute"):
+            combined = pd.concat([traditional, crypto], axis=1)
+
+        with stage("render"):
+            output_path = plot(combined, list(traditional.columns), list(crypto.columns),
+                               self.title, html_file or self.html_file)
+        print(f"Chart generated successfully: {output_path}")
+        return output_path
+
+
+def _add_asset_trace(fig, series_data, asset_name, asset_color, x_axis_data):
+    """Helper function to add a trace and annotation for an asset."""
+    if series_data.empty:
+        return
+
+    fig.add_trace(go.Scatter(
+        **trace_points(x_axis_data, series_data),
+        name=asset_name,
+        line=dict(color=asset_color, width=2),
+        hovertemplate=f'%{{x|%Y-%m-%d}}<br>{asset_name}: %{{y:.2f}}%<extra></extra>',
+        mode='lines+markers',
+        marker=dict(size=4, opacity=0.6, color=asset_color)
+    ))
+
+    last_valid_idx = series_data.last_valid_index()
+    if last_valid_idx is not None:
+        last_valid_value = series_data[last_valid_idx]
+
+        fig.add_trace(go.Scatter(
+            x=[last_valid_idx],
+            y=[last_valid_value],
+            mode='markers',
+            marker=dict(size=8, color=asset_color),
+            showlegend=False,
+            hoverinfo='skip'
+        ))
+
+        fig.add_annotation(
+            x=last_valid_idx,
+            y=last_valid_value,
+            text=f"{asset_name}: {last_valid_value:.1f}%",
+            showarrow=False,
+            xshift=10,
+            yshift=0,
+            xanchor='left',
+            yanchor='middle',
+            font=dict(size=10, color=asset_color),
+            align='left',
+            bordercolor=asset_color,
+            borderwidth=1,
+            borderpad=4,
+            bgcolor='rgba(255, 255, 255, 0.8)'
+        )
+
+
+def plot(combined_data, traditional_names, crypto_names, title, html_file):
+    """Build the figure and write it to ``html_file``."""
+    fig = go.Figure()
+
+    for asset_name in traditional_names:
+        asset_color = TRADITIONAL_COLORS.get(asset_name, '#000000')  # Default to black if not found
+        _add_asset_trace(fig, combined_data[asset_name], asset_name, asset_color, combined_data.index)
+
+    for i, asset_name in enumerate(crypto_names):
+        asset_color = CRYPTO_COLORS[i % len(CRYPTO_COLORS)]
+        _add_asset_trace(fig, combined_data[asset_name], asset_name, asset_color, combined_data.index)
+
+    fig.update_layout(
+        title=title,
+        xaxis_title='Date',
+        yaxis_title='Percentage Change (%)',
+        hovermode='closest',
+        showlegend=True,
+        template='plotly_white',
+        legend=dict(
+            orientation="v",
+            yanchor="top",
+            y=0.99,
+            xanchor="left",
+            x=1.02
+        ),
+        margin=dict(r=160),  # Extra right margin for end labels
+        xaxis=dict(
+            rangeslider=dict(visible=False),
+            type='date'
+        )
+    )
+
+    # Add a horizontal line at y=0
+    fig.add_shape(
+        type="line",
+        x0=combined_data.index[0],
+        y0=0,
+        x1=combined_data.index[-1],
+        y1=0,
+        line=dict(color="gray", width=1, dash="dash")
+    )
+
+    write_chart(
+        fig,
+        html_file,
+        include_plotlyjs='cdn',  # Use CDN version of plotly.js
+        full_html=True,
+        include_mathjax=False,
+        validate=False,
+        config={'displayModeBar': False},  # Hide the mode bar
+        post_script=ZOOM_SCRIPT if CHART_ZOOM_TIERS else None
+    )
+    return html_file
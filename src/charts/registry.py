@@ -0,0 +1,66 @@
+"""
+The charts the site publishes.
+
+Each chart is declared by name together with the module and functions that
+provide its ``data_needs()`` and ``render(data)``. Nothing is imported until
+a chart is selected, so a run limited to one chart never loads the others
+(or the pandas/plotly/yfinance they pull in), and a chart whose module fails
+to import fails on its own.
+"""
+import importlib
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from src.config import TRUMP_ELECTION_TOP_COINS
+
+
+@dataclass(frozen=True)
+class ChartSpec:
+    """
+    A chart in the registry.
+
+    Args:
+        name: Short name used on the command line and in run summaries.
+        module: Dotted path of the module that builds the chart.
+        needs: Function in ``module`` returning the chart's ``DataNeed`` dict.
+        render: Function in ``module`` drawing the chart from the fetched data.
+        description: One line for ``run_charts.py --list``.
+    """
+    name: str
+    module: str
+    needs: str = "data_needs"
+    render: str = "render"
+    description: str = ""
+
+    def _function(self, attr: str) -> Callable:
+        return getattr(importlib.import_module(self.module), attr)
+
+    def data_needs(self) -> Dict[str, Any]:
+        """Import the chart module and return its data needs."""
+        return self._function(self.needs)()
+
+    def render_chart(self, data: Dict[str, Any]) -> Any:
+        """Import the chart module and render the chart from prefetched data."""
+        return self._function(self.render)(data)
+
+
+CHARTS = (
+    ChartSpec("crypto_performance", "src.charts.crypto_performance",
+              description="Average performance after large market cap drops"),
+    ChartSpec("trump_election", "src.charts.trump_election",
+              description=f"Top {TRUMP_ELECTION_TOP_COINS} coins since the 2024 US election"),
+    ChartSpec("liberation_day_performance", "src.charts.liberation_day_performance",
+              description="Top coins vs. S&P 500, Nasdaq 100 and gold since Liberation Day"),
+)
+
+
+def select(names: Optional[Iterable[str]] = None) -> List[ChartSpec]:
+    """Return the registered charts called ``names`` in registry order, or all of them."""
+    if not names:
+        return list(CHARTS)
+    names = set(names)
+    unknown = names - {chart.name for chart in CHARTS}
+    if unknown:
+        raise ValueError(f"Unknown chart(s): {', '.join(sorted(unknown))}. "
+                         f"Available: {', '.join(chart.name for chart in CHARTS)}")
+    return [chart for chart in CHARTS if chart.name in names]
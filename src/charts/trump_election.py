@@ -1,5 +1,3 @@
-import requests
-import time
 import pandas as pd
 import numpy as np
 import plotly.graph_objs as go
@@ -7,9 +5,16 @@ from datetime import datetime
 import os
 import logging
 import sys
-import concurrent.futures
-from typing import List, Dict, Any
-import random
+from typing import Dict, Any
+
+# Add the project root to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.config import EXCLUDED_COINS, TRUMP_ELECTION_TOP_COINS
+from src.utils.chart_output import write_chart
+from src.utils.data_processing import coin_table
+from src.utils.scheduler import DataNeed, fetch_needs
+from src.utils.timing import stage
 
 # Set up logging
 logging.basicConfig(
@@ -22,113 +27,21 @@ logging.basicConfig(
 )
 
 # Constants
-BASE_URL = "https://api.coingecko.com/api/v3"
-API_KEY = os.getenv("COINGECKO_API_KEY", "CG-1KR3Wbo6yQfvUD9EHQoeECet")
 START_DATE = "04-11-2024"  # November 4, 2024 (Trump Election)
+ANCHOR_DATES = [START_DATE]  # All looked up from one range fetch per coin
 HTML_FILE = "public/charts/trump_election_performance.html"
-REQUEST_DELAY = 5  # Fixed 5 second delay between requests
 
-# List of coins to exclude (stablecoins and wrapped tokens)
-EXCLUDED_COINS = {
-    'tether', 'usd-coin', 'wrapped-bitcoin', 'dai', 'true-usd', 'usdd',
-    'paxos-standard', 'gemini-dollar', 'wrapped-ether', 'staked-ether',
-    'wrapped-staked-ether'
-}
+TOP_COINS = TRUMP_ELECTION_TOP_COINS
+LISTING_SIZE = max(100, TOP_COINS + len(EXCLUDED_COINS))  # Ranked coins considered before exclusions
+LARGE_UNIVERSE = 200  # From this many points on, draw smaller markers without outlines
 
-def make_request(url):
-    """Make API request with fixed delay"""
-    try:
-        response = requests.get(url)
-        if response.status_code != 200:
-            logging.error(f"Error {response.status_code} for {url}")
-            return None
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        logging.error(f"Error making request to {url}: {str(e)}")
-        return None
-
-def fetch_top_coins(limit=50) -> List[Dict[str, Any]]:
-    """Fetch top coins by market cap, excluding stablecoins and wrapped tokens."""
-    url = f"{BASE_URL}/coins/markets"
-    headers = {"x-cg-demo-api-key": API_KEY}
-    params = {
-        "vs_currency": "usd",
-        "order": "market_cap_desc",
-        "per_page": 100,
-        "page": 1,
-        "sparkline": False
+def data_needs():
+    """The coins/markets listing and each selected coin's price on the anchor dates."""
+    return {
+        "markets": DataNeed.of("markets", limit=LISTING_SIZE),
+        "start_prices": DataNeed.of("anchor_prices", limit=LISTING_SIZE, exclude=True,
+                                    top=TOP_COINS, anchors=tuple(ANCHOR_DATES)),
     }
-    
-    all_coins = []
-    page = 1
-    
-    while len(all_coins) < limit and page <= 1:
-        params["page"] = page
-        try:
-            start_time = time.time()
-            response = requests.get(url, params=params, headers=headers)
-            response.raise_for_status()
-            coins = response.json()
-            
-            # Filter out excluded coins
-            filtered_coins = [coin for coin in coins if coin["id"] not in EXCLUDED_COINS]
-            all_coins.extend(filtered_coins)
-            
-            elapsed_time = time.time() - start_time
-            logging.info(f"Fetched {len(filtered_coins)} coins from page {page} in {elapsed_time:.2f} seconds")
-            page += 1
-            time.sleep(REQUEST_DELAY)
-            
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Error fetching page {page}: {e}")
-            if hasattr(e.response, 'status_code'):
-                logging.error(f"Status code: {e.response.status_code}")
-            break
-    
-    if not all_coins:
-        logging.error("No coins were fetched. Exiting.")
-        sys.exit(1)
-        
-    logging.info(f"Total coins fetched: {len(all_coins)}")
-    return all_coins[:limit]
-
-def fetch_historical_price(coin_id: str, date: str) -> float:
-    """Fetch historical price for a specific coin and date."""
-    url = f"{BASE_URL}/coins/{coin_id}/history"
-    headers = {"x-cg-demo-api-key": API_KEY}
-    params = {"date": date}
-    
-    try:
-        response = requests.get(url, params=params, headers=headers)
-        if response.status_code != 200:
-            logging.error(f"Error fetching historical price for {coin_id}: {response.status_code}")
-            return None
-        data = response.json()
-        time.sleep(REQUEST_DELAY)  # Fixed delay after each request
-        return data["market_data"]["current_price"]["usd"]
-    except (requests.exceptions.RequestException, KeyError) as e:
-        logging.error(f"Error fetching historical price for {coin_id}: {e}")
-        return None
-
-def format_price(price):
-    """Format price with appropriate decimal places."""
-    if price >= 0.01:
-        return f"${price:.2f}"
-    else:
-        return f"${price:.3g}"
-
-def format_market_cap(market_cap):
-    """Format market cap with appropriate suffix."""
-    if market_cap >= 1e12:
-        return f"${market_cap/1e12:.2f}T"
-    elif market_cap >= 1e9:
-        return f"${market_cap/1e9:.2f}B"
-    elif market_cap >= 1e6:
-        return f"${market_cap/1e6:.2f}M"
-    elif market_cap >= 1e3:
-        return f"${market_cap/1e3:.2f}K"
-    else:
-        return f"${market_cap:.2f}"
 
 def create_scatter_plot(df):
     """Create the interactive scatter plot."""
@@ -137,18 +50,20 @@ def create_scatter_plot(df):
         return
         
     # Simplified color scheme - just red for negative, blue for positive
-    colors = df['percent_change'].apply(lambda x: 'red' if x < 0 else 'blue')
+    change = df['percent_change'].to_numpy()
+    colors = np.where(change < 0, 'red', 'blue')
+    large = len(df) >= LARGE_UNIVERSE
     
-    # Create trace
-    trace = go.Scatter(
+    # WebGL keeps hover and zoom smooth with thousands of points
+    trace = go.Scattergl(
         x=df['market_cap'],
-        y=df['percent_change'],
+        y=change,
         mode='markers',
         marker=dict(
-            size=12,
+            size=7 if large else 12,
             color=colors,
-            opacity=0.8,
-            line=dict(width=1, color='black')
+            opacity=0.6 if large else 0.8,
+            line=dict(width=0 if large else 1, color='black')
         ),
         hovertemplate=(
             "<b>%{customdata[0]}</b><br>" +
@@ -161,22 +76,13 @@ def create_scatter_plot(df):
                        'current_price_formatted', 'percent_change_rounded']].values
     )
     
-    # Create zero line
-    zero_line = go.Scatter(
-        x=[df['market_cap'].min(), df['market_cap'].max()],
-        y=[0, 0],
-        mode='lines',
-        line=dict(color='black', width=1, dash='dash'),
-        showlegend=False
-    )
-    
     # Calculate y-axis range with some padding
     y_min = df['percent_change'].min() * 1.1  # Add 10% padding
     y_max = df['percent_change'].max() * 1.1  # Add 10% padding
     
     # Create layout
     layout = go.Layout(
-        title=f"Top 50 Coins Performance Since Trump Election (Nov 4, 2024 - {datetime.now().strftime('%Y-%m-%d')})",
+        title=f"Top {TOP_COINS} Coins Performance Since Trump Election (Nov 4, 2024 - {datetime.now().strftime('%Y-%m-%d')})",
         xaxis=dict(
             title="Market Cap (USD, Nov 4, 2024)",
             type="log",  # Keep log scale for market cap
@@ -193,6 +99,9 @@ def create_scatter_plot(df):
         showlegend=False,
         hovermode='closest',
         template="simple_white",
+        # Zero line as a layout shape, drawn once instead of as a second trace
+        shapes=[dict(type='line', xref='paper', x0=0, x1=1, y0=0, y1=0,
+                     line=dict(color='black', width=1, dash='dash'))],
         annotations=[{
             'text': 'Red: Negative Change, Blue: Positive Change',
             'showarrow': False,
@@ -204,80 +113,60 @@ def create_scatter_plot(df):
     )
     
     # Create figure
-    fig = go.Figure(data=[trace, zero_line], layout=layout)
+    fig = go.Figure(data=[trace], layout=layout)
     
     # Save to HTML
     try:
-        fig.write_html(
+        if write_chart(
+            fig,
             HTML_FILE,
             include_plotlyjs='cdn',
             full_html=True,
             include_mathjax=False,
             config={'displayModeBar': False}
-        )
-        logging.info(f"Chart saved to {HTML_FILE}")
+        ):
+            logging.info(f"Chart saved to {HTML_FILE}")
     except Exception as e:
         logging.error(f"Error saving chart: {e}")
         sys.exit(1)
 
-def process_coin(coin: Dict[str, Any]) -> Dict[str, Any]:
-    """Process a single coin's data."""
-    coin_id = coin['id']
-    current_price = coin['current_price']
-    market_cap = coin['market_cap']
-    
-    # Fetch historical price
-    start_price = fetch_historical_price(coin_id, START_DATE)
-    if start_price is None:
-        return None
-    
-    # Calculate percent change
-    percent_change = ((current_price - start_price) / start_price) * 100
-    
-    return {
-        'id': coin_id,
-        'name': coin['name'],
-        'market_cap': market_cap,
-        'market_cap_formatted': format_market_cap(market_cap),
-        'start_price': start_price,
-        'start_price_formatted': format_price(start_price),
-        'current_price': current_price,
-        'current_price_formatted': format_price(current_price),
-        'percent_change': percent_change,
-        'percent_change_rounded': round(percent_change)
-    }
+def coin_frame(coins, start_prices: Dict[str, Any]) -> pd.DataFrame:
+    """% change since the election for every coin with a start price, computed as arrays."""
+    table = coins.table
+    start = np.array([start_prices[coin_id][0] if coin_id in start_prices else np.nan
+                      for coin_id in table['id']], dtype=np.float64)
+    return coin_table(table['id'], table['name'], table['market_cap'], start, table['price'])
 
-def main():
-    try:
-        # Fetch top coins
-        logging.info("Starting to fetch top coins...")
-        coins = fetch_top_coins(limit=50)
-        
-        # Process coins sequentially
-        data = []
-        for coin in coins:
-            result = process_coin(coin)
-            if result is not None:
-                data.append(result)
-                logging.info(f"Processed {result['id']}")
-            time.sleep(REQUEST_DELAY)  # Fixed delay between processing each coin
-        
-        if not data:
+def render(data):
+    """Build the scatter plot from the prefetched listing and start prices."""
+    with stage("parse"):
+        coins = data["markets"].select(exclude=True, top=TOP_COINS)
+    if not len(coins):
+        logging.error("No coins were fetched. Exiting.")
+        sys.exit(1)
+    logging.info(f"Total coins selected: {len(coins)}")
+    start_prices = data["start_prices"]
+
+    with stage("compute"):
+        df = coin_frame(coins, start_prices)
+        if df.empty:
             logging.error("No valid data collected. Exiting.")
             sys.exit(1)
-            
-        # Create DataFrame
-        df = pd.DataFrame(data)
         logging.info(f"Created DataFrame with {len(df)} coins")
-        
-        # Create and save the chart
+
+    # Create and save the chart
+    with stage("render"):
         create_scatter_plot(df)
-        
-        logging.info("Script completed successfully")
-        
+
+    logging.info("Script completed successfully")
+
+def main():
+    try:
+        logging.info("Starting to fetch top coins...")
+        render(fetch_needs(data_needs()))
     except Exception as e:
         logging.error(f"Unexpected error: {e}")
         sys.exit(1)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -4,8 +4,8 @@ from pathlib import Path
 # Project root directory
 PROJECT_ROOT = Path(__file__).parent.parent
 
-# Data directories
-DATA_DIR = PROJECT_ROOT / "data"
+# Data directories (CRYPTO_GRAPHS_DATA_DIR points runs such as benchmarks at a scratch copy)
+DATA_DIR = Path(os.getenv("CRYPTO_GRAPHS_DATA_DIR", PROJECT_ROOT / "data"))
 RAW_DATA_DIR = DATA_DIR / "raw"
 PROCESSED_DATA_DIR = DATA_DIR / "processed"
 
@@ -13,9 +13,11 @@ PROCESSED_DATA_DIR = DATA_DIR / "processed"
 PUBLIC_DIR = PROJECT_ROOT / "public"
 CHARTS_DIR = PUBLIC_DIR / "charts"
 CSS_DIR = PUBLIC_DIR / "css"
+INDEX_FILE = PROJECT_ROOT / "index.html"  # site page that draws the JSON chart specs
 
 # Log directory
 LOG_DIR = PROJECT_ROOT / "logs"
+RUN_REPORT_FILE = LOG_DIR / "run_report.json"  # per-stage metrics of the last run_charts.py run
 
 # Create directories if they don't exist
 for directory in [DATA_DIR, RAW_DATA_DIR, PROCESSED_DATA_DIR, 
@@ -24,10 +26,39 @@ for directory in [DATA_DIR, RAW_DATA_DIR, PROCESSED_DATA_DIR,
 
 # API Configuration
 COINGECKO_API_KEY = os.getenv("COINGECKO_API_KEY", "CG-1KR3Wbo6yQfvUD9EHQoeECet")
-REQUEST_DELAY = 5  # seconds between API requests
+COINGECKO_BASE_URL = "https://api.coingecko.com/api/v3"
+COINGECKO_CALLS_PER_MINUTE = int(os.getenv("COINGECKO_CALLS_PER_MINUTE", "30"))  # Demo plan quota
+COINGECKO_BURST = 5  # requests that may go out back to back before the limiter paces them
+COINGECKO_MAX_CONCURRENCY = 4  # in-flight requests from the async client
+HTTP_POOL_SIZE = 8  # keep-alive connections per host
+HTTP_TIMEOUT = 30  # seconds
+COINGECKO_MAX_RETRIES = 5  # retries per request for 429s, 5xx responses and network errors
+COINGECKO_BACKOFF_BASE = 2.0  # seconds; doubles per retry when there is no Retry-After
+COINGECKO_BACKOFF_MAX = 120.0  # longest single wait between retries, in seconds
+COINGECKO_BREAKER_FAILURES = 10  # requests failing in a row before the run stops calling the API
+COINGECKO_RETRY_BUDGET = 10 * 60  # seconds of retry waits per run before the run stops calling the API
+HTTP_CACHE_TTL = 5 * 60  # seconds a response that includes the current day stays fresh
+HTTP_CACHE_MAX_STALE = 7 * 86_400  # seconds an expired response is kept for revalidation and offline runs
+OFFLINE = os.getenv("CRYPTO_GRAPHS_OFFLINE") == "1"  # Replay cached responses only
+INCREMENTAL = os.getenv("CRYPTO_GRAPHS_INCREMENTAL") == "1"  # Add today's point from coins/markets only
+BACKFILL_CHUNK_DAYS = 365  # days per market_chart/range request; over 90 days comes back daily
+BACKFILL_BATCH = 25  # coins fetched between backfill checkpoints
+MARKETS_SNAPSHOT_TTL = 15 * 60  # seconds a cached coins/markets listing stays fresh
+
+# Stablecoins and wrapped tokens left out of coin rankings
+EXCLUDED_COINS = {
+    'tether', 'usd-coin', 'wrapped-bitcoin', 'dai', 'true-usd', 'usdd',
+    'paxos-standard', 'gemini-dollar', 'wrapped-ether', 'staked-ether',
+    'wrapped-staked-ether'
+}
 
 # Chart Configuration
+CHART_MAX_POINTS = int(os.getenv("CRYPTO_GRAPHS_CHART_MAX_POINTS", "500"))  # per line trace, LTTB-downsampled beyond
+CHART_ZOOM_TIERS = os.getenv("CRYPTO_GRAPHS_CHART_ZOOM_TIERS") == "1"  # finer tiers swapped in on zoom (HTML only)
+CHART_OUTPUT = os.getenv("CRYPTO_GRAPHS_CHART_OUTPUT", "both")  # html, json (spec for index.html) or both
 START_DATE = "04-11-2024"  # November 4, 2024 (Trump Election)
+DROP_DAYS = int(os.getenv("CRYPTO_GRAPHS_DROP_DAYS", "365"))  # history the drop study covers; beyond 365 needs backfill.py
+TRUMP_ELECTION_TOP_COINS = int(os.getenv("CRYPTO_GRAPHS_TRUMP_TOP_COINS", "50"))  # 1000 for the large-universe scatter
 HTML_FILE = CHARTS_DIR / "trump_election_performance.html"
 CRYPTO_PERFORMANCE_FILE = CHARTS_DIR / "crypto_performance.html"
 
@@ -0,0 +1,164 @@
+"""
+Resumable multi-year backfill of the market_chart store.
+
+The daily ``market_chart`` requests only cover the last ``days`` days. The
+backfill walks ``/coins/{id}/market_chart/range`` backwards from each coin's
+earliest stored day in windows of ``BACKFILL_CHUNK_DAYS`` (long enough to
+come back as daily points), one batch of coins at a time, and merges every
+window into the store.
+
+After each batch the oldest day reached per coin, and the coins whose
+history has run out, are written to a checkpoint next to the store. An
+interrupted run, or a CI job that hits its time limit, picks up where it
+stopped. Memory is bounded by one batch of windows. Coins are also marked
+exhausted when the API plan refuses a window as too old (demo keys only
+serve the last 365 days); delete the checkpoint after upgrading the plan to
+reach further back.
+"""
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Set
+
+import requests
+
+from src.config import BACKFILL_BATCH, BACKFILL_CHUNK_DAYS, RAW_DATA_DIR
+from src.utils.coingecko_api import STORED_SERIES, AsyncCoinGeckoClient, exceeds_plan_range
+from src.utils.json_stream import parse_market_chart
+from src.utils.retry import CircuitOpen
+from src.utils.store import MarketChartStore, today_index
+
+CHECKPOINT_FILE = RAW_DATA_DIR / "backfill.json"
+
+# fetch() result for a window the API plan does not serve
+PLAN_LIMITED = "plan_limited"
+
+
+@dataclass
+class BackfillState:
+    """Progress of a backfill: oldest day reached per coin and coins with nothing older."""
+
+    reached: Dict[str, int] = field(default_factory=dict)
+    exhausted: Set[str] = field(default_factory=set)
+
+    @classmethod
+    def load(cls, path: Path = CHECKPOINT_FILE) -> "BackfillState":
+        """Read the checkpoint, or start fresh if there is none."""
+        path = Path(path)
+        if not path.exists():
+            return cls()
+        data = json.loads(path.read_text())
+        return cls({coin_id: int(day) for coin_id, day in data["reached"].items()}, set(data["exhausted"]))
+
+    def save(self, path: Path = CHECKPOINT_FILE) -> None:
+        """Atomically write the checkpoint."""
+        path = Path(path)
+        tmp_path = path.with_suffix(".tmp.json")
+        tmp_path.write_text(json.dumps({"reached": dict(sorted(self.reached.items())),
+                                        "exhausted": sorted(self.exhausted)}, indent=1))
+        os.replace(tmp_path, path)
+
+    def oldest(self, store: MarketChartStore, coin_id: str) -> int:
+        """First day already covered for a coin: the checkpoint, else the store, else tomorrow."""
+        if coin_id in self.reached:
+            return self.reached[coin_id]
+        days, _ = store.load(coin_id)
+        return int(days[0]) if len(days) else today_index() + 1
+
+    def done(self, store: MarketChartStore, coin_id: str, start_day: int) -> bool:
+        oldest = self.oldest(store, coin_id)
+        history_start = store.history_start(coin_id)
+        return (coin_id in self.exhausted or oldest <= start_day
+                or (history_start is not None and oldest <= history_start))
+
+
+def next_window(oldest: int, start_day: int, chunk_days: int = BACKFILL_CHUNK_DAYS) -> range:
+    """The ``chunk_days`` (at most) days just before ``oldest``, not reaching before ``start_day``."""
+    return range(max(start_day, oldest - chunk_days), oldest)
+
+
+async def backfill(client: AsyncCoinGeckoClient, store: MarketChartStore, coin_ids: Sequence[str],
+                   start_day: int, checkpoint: Path = CHECKPOINT_FILE, batch_size: int = BACKFILL_BATCH,
+                   chunk_days: int = BACKFILL_CHUNK_DAYS, max_seconds: Optional[float] = None) -> BackfillState:
+    """
+    Fill the store back to ``start_day`` for ``coin_ids``, checkpointing after every batch.
+
+    Args:
+        client: Client whose limiter and retries the requests go through.
+        store: Store the windows are merged into.
+        coin_ids: Coins to backfill.
+        start_day: Oldest UTC day number wanted.
+        checkpoint: Progress file; an existing one is resumed.
+        batch_size: Coins requested concurrently between checkpoints.
+        chunk_days: Days per ``market_chart/range`` request.
+        max_seconds: Stop cleanly after the batch that passes this budget.
+
+    Returns:
+        BackfillState: The progress reached, as saved to ``checkpoint``.
+    """
+    state = BackfillState.load(checkpoint)
+    deadline = time.monotonic() + max_seconds if max_seconds is not None else None
+    failed: Set[str] = set()  # retried on the next run, not in a loop within this one
+    plan_limited: Set[str] = set()
+
+    while True:
+        pending = [coin_id for coin_id in coin_ids
+                   if coin_id not in failed and not state.done(store, coin_id, start_day)]
+        if not pending:
+            break
+        windows = {coin_id: next_window(state.oldest(store, coin_id), start_day, chunk_days)
+                   for coin_id in pending[:batch_size]}
+
+        async def fetch(coin_id: str):
+            window = windows[coin_id]
+            # Start an hour early so the 00:00 point of the first day is safely inside the range
+            params = {"vs_currency": "usd", "from": str(window.start * 86_400 - 3600),
+                      "to": str(window.stop * 86_400 - 1)}
+            try:
+                body = await client.request_body(f"coins/{coin_id}/market_chart/range", params)
+            except requests.exceptions.HTTPError as e:
+                if exceeds_plan_range(e):
+                    return PLAN_LIMITED
+                raise
+            return parse_market_chart(body, STORED_SERIES, size_hint=len(window) + 2)
+
+        try:
+            payloads = await client.gather(list(windows), fetch)
+        except CircuitOpen:
+            logging.error("Circuit breaker open, stopping the backfill")
+            break
+        exhausted_from: Dict[str, int] = {}
+        for coin_id, series in payloads.items():
+            if series is None:
+                failed.add(coin_id)
+                continue
+            if series is PLAN_LIMITED:
+                # Retrying would be refused again until the plan changes
+                plan_limited.add(coin_id)
+            elif len(series.get("prices", ((), ()))[0]):
+                store.merge_arrays(coin_id, series)
+                state.reached[coin_id] = windows[coin_id].start
+                continue
+            # Nothing older to be had: daily runs then stop asking for the full window
+            state.exhausted.add(coin_id)
+            stored_days, _ = store.load(coin_id)
+            if len(stored_days):
+                exhausted_from[coin_id] = int(stored_days[0])
+        store.set_history_starts(exhausted_from)
+        state.save(checkpoint)
+        remaining = sum(not state.done(store, coin_id, start_day) for coin_id in coin_ids)
+        logging.info(f"Backfilled {len(windows)} coins, {remaining} of {len(coin_ids)} still to go")
+        if deadline is not None and time.monotonic() >= deadline:
+            logging.info("Backfill time budget used up, rerun to resume")
+            break
+
+    if plan_limited:
+        logging.warning(f"The API plan refused older data for {len(plan_limited)} coins; they are marked done. "
+                        f"Delete {checkpoint} after upgrading the plan to backfill further")
+    if failed:
+        logging.warning(f"{len(failed)} coins failed and are left for the next run")
+    return state
+
@@ -0,0 +1,218 @@
+"""
+Deterministic, content-addressed chart output.
+
+``write_chart`` hashes a figure's data and layout together with the write
+options and the plotly version before rendering anything. If the hash
+matches the file's entry in the ``manifest.json`` next to it and the
+outputs exist, rendering is skipped. Otherwise the chart is written with a
+div id derived from the file name, so the same inputs always give
+byte-identical files and unchanged charts never show up in a commit.
+
+Depending on ``CHART_OUTPUT`` a chart is written as standalone HTML, as a
+compact JSON figure spec for ``index.html`` (float32 typed arrays, shared
+templates referenced by name from ``templates.json``), or both.
+``sync_index_page`` points ``index.html`` at the plotly.js build the
+installed plotly package writes specs for, the same build the standalone
+HTML loads from the CDN.
+"""
+import base64
+import hashlib
+import json
+import logging
+import os
+import re
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Union
+
+import numpy as np
+import plotly
+import plotly.io as pio
+from plotly.offline import get_plotlyjs_version
+from plotly.utils import PlotlyJSONEncoder
+
+from src.config import CHART_OUTPUT, INDEX_FILE
+
+try:
+    import fcntl
+except ImportError:  # Windows: local runs, no cross-process locking
+    fcntl = None
+
+MANIFEST_NAME = "manifest.json"
+TEMPLATES_NAME = "templates.json"
+
+PLOTLYJS_SCRIPT = re.compile(r"https://cdn\.plot\.ly/plotly-[\w.-]+?\.min\.js")
+
+# Typed-array dtypes plotly.js understands, smallest first
+_INT_DTYPES = ("i1", "u1", "i2", "u2", "i4", "u4")
+
+
+def input_hash(fig: Any, options: Dict[str, Any]) -> str:
+    """SHA-256 of the figure spec, the write options and the plotly version."""
+    digest = hashlib.sha256()
+    digest.update(pio.to_json(fig, validate=False).encode())
+    digest.update(json.dumps(options, sort_keys=True, default=str).encode())
+    digest.update(plotly.__version__.encode())
+    return digest.hexdigest()
+
+
+def read_json(path: Path) -> Dict[str, Any]:
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+@contextmanager
+def _locked(manifest_path: Path) -> Iterator[None]:
+    """Serialize manifest updates from charts rendering in parallel processes."""
+    if fcntl is None:
+        yield
+        return
+    with open(manifest_path.with_suffix(".lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def _typed_array(arr: np.ndarray) -> Any:
+    """Encode a numpy array the way plotly.js reads typed arrays, as small as it safely gets."""
+    if arr.dtype.kind == "M":
+        unit = "D" if not (arr.astype("datetime64[D]") != arr).any() else "s"
+        return np.datetime_as_string(arr, unit=unit).tolist()
+    if arr.dtype.kind in "iu" and arr.size:
+        lo, hi = arr.min(), arr.max()
+        dtype = next((d for d in _INT_DTYPES if np.iinfo(d).min <= lo and hi <= np.iinfo(d).max), "f8")
+    elif arr.dtype.kind == "f":
+        dtype = "f4"  # about 7 significant digits, more than any axis or hover label shows
+    else:
+        return _compact(arr.tolist())
+    encoded = {"dtype": dtype, "bdata": base64.b64encode(arr.astype("<" + dtype).tobytes()).decode()}
+    if arr.ndim > 1:
+        encoded["shape"] = ",".join(str(n) for n in arr.shape)
+    return encoded
+
+
+def _compact(value: Any) -> Any:
+    """Recursively re-encode a plotly JSON structure with compact typed arrays."""
+    if isinstance(value, np.ndarray):
+        return _typed_array(value)
+    if isinstance(value, dict):
+        if "bdata" in value and "dtype" in value:
+            arr = np.frombuffer(base64.b64decode(value["bdata"]), dtype=value["dtype"])
+            if "shape" in value:
+                arr = arr.reshape([int(n) for n in str(value["shape"]).split(",")])
+            return _typed_array(arr)
+        return {key: _compact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_compact(item) for item in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _template_name(template: Dict[str, Any]) -> Optional[str]:
+    """Return the name of the built-in plotly template ``template`` expands, if any."""
+    for name in pio.templates:
+        if pio.templates[name].to_plotly_json() == template:
+            return name
+    return None
+
+
+def figure_spec(fig: Any, config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Return ``{"data", "layout", "config"}`` for ``Plotly.newPlot`` with compact arrays.
+
+    A built-in template is replaced by its name; ``index.html`` resolves it
+    from ``templates.json``.
+    """
+    spec = fig.to_plotly_json()
+    layout = dict(spec.get("layout", {}))
+    name = _template_name(layout.get("template", {})) if "template" in layout else None
+    if name:
+        layout["template"] = name
+    return {"data": _compact(spec["data"]), "layout": _compact(layout), "config": config or {}}
+
+
+def _save_templates(spec: Dict[str, Any], directory: Path) -> None:
+    name = spec["layout"].get("template")
+    if not isinstance(name, str):
+        return
+    path = directory / TEMPLATES_NAME
+    with _locked(directory / MANIFEST_NAME):
+        templates = read_json(path)
+        if name not in templates:
+            templates[name] = pio.templates[name].to_plotly_json()
+            _write_atomic(path, json.dumps(dict(sorted(templates.items())), cls=PlotlyJSONEncoder,
+                                           separators=(",", ":")))
+
+
+def write_chart(fig: Any, path: Union[str, Path], output: Optional[str] = None, **options: Any) -> bool:
+    """
+    Write ``fig`` unless the same inputs were already rendered to ``path``.
+
+    Args:
+        fig: Plotly figure.
+        path: Output HTML file; the JSON spec goes next to it with a ``.json``
+            suffix, and the manifest lives in the same directory.
+        output: ``"html"``, ``"json"`` or ``"both"``; defaults to ``CHART_OUTPUT``.
+        **options: Passed to ``plotly.io.to_html`` (``include_plotlyjs``, ``config``, ...).
+
+    Returns:
+        bool: True if anything was written, False if the outputs were up to date.
+    """
+    path = Path(path)
+    output = output or CHART_OUTPUT
+    targets = {"html": [path], "json": [path.with_suffix(".json")],
+               "both": [path, path.with_suffix(".json")]}[output]
+    manifest_path = path.parent / MANIFEST_NAME
+    digest = input_hash(fig, {**options, "output": output})
+    with _locked(manifest_path):
+        if read_json(manifest_path).get(path.name) == digest and all(t.exists() for t in targets):
+            logging.info(f"{path.name} is up to date, skipping render")
+            return False
+
+    if output in ("html", "both"):
+        _write_atomic(path, pio.to_html(fig, div_id=path.stem.replace("_", "-"), **options))
+    if output in ("json", "both"):
+        spec = figure_spec(fig, options.get("config"))
+        _save_templates(spec, path.parent)
+        _write_atomic(path.with_suffix(".json"),
+                      json.dumps(spec, cls=PlotlyJSONEncoder, separators=(",", ":")))
+
+    with _locked(manifest_path):
+        manifest = read_json(manifest_path)
+        manifest[path.name] = digest
+        _write_atomic(manifest_path, json.dumps(dict(sorted(manifest.items())), indent=2) + "\n")
+    return True
+
+
+def plotlyjs_url() -> str:
+    """CDN URL of the plotly.js version the installed plotly package targets."""
+    return f"https://cdn.plot.ly/plotly-{get_plotlyjs_version()}.min.js"
+
+
+def sync_index_page(path: Path = INDEX_FILE) -> bool:
+    """
+    Point the page's plotly.js script tag at ``plotlyjs_url()``.
+
+    Returns:
+        bool: True if the page was rewritten, False if it already matched or has no such tag.
+    """
+    path = Path(path)
+    page = path.read_text(encoding="utf-8")
+    synced = PLOTLYJS_SCRIPT.sub(plotlyjs_url(), page)
+    if synced == page:
+        return False
+    _write_atomic(path, synced)
+    logging.info(f"{path.name} now loads plotly.js {get_plotlyjs_version()}")
+    return True
@@ -1,17 +1,64 @@
-import requests
-import time
-from typing import Dict, List, Optional, Union
+import asyncio
+import json
 import logging
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.config import (
+    COINGECKO_API_KEY, COINGECKO_BASE_URL, COINGECKO_BURST, COINGECKO_CALLS_PER_MINUTE,
+    COINGECKO_MAX_CONCURRENCY, HTTP_POOL_SIZE, HTTP_TIMEOUT
+)
+from src.utils.http_cache import ResponseCache
+from src.utils.json_stream import parse_market_chart
+from src.utils.rate_limit import TokenBucket
+from src.utils.retry import CircuitOpen, RetryableError, RetryPolicy, parse_retry_after
+from src.utils.store import (
+    ANCHOR_TABLE_FILE, MS_PER_DAY, AnchorPriceTable, MarketChartStore, lookup_prices, today_index
+)
+from src.utils.timing import count
+
+# {series: (timestamps_ms, values)} as parsed from a market_chart body
+SeriesArrays = Dict[str, Tuple[np.ndarray, np.ndarray]]
+
+# Series the charts read from the store; total_volumes is never used, so it is not parsed
+STORED_SERIES = ("prices", "market_caps")
+
+# error_code of the 401 sent for dates older than the API plan serves (365 days on demo keys)
+PLAN_RANGE_ERROR = 10012
+
+
+def exceeds_plan_range(error: Exception) -> bool:
+    """True if ``error`` is CoinGecko refusing a date range the API plan does not cover."""
+    response = getattr(error, "response", None)
+    if response is None or response.status_code != 401:
+        return False
+    try:
+        status = response.json().get("error", {}).get("status", {})
+    except (ValueError, AttributeError):
+        return False
+    return isinstance(status, dict) and status.get("error_code") == PLAN_RANGE_ERROR
 
 class CoinGeckoAPI:
-    """A wrapper for the CoinGecko API with rate limiting."""
-    
-    def __init__(self, api_key: Optional[str] = None):
-        self.base_url = "https://api.coingecko.com/api/v3"
+    """A wrapper for the CoinGecko API with a pooled session and token-bucket rate limiting."""
+
+    def __init__(self, api_key: Optional[str] = COINGECKO_API_KEY,
+                 calls_per_minute: float = COINGECKO_CALLS_PER_MINUTE,
+                 burst: int = COINGECKO_BURST, pool_size: int = HTTP_POOL_SIZE,
+                 base_url: str = COINGECKO_BASE_URL, cache: Optional[ResponseCache] = None):
+        self.base_url = base_url
         self.api_key = api_key
-        self.last_request_time = 0
-        self.min_request_interval = 6.0  # seconds between requests for free tier
-        
+        self.cache = cache if cache is not None else ResponseCache()
+        self.limiter = TokenBucket(calls_per_minute, burst)
+        self.retry = RetryPolicy(self.limiter)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(self._get_headers())
+
     def _get_headers(self) -> Dict[str, str]:
         """Get headers for API requests."""
         headers = {
@@ -19,43 +66,70 @@ class CoinGeckoAPI:
             'User-Agent': 'Mozilla/5.0'  # Some APIs require a user agent
         }
         if self.api_key:
-            headers['x-cg-pro-api-key'] = self.api_key
+            headers['x-cg-demo-api-key'] = self.api_key
         return headers
-    
-    def _rate_limit(self):
-        """Implement rate limiting."""
-        current_time = time.time()
-        time_since_last_request = current_time - self.last_request_time
-        if time_since_last_request < self.min_request_interval:
-            sleep_time = self.min_request_interval - time_since_last_request
-            logging.debug(f"Rate limiting: sleeping for {sleep_time:.2f} seconds")
-            time.sleep(sleep_time)
-        self.last_request_time = time.time()
-    
-    def _make_request(self, endpoint: str, params: Optional[Dict] = None) -> Dict:
-        """Make a rate-limited request to the API."""
-        self._rate_limit()
+
+    def cached_body(self, endpoint: str, params: Optional[Dict] = None) -> Optional[bytes]:
+        """Return the raw cached response body if it can be served without a request, else None."""
+        entry = self.cache.lookup(endpoint, params)
+        return entry.body if entry is not None else None
+
+    def cached(self, endpoint: str, params: Optional[Dict] = None) -> Any:
+        """Return the parsed cached response if it can be served without a request, else None."""
+        body = self.cached_body(endpoint, params)
+        return json.loads(body) if body is not None else None
+
+    def _send(self, endpoint: str, params: Optional[Dict] = None) -> Any:
+        """Send a request on the pooled session without touching the rate limiter."""
+        return json.loads(self._send_raw(endpoint, params))
+
+    def _send_raw(self, endpoint: str, params: Optional[Dict] = None) -> bytes:
+        """Like ``_send`` but return the response body unparsed; retried per ``self.retry``."""
+        return self.retry.call(endpoint, lambda: self._get(endpoint, params))
+
+    def _get(self, endpoint: str, params: Optional[Dict] = None) -> bytes:
+        """One GET; raises ``RetryableError`` for 429s, 5xx responses and network errors."""
         url = f"{self.base_url}/{endpoint}"
-        
+        stale = self.cache.get(endpoint, params)
+
+        count("http_requests")
         try:
-            response = requests.get(url, headers=self._get_headers(), params=params)
-            
-            # Handle common API errors
-            if response.status_code == 429:
-                logging.warning("Rate limit exceeded. Waiting before retrying...")
-                time.sleep(30)  # Wait 30 seconds before retrying
-                return self._make_request(endpoint, params)
-            
-            if response.status_code == 403:
-                raise Exception("API key invalid or expired")
-            
-            response.raise_for_status()
-            return response.json()
-            
-        except requests.exceptions.RequestException as e:
-            logging.error(f"API request failed: {str(e)}")
-            raise
-    
+            response = self.session.get(url, params=params, timeout=HTTP_TIMEOUT,
+                                        headers=self.cache.conditional_headers(stale))
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            raise RetryableError(f"Network error ({type(e).__name__})", e)
+        count("http_bytes", len(response.content))
+
+        if response.status_code == 304 and stale is not None:
+            return self.cache.touch(endpoint, params, stale).body
+
+        # Handle common API errors
+        if response.status_code == 429:
+            raise RetryableError("Rate limit exceeded", requests.exceptions.HTTPError(
+                "429 Too Many Requests", response=response),
+                retry_after=parse_retry_after(response.headers.get('Retry-After')), rate_limited=True)
+
+        if response.status_code == 403:
+            raise Exception("API key invalid or expired")
+
+        if response.status_code >= 500:
+            raise RetryableError(f"Server error {response.status_code}", requests.exceptions.HTTPError(
+                f"{response.status_code} Server Error", response=response))
+
+        response.raise_for_status()
+        self.cache.put(endpoint, params, response.content,
+                       etag=response.headers.get('ETag'),
+                       last_modified=response.headers.get('Last-Modified'))
+        return response.content
+
+    def _make_request(self, endpoint: str, params: Optional[Dict] = None) -> Any:
+        """Make a rate-limited request to the API, serving fresh cached responses directly."""
+        cached = self.cached(endpoint, params)
+        if cached is not None:
+            return cached
+        self.limiter.acquire()
+        return self._send(endpoint, params)
+
     def get_coins_markets(self, vs_currency: str = 'usd', order: str = 'market_cap_desc',
                          per_page: int = 100, page: int = 1, sparkline: bool = False) -> List[Dict]:
         """Get cryptocurrency prices, market cap, volume, and market related data."""
@@ -64,28 +138,235 @@ class CoinGeckoAPI:
             'order': order,
             'per_page': per_page,
             'page': page,
-            'sparkline': sparkline,
-            'x_cg_pro_api_key': self.api_key  # Some endpoints require the key in params
+            'sparkline': str(sparkline).lower()
         }
         return self._make_request('coins/markets', params)
-    
+
     def get_coin_market_chart_by_id(self, id: str, vs_currency: str = 'usd',
                                    days: Union[int, str] = 1) -> Dict:
         """Get historical market data including price, market cap, and 24h volume."""
         params = {
             "vs_currency": vs_currency,
             "days": str(days),
-            "interval": "daily",
-            "x_cg_demo_api_key": self.api_key  # <-- add this line
+            "interval": "daily"
         }
-        headers = {}  # <-- remove the header for the key
         return self._make_request(f'coins/{id}/market_chart', params)
-    
-    def get_coin_by_id(self, id: str) -> Dict:
-        """Get current data for a coin by its ID."""
+
+    def get_coin_market_chart_range(self, id: str, from_timestamp: int, to_timestamp: int,
+                                    vs_currency: str = 'usd') -> Dict:
+        """Get market data between two UNIX timestamps (seconds)."""
         params = {
-            'x_cg_pro_api_key': self.api_key  # Some endpoints require the key in params
+            "vs_currency": vs_currency,
+            "from": str(int(from_timestamp)),
+            "to": str(int(to_timestamp))
         }
-        return self._make_request(f'coins/{id}', params)
+        return self._make_request(f'coins/{id}/market_chart/range', params)
+
+    def get_coin_history(self, id: str, date: str) -> Dict:
+        """Get a coin's market data at 00:00 UTC on a date given as dd-mm-yyyy."""
+        return self._make_request(f'coins/{id}/history', {'date': date, 'localization': 'false'})
+
+    def get_coin_by_id(self, id: str) -> Dict:
+        """Get current data for a coin by its ID."""
+        return self._make_request(f'coins/{id}')
+
+
+class AsyncCoinGeckoClient:
+    """
+    asyncio front-end to ``CoinGeckoAPI``.
+
+    Requests run on the API's keep-alive session in worker threads, at most
+    ``max_concurrency`` at a time, paced by the shared token bucket so a batch
+    of coins is fetched as fast as the per-minute quota allows.
+    """
+
+    def __init__(self, api: Optional[CoinGeckoAPI] = None,
+                 max_concurrency: int = COINGECKO_MAX_CONCURRENCY):
+        self.api = api or CoinGeckoAPI()
+        self.max_concurrency = max_concurrency
+
+    async def request(self, endpoint: str, params: Optional[Dict] = None) -> Any:
+        """Make one rate-limited request without blocking the event loop."""
+        return json.loads(await self.request_body(endpoint, params))
+
+    async def request_body(self, endpoint: str, params: Optional[Dict] = None) -> bytes:
+        """Like ``request`` but return the response body unparsed."""
+        cached = self.api.cached_body(endpoint, params)
+        if cached is not None:
+            return cached
+        await self.api.limiter.acquire_async()
+        return await asyncio.to_thread(self.api._send_raw, endpoint, params)
+
+    async def gather(self, items: Iterable[Any],
+                     fetch: Callable[[Any], Awaitable[Any]]) -> Dict[Any, Any]:
+        """
+        Run ``fetch(item)`` for every item with bounded concurrency.
+
+        Returns a dict of item -> result; failed items map to None. Once the
+        circuit breaker is open, ``CircuitOpen`` propagates to the caller.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def bounded(item: str) -> Any:
+            async with semaphore:
+                try:
+                    return await fetch(item)
+                except CircuitOpen:
+                    raise
+                except Exception as e:
+                    logging.error(f"Failed to fetch data for {item}: {e}")
+                    return None
+
+        items = list(items)
+        results = await asyncio.gather(*(bounded(item) for item in items))
+        return dict(zip(items, results))
+
+    async def market_charts(self, days_by_coin: Dict[str, int],
+                            vs_currency: str = 'usd') -> Dict[str, Optional[Dict]]:
+        """Fetch daily market_chart payloads for several coins, each with its own ``days``."""
+        async def fetch(coin_id: str) -> Dict:
+            params = {"vs_currency": vs_currency, "days": str(days_by_coin[coin_id]), "interval": "daily"}
+            return await self.request(f'coins/{coin_id}/market_chart', params)
+        return await self.gather(days_by_coin, fetch)
+
+    async def market_chart_arrays(self, days_by_coin: Dict[str, int], series: Sequence[str] = STORED_SERIES,
+                                  vs_currency: str = 'usd') -> Dict[str, Optional[SeriesArrays]]:
+        """
+        Like ``market_charts``, but parse only ``series`` straight into arrays.
+
+        Each coin maps to ``{series: (timestamps_ms, values)}``; see ``json_stream``.
+        """
+        async def fetch(coin_id: str) -> SeriesArrays:
+            days = days_by_coin[coin_id]
+            params = {"vs_currency": vs_currency, "days": str(days), "interval": "daily"}
+            body = await self.request_body(f'coins/{coin_id}/market_chart', params)
+            return parse_market_chart(body, series, size_hint=days + 2)
+        return await self.gather(days_by_coin, fetch)
+
+    async def market_chart_ranges(self, coin_ids: Iterable[str], from_timestamp: int, to_timestamp: int,
+                                  vs_currency: str = 'usd', series: Sequence[str] = ("prices",)
+                                  ) -> Dict[str, Optional[SeriesArrays]]:
+        """Fetch ``market_chart/range`` series as arrays for several coins over one time window."""
+        params = {"vs_currency": vs_currency, "from": str(int(from_timestamp)), "to": str(int(to_timestamp))}
+        # Ranges up to 90 days come back hourly
+        size_hint = (int(to_timestamp) - int(from_timestamp)) // 3600 + 2
+
+        async def fetch(coin_id: str) -> SeriesArrays:
+            body = await self.request_body(f'coins/{coin_id}/market_chart/range', params)
+            return parse_market_chart(body, series, size_hint=min(size_hint, 100_000))
+        return await self.gather(coin_ids, fetch)
+
+    async def coin_histories(self, coin_ids: Iterable[str], date: str) -> Dict[str, Optional[Dict]]:
+        """Fetch ``/coins/{id}/history`` snapshots for several coins on one date."""
+        async def fetch(coin_id: str) -> Dict:
+            return await self.request(f'coins/{coin_id}/history', {'date': date, 'localization': 'false'})
+        return await self.gather(coin_ids, fetch)
+
+    async def top_markets(self, limit: int, vs_currency: str = 'usd') -> List[Dict]:
+        """Fetch the top ``limit`` coins by market cap, paging 250 at a time."""
+        pages = range(1, (limit - 1) // 250 + 2)
+        per_page = min(limit, 250)
+
+        async def fetch(page: int) -> List[Dict]:
+            params = {'vs_currency': vs_currency, 'order': 'market_cap_desc',
+                      'per_page': per_page, 'page': page, 'sparkline': 'false'}
+            return await self.request('coins/markets', params)
+        results = await self.gather(pages, fetch)
+        coins = []
+        for page in pages:
+            if results[page] is None:
+                raise RuntimeError(f"Failed to fetch coins/markets page {page}")
+            coins.extend(results[page])
+        return coins[:limit]
+
+    async def update_store(self, store: MarketChartStore, days_by_coin: Dict[str, int]) -> int:
+        """
+        Bring ``store`` up to date for each coin's last ``days`` days.
+
+        Returns the number of requests made. In offline mode the store is
+        used as it is. A full window that comes back starting later than
+        asked for records the coin's first available day in the store.
+        """
+        if self.api.cache.offline:
+            logging.info("Offline mode: using stored market_chart data as is")
+            return 0
+        missing = {}
+        for coin_id, days in days_by_coin.items():
+            missing_days = store.days_to_fetch(coin_id, days)
+            if missing_days:
+                missing[coin_id] = missing_days
+        payloads = await self.market_chart_arrays(missing)
+        starts = {}
+        for coin_id, series in payloads.items():
+            if not series:
+                continue
+            store.merge_arrays(coin_id, series)
+            timestamps = series.get("prices", (np.empty(0), np.empty(0)))[0]
+            full_window = missing[coin_id] == days_by_coin[coin_id]
+            if full_window and len(timestamps) and timestamps.min() // MS_PER_DAY > today_index() - missing[coin_id]:
+                starts[coin_id] = int(timestamps.min() // MS_PER_DAY)
+        store.set_history_starts(starts)
+        return len(missing)
+
+    async def anchor_prices(self, store: MarketChartStore, coin_ids: Iterable[str],
+                            anchor_ms: Sequence[int],
+                            table: Optional[AnchorPriceTable] = None) -> Dict[str, np.ndarray]:
+        """
+        Look up each coin's price at every anchor timestamp (ms, 00:00 UTC).
+
+        Prices are read in bulk from the anchor price table, then from the
+        store for coins it does not know yet; the rest get one
+        ``market_chart/range`` request spanning all anchors, so extra anchors
+        cost no extra requests. Everything found (or found missing) is added to
+        the table, so later runs answer the whole universe from one file.
+        Coins without data are left out.
+        """
+        table = table or AnchorPriceTable(store.root / ANCHOR_TABLE_FILE)
+        coin_ids = list(coin_ids)
+        anchor_days = [ms // MS_PER_DAY for ms in anchor_ms]
+        values, known = table.lookup(coin_ids, anchor_days)
+        complete = known.all(axis=1)
+        new_ids, new_values = [], []
+        to_fetch = []
+        for coin_id in [coin_id for coin_id, done in zip(coin_ids, complete) if not done]:
+            stored = store.values_on(coin_id, anchor_days)
+            if np.isnan(stored).any():
+                to_fetch.append(coin_id)
+            else:
+                new_ids.append(coin_id)
+                new_values.append(stored)
+        logging.info(f"{int(complete.sum())} anchor prices from the anchor table, {len(new_ids)} from "
+                     f"local store, fetching {len(to_fetch)} coins")
+
+        from_ts = min(anchor_ms) // 1000 - 86_400
+        to_ts = max(anchor_ms) // 1000 + 86_400
+        payloads = await self.market_chart_ranges(to_fetch, from_ts, to_ts)
+        for coin_id, series in payloads.items():
+            if series is None:
+                continue  # failed request, ask again next run
+            timestamps, prices = series.get("prices", (np.empty(0), np.empty(0)))
+            found = lookup_prices(np.column_stack([timestamps, prices]), anchor_ms)
+            if np.isnan(found).any():
+                logging.error(f"Error fetching historical price for {coin_id}: no data near anchor dates")
+            new_ids.append(coin_id)
+            new_values.append(found)
+        if new_ids:
+            table.update(new_ids, anchor_days, np.vstack(new_values))
+
+        prices = {coin_id: row for coin_id, row, done in zip(coin_ids, values, complete) if done}
+        prices.update(zip(new_ids, new_values))
+        return {coin_id: row for coin_id, row in prices.items() if not np.isnan(row).any()}
+
+
+_client: Optional[AsyncCoinGeckoClient] = None
+
+def get_client() -> AsyncCoinGeckoClient:
+    """Return the process-wide client so every chart shares one limiter and connection pool."""
+    global _client
+    if _client is None:
+        _client = AsyncCoinGeckoClient()
+    return _client
 
-print(f"Using CoinGecko API key: {COINGECKO_API_KEY}") 
\ No newline at end of file
+def run(coro: Awaitable[Any]) -> Any:
+    """Run a client coroutine from synchronous chart code."""
+    return asyncio.run(coro)
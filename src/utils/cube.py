@@ -0,0 +1,116 @@
+"""
+Memory-mapped days x coins x field cube of market_chart data.
+
+After the fetch stage brings the store up to date, the scheduler packs the
+stored history of every coin a chart asked for into one float64 ``.npy``
+array shaped ``(days, coins, fields)`` under ``PROCESSED_DATA_DIR/cube``. A
+small JSON header maps coin ids and UTC days to offsets. Chart processes
+open the array with ``mmap_mode="r"`` and slice it, so they share the page
+cache instead of each loading and binning hundreds of per-coin files.
+
+The header names the data file it belongs to and is replaced last, so a
+reader never sees a header paired with a half-written array. A cube built
+from a different store, or one that does not cover the requested coins and
+days, is ignored and callers fall back to the store.
+"""
+import json
+import logging
+import os
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from src.config import PROCESSED_DATA_DIR
+from src.utils.store import SERIES, MarketChartStore
+
+HEADER_FILE = "index.json"
+
+
+def cube_dir() -> Path:
+    return PROCESSED_DATA_DIR / "cube"
+
+
+@dataclass
+class PriceCube:
+    """A read-only ``(days, coins, fields)`` array with its day and coin index."""
+
+    first_day: int
+    coins: List[str]
+    fields: List[str]
+    values: np.ndarray
+    source: str
+
+    @property
+    def days(self) -> np.ndarray:
+        return np.arange(self.first_day, self.first_day + self.values.shape[0], dtype=np.int64)
+
+    @property
+    def last_day(self) -> int:
+        return self.first_day + self.values.shape[0] - 1
+
+    def covers(self, store: MarketChartStore, coin_ids: Sequence[str], first_day: int, last_day: int) -> bool:
+        """True if the cube was built from ``store`` and holds these coins over these days."""
+        return (self.source == str(Path(store.root).resolve())
+                and self.first_day <= first_day and last_day <= self.last_day
+                and set(coin_ids) <= set(self.coins))
+
+    def slice(self, coin_ids: Sequence[str], first_day: int, last_day: int, field: str = "prices") -> np.ndarray:
+        """Return one field as a ``(days, coins)`` array over ``[first_day, last_day]``."""
+        offsets: Dict[str, int] = {coin_id: i for i, coin_id in enumerate(self.coins)}
+        rows = slice(first_day - self.first_day, last_day - self.first_day + 1)
+        cols = [offsets[coin_id] for coin_id in coin_ids]
+        # Fancy indexing copies just the requested block out of the mapping
+        return self.values[rows, :, self.fields.index(field)][:, cols]
+
+
+def build_cube(store: MarketChartStore, coin_ids: Sequence[str], first_day: int, last_day: int,
+               root: Optional[Path] = None) -> PriceCube:
+    """Write the stored history of ``coin_ids`` over ``[first_day, last_day]`` as a new cube."""
+    root = Path(root) if root is not None else cube_dir()
+    root.mkdir(parents=True, exist_ok=True)
+    coin_ids = list(dict.fromkeys(coin_ids))
+    data_file = f"cube-{uuid.uuid4().hex[:12]}.npy"
+    shape = (last_day - first_day + 1, len(coin_ids), len(SERIES))
+    values = np.lib.format.open_memmap(root / data_file, mode="w+", dtype=np.float64, shape=shape)
+    values[:] = np.nan
+    for col, coin_id in enumerate(coin_ids):
+        days, stored = store.load(coin_id)
+        keep = (days >= first_day) & (days <= last_day)
+        values[days[keep] - first_day, col, :] = stored[keep]
+    values.flush()
+    del values
+
+    header = {"first_day": first_day, "coins": coin_ids, "fields": list(SERIES),
+              "shape": list(shape), "data": data_file, "source": str(Path(store.root).resolve())}
+    tmp_path = root / (HEADER_FILE + ".tmp")
+    tmp_path.write_text(json.dumps(header))
+    os.replace(tmp_path, root / HEADER_FILE)
+    # Processes still mapping an older array keep it until they close it
+    for old in root.glob("cube-*.npy"):
+        if old.name != data_file:
+            try:
+                old.unlink()
+            except OSError:  # mapped elsewhere on Windows; removed by a later build
+                pass
+    logging.info(f"Wrote {shape[0]} x {shape[1]} x {shape[2]} price cube to {root}")
+    return open_cube(root)
+
+
+def open_cube(root: Optional[Path] = None) -> Optional[PriceCube]:
+    """Map the current cube read-only, or return None if there is none or it is unreadable."""
+    root = Path(root) if root is not None else cube_dir()
+    try:
+        header = json.loads((root / HEADER_FILE).read_text())
+        values = np.load(root / header["data"], mmap_mode="r")
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError) as e:
+        logging.warning(f"Could not open price cube in {root}: {e}")
+        return None
+    if list(values.shape) != header["shape"]:
+        logging.warning(f"Price cube in {root} does not match its header")
+        return None
+    return PriceCube(header["first_day"], header["coins"], header["fields"], values, header["source"])
@@ -1,11 +1,18 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Sequence
+import numpy as np
 import pandas as pd
 import logging
 
+from src.utils.performance import percent_change
+
+# Market cap suffixes, largest first
+SUFFIXES = ((1e12, "T"), (1e9, "B"), (1e6, "M"), (1e3, "K"))
+MAX_GROUPS = 6  # comma-separated groups format_prices handles, up to 10**18
+
 def format_price(price: float) -> str:
     """Format price with appropriate decimal places."""
     if price >= 0.01:
-        return f"${price:.2f}"
+        return f"${price:,.2f}"
     else:
         return f"${price:.3g}"
 
@@ -22,26 +29,61 @@ def format_market_cap(market_cap: float) -> str:
     else:
         return f"${market_cap:.2f}"
 
-def process_coin_data(coin: Dict[str, Any], start_price: float) -> Dict[str, Any]:
-    """Process a single coin's data for visualization."""
-    current_price = coin['current_price']
-    market_cap = coin['market_cap']
-    
-    # Calculate percent change
-    percent_change = ((current_price - start_price) / start_price) * 100
-    
-    return {
-        'id': coin['id'],
-        'name': coin['name'],
-        'market_cap': market_cap,
-        'market_cap_formatted': format_market_cap(market_cap),
-        'start_price': start_price,
-        'start_price_formatted': format_price(start_price),
-        'current_price': current_price,
-        'current_price_formatted': format_price(current_price),
-        'percent_change': percent_change,
-        'percent_change_rounded': round(percent_change)
-    }
+def _thousands(whole: np.ndarray) -> np.ndarray:
+    """Non-negative integers as strings with comma separators, built one 3-digit group at a time."""
+    whole = np.asarray(whole, dtype=np.int64)
+    n_groups = np.select([whole >= 1000 ** k for k in range(MAX_GROUPS - 1, 0, -1)],
+                         list(range(MAX_GROUPS, 1, -1)), 1)
+    out = np.char.mod("%d", whole // 1000 ** (n_groups - 1))
+    for k in range(MAX_GROUPS - 2, -1, -1):
+        group = np.char.mod(",%03d", whole // 1000 ** k % 1000)
+        out = np.where(n_groups > k + 1, np.char.add(out, group), out)
+    return out
+
+def format_prices(prices: np.ndarray) -> np.ndarray:
+    """``format_price`` for a whole array of prices."""
+    prices = np.asarray(prices, dtype=np.float64)
+    if not prices.size:
+        return prices.astype(str)
+    whole, _, cents = np.char.partition(np.char.mod("%.2f", prices), ".").T
+    above_cent = np.isfinite(prices) & (prices >= 0.01)
+    grouped = _thousands(np.where(above_cent, whole, "0").astype(np.int64))
+    digits = np.where(above_cent, np.char.add(np.char.add(grouped, "."), cents), np.char.mod("%.3g", prices))
+    return np.char.add("$", digits)
+
+def format_market_caps(market_caps: np.ndarray) -> np.ndarray:
+    """``format_market_cap`` for a whole array, picking each suffix with ``np.select`` on magnitude."""
+    market_caps = np.asarray(market_caps, dtype=np.float64)
+    conditions = [market_caps >= scale for scale, _ in SUFFIXES]
+    scales = np.select(conditions, [scale for scale, _ in SUFFIXES], 1.0)
+    suffixes = np.select(conditions, [suffix for _, suffix in SUFFIXES], "")
+    return np.char.add(np.char.add("$", np.char.mod("%.2f", market_caps / scales)), suffixes)
+
+def coin_table(ids: Sequence[str], names: Sequence[str], market_caps: np.ndarray,
+               start_prices: np.ndarray, current_prices: np.ndarray) -> pd.DataFrame:
+    """
+    Columnar table of coins for the performance scatter, built from whole arrays.
+
+    Adds the % change, the formatted hover labels and the rounded change.
+    Coins without a usable start price are left out.
+    """
+    start_prices = np.asarray(start_prices, dtype=np.float64)
+    current_prices = np.asarray(current_prices, dtype=np.float64)
+    change = percent_change(start_prices, current_prices)
+    keep = ~np.isnan(change)
+    market_caps = np.asarray(market_caps, dtype=np.float64)[keep]
+    return pd.DataFrame({
+        'id': np.asarray(ids)[keep],
+        'name': np.asarray(names)[keep],
+        'market_cap': market_caps,
+        'market_cap_formatted': format_market_caps(market_caps),
+        'start_price': start_prices[keep],
+        'start_price_formatted': format_prices(start_prices[keep]),
+        'current_price': current_prices[keep],
+        'current_price_formatted': format_prices(current_prices[keep]),
+        'percent_change': change[keep],
+        'percent_change_rounded': np.rint(change[keep]).astype(int),
+    })
 
 def create_performance_dataframe(data: List[Dict[str, Any]]) -> pd.DataFrame:
     """Create a DataFrame from processed coin data."""
@@ -0,0 +1,136 @@
+"""
+Downsampling of line traces before they are written.
+
+``lttb`` picks points with Largest-Triangle-Three-Buckets: one point per
+bucket, the one forming the largest triangle with the previously kept point
+and the next bucket's average, which keeps the visual shape of a line at a
+fraction of its points. The first and last points and each series' highest
+and lowest points are always kept.
+
+With ``CHART_ZOOM_TIERS`` on, traces also carry finer tiers (4x the budget
+each, up to every point) in their ``meta``, and ``ZOOM_SCRIPT`` swaps in the
+coarsest tier that still gives the full budget inside the zoomed x range.
+The script runs in the standalone HTML only; ``index.html`` shows the base
+tier.
+"""
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from src.config import CHART_MAX_POINTS, CHART_ZOOM_TIERS
+
+TIER_FACTOR = 4
+
+# plotly.io.to_html post_script; {plot_id} is filled in by plotly
+ZOOM_SCRIPT = """
+var gd = document.getElementById('{plot_id}');
+function xKey(v) { return typeof v === 'number' ? v : Date.parse(String(v).replace(' ', 'T')); }
+gd.on('plotly_relayout', function(ev) {
+  var reset = ev['xaxis.autorange'];
+  var lo = ev['xaxis.range[0]'], hi = ev['xaxis.range[1]'];
+  if (ev['xaxis.range']) { lo = ev['xaxis.range'][0]; hi = ev['xaxis.range'][1]; }
+  if (lo === undefined && !reset) return;
+  var xs = [], ys = [], traces = [];
+  gd.data.forEach(function(trace, i) {
+    var tiers = trace.meta && trace.meta.tiers;
+    if (!tiers) return;
+    var pick = tiers[0];
+    if (!reset) {
+      var a = xKey(lo), b = xKey(hi);
+      for (var t = 0; t < tiers.length; t++) {
+        pick = tiers[t];
+        var inView = pick.x.filter(function(x) { var k = xKey(x); return k >= a && k <= b; }).length;
+        if (inView >= tiers[0].x.length) break;
+      }
+    }
+    xs.push(pick.x); ys.push(pick.y); traces.push(i);
+  });
+  if (traces.length) Plotly.restyle(gd, {x: xs, y: ys}, traces);
+});
+"""
+
+
+def lttb(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Indices of at most ``max_points`` points chosen by Largest-Triangle-Three-Buckets.
+
+    ``x`` and ``y`` must be finite and ``x`` increasing. Returns every index
+    when the series already fits.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+    # max_points - 2 buckets over the points between the first and the last
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(max_points - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = end, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def downsample_indices(x: Sequence[Any], y: Sequence[float], max_points: int = CHART_MAX_POINTS) -> np.ndarray:
+    """
+    Sorted indices into ``x``/``y`` to plot within a budget of ``max_points``.
+
+    The budget applies to the points where ``y`` is finite; the highest and
+    lowest points are added to the LTTB selection, so the result can exceed
+    it by two. The first missing point of every gap between observations is
+    kept as well, so the line still breaks there.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    observed = np.isfinite(y)
+    finite = np.flatnonzero(observed)
+    if not len(finite):
+        return finite
+    breaks = np.flatnonzero(~observed[1:] & observed[:-1]) + 1
+    breaks = breaks[breaks < finite[-1]]
+    if len(finite) <= max_points:
+        return np.union1d(finite, breaks)
+    x = np.asarray(x)
+    if x.dtype.kind == "M":
+        x = x.astype("datetime64[ns]").astype(np.int64)
+    elif x.dtype.kind not in "iuf":
+        x = np.arange(len(y))
+    picked = finite[lttb(x[finite], y[finite], max_points)]
+    extremes = finite[[np.argmax(y[finite]), np.argmin(y[finite])]]
+    return np.union1d(np.union1d(picked, extremes), breaks)
+
+
+def _json_x(x: np.ndarray) -> List[Any]:
+    if x.dtype.kind == "M":
+        return np.datetime_as_string(x.astype("datetime64[s]")).tolist()
+    return x.tolist()
+
+
+def trace_points(x: Sequence[Any], y: Sequence[float], max_points: int = CHART_MAX_POINTS,
+                 tiers: Optional[bool] = None) -> Dict[str, Any]:
+    """
+    ``x``, ``y`` (and ``meta`` with zoom tiers) keyword arguments for a downsampled line trace.
+
+    Args:
+        x: Positions, numbers or datetimes.
+        y: Values; NaN points are left out except one per gap, which breaks the line.
+        max_points: Point budget of the base tier.
+        tiers: Add finer tiers for ``ZOOM_SCRIPT``; defaults to ``CHART_ZOOM_TIERS``.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=np.float64)
+    idx = downsample_indices(x, y, max_points)
+    points: Dict[str, Any] = {"x": x[idx], "y": y[idx]}
+    if tiers if tiers is not None else CHART_ZOOM_TIERS:
+        levels = [idx]
+        budget = max_points * TIER_FACTOR
+        while np.count_nonzero(np.isfinite(y[levels[-1]])) < np.count_nonzero(np.isfinite(y)):
+            levels.append(downsample_indices(x, y, budget))
+            budget *= TIER_FACTOR
+        points["meta"] = {"tiers": [{"x": _json_x(x[level]), "y": y[level].tolist()} for level in levels]}
+    return points
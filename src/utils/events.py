@@ -0,0 +1,243 @@
+"""
+Drawdown event detection and event-window extraction.
+
+A drop event is a run of days on which a series is more than ``threshold``
+below its value ``lookback`` days earlier. Runs closer together than
+``lookback`` days belong to the same crash and are merged, and each event
+is anchored on its lowest point (Day 0).
+
+``DropIndex`` precomputes the change over every lookback in a range and a
+sparse table of range-minimum positions, so the events for any threshold,
+lookback and horizon come from one comparison, a run merge and O(1) trough
+lookups, without rescanning the series.
+
+The spread of event windows is summarized by percentiles across events and a
+bootstrap confidence interval of the mean, with every resample computed in
+one matrix product.
+"""
+import warnings
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def flag_drops(values: np.ndarray, threshold: float = 0.10, lookback: int = 7) -> np.ndarray:
+    """Return a boolean mask of days more than ``threshold`` below ``lookback`` days earlier."""
+    values = np.asarray(values, dtype=np.float64)
+    flagged = np.zeros(len(values), dtype=bool)
+    if len(values) > lookback:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            change = values[lookback:] / values[:-lookback] - 1
+        flagged[lookback:] = change < -threshold
+    return flagged
+
+
+def merge_runs(flagged: np.ndarray, max_gap: int) -> np.ndarray:
+    """
+    Group flagged days into ``(start, end)`` index pairs (inclusive).
+
+    Flagged days separated by at most ``max_gap`` days end up in the same run.
+    """
+    idx = np.flatnonzero(flagged)
+    if not len(idx):
+        return np.empty((0, 2), dtype=np.int64)
+    breaks = np.flatnonzero(np.diff(idx) > max_gap)
+    starts = idx[np.concatenate([[0], breaks + 1])]
+    ends = idx[np.concatenate([breaks, [len(idx) - 1]])]
+    return np.column_stack([starts, ends])
+
+
+def run_minima(values: np.ndarray, runs: np.ndarray) -> np.ndarray:
+    """Return the index of the lowest value inside each ``(start, end)`` run."""
+    if not len(runs):
+        return np.empty(0, dtype=np.int64)
+    lengths = runs[:, 1] - runs[:, 0] + 1
+    run_ids = np.repeat(np.arange(len(runs)), lengths)
+    positions = np.repeat(runs[:, 0] - np.cumsum(np.concatenate([[0], lengths[:-1]])), lengths)
+    positions = positions + np.arange(lengths.sum())
+    # NaNs sort last so they never become a trough
+    order = np.lexsort((values[positions], run_ids))
+    first = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    return positions[order[first]]
+
+
+def find_drop_events(values: np.ndarray, threshold: float = 0.10, lookback: int = 7,
+                     horizon: Optional[int] = 90) -> np.ndarray:
+    """
+    Find drawdown events and return the index of each event's Day 0.
+
+    Args:
+        values: 1-D daily series, e.g. total market cap.
+        threshold: Fractional drop that flags a day (0.10 for >10%).
+        lookback: Days over which the drop is measured.
+        horizon: If set, drop events without ``horizon`` days of data after Day 0.
+
+    Returns:
+        np.ndarray: Sorted Day 0 indices, one per merged event.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    runs = merge_runs(flag_drops(values, threshold, lookback), lookback)
+    day0 = run_minima(values, runs)
+    if horizon is not None:
+        day0 = day0[day0 + horizon < len(values)]
+    return day0
+
+
+class DropIndex:
+    """
+    Rolling-change and range-minimum tables over one daily series.
+
+    Args:
+        values: 1-D daily series, e.g. total market cap.
+        lookbacks: Lookbacks (days) to precompute; ``events`` accepts only these.
+    """
+
+    def __init__(self, values: np.ndarray, lookbacks: Iterable[int] = range(1, 31)):
+        self.values = np.asarray(values, dtype=np.float64)
+        self.lookbacks = np.array(sorted(set(lookbacks)), dtype=np.int64)
+        n = len(self.values)
+        # returns[t, j]: change over lookbacks[j] days ending on day t, NaN where undefined
+        self.returns = np.full((n, len(self.lookbacks)), np.nan)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for j, lookback in enumerate(self.lookbacks):
+                if 0 < lookback < n:
+                    self.returns[lookback:, j] = self.values[lookback:] / self.values[:-lookback] - 1
+        # argmin[k][i]: earliest position of the minimum over [i, i + 2**k); NaN never wins
+        self._key = key = np.where(np.isnan(self.values), np.inf, self.values)
+        self._argmin = [np.arange(n, dtype=np.int64)]
+        width = 1
+        while 2 * width <= n:
+            prev = self._argmin[-1]
+            left, right = prev[:n - 2 * width + 1], prev[width:n - width + 1]
+            self._argmin.append(np.where(key[right] < key[left], right, left))
+            width *= 2
+
+    def range_argmin(self, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        """Position of the lowest value in each inclusive ``[start, end]`` range, earliest on ties."""
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        if not len(starts):
+            return np.empty(0, dtype=np.int64)
+        levels = np.floor(np.log2(ends - starts + 1)).astype(np.int64)
+        out = np.empty(len(starts), dtype=np.int64)
+        for level in np.unique(levels):
+            rows = levels == level
+            table = self._argmin[level]
+            left = table[starts[rows]]
+            right = table[ends[rows] - (1 << level) + 1]
+            out[rows] = np.where(self._key[right] < self._key[left], right, left)
+        return out
+
+    def flags(self, threshold: float, lookback: int) -> np.ndarray:
+        """Same mask as ``flag_drops``, read from the precomputed changes."""
+        column = np.searchsorted(self.lookbacks, lookback)
+        if column == len(self.lookbacks) or self.lookbacks[column] != lookback:
+            raise ValueError(f"Lookback {lookback} is not indexed (have {self.lookbacks.tolist()})")
+        with np.errstate(invalid="ignore"):
+            return self.returns[:, column] < -threshold
+
+    def events(self, threshold: float = 0.10, lookback: int = 7, horizon: Optional[int] = 90) -> np.ndarray:
+        """Same Day 0 indices as ``find_drop_events`` for the indexed series."""
+        runs = merge_runs(self.flags(threshold, lookback), lookback)
+        day0 = self.range_argmin(runs[:, 0], runs[:, 1])
+        if horizon is not None:
+            day0 = day0[day0 + horizon < len(self.values)]
+        return day0
+
+    def grid(self, thresholds: Sequence[float], lookbacks: Sequence[int],
+             horizon: Optional[int] = 90) -> Dict[Tuple[float, int], np.ndarray]:
+        """Day 0 indices for every ``(threshold, lookback)`` combination."""
+        return {(threshold, lookback): self.events(threshold, lookback, horizon)
+                for threshold in thresholds for lookback in lookbacks}
+
+
+def event_windows(matrix: np.ndarray, day0: np.ndarray, horizon: int = 90) -> np.ndarray:
+    """
+    Slice a ``days x assets`` matrix into an ``events x (horizon + 1) x assets`` cube.
+
+    Each window starts at Day 0 and is expressed as % change from Day 0.
+    Windows that would run past the end of the data are padded with NaN.
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    if matrix.ndim == 1:
+        matrix = matrix[:, None]
+    day0 = np.asarray(day0, dtype=np.int64)
+    idx = day0[:, None] + np.arange(horizon + 1)[None, :]
+    valid = idx < len(matrix)
+    windows = matrix[np.minimum(idx, len(matrix) - 1)]
+    windows[~valid] = np.nan
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (windows / windows[:, :1, :] - 1) * 100
+
+
+def average_performance(windows: np.ndarray) -> np.ndarray:
+    """Average an ``events x days x assets`` cube across events, ignoring NaNs."""
+    if not len(windows):
+        return np.full(windows.shape[1:], np.nan)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        return np.nanmean(windows, axis=0)
+
+
+def column_percentiles(values: np.ndarray, percentiles: Sequence[float]) -> np.ndarray:
+    """
+    ``np.nanpercentile(values, percentiles, axis=0)`` for a 2-D array, via one sort.
+
+    Sorting the transposed array keeps each column contiguous, and NaNs sort
+    last, so the percentiles are read off by linear interpolation between
+    the non-NaN entries. Columns without any value give NaN.
+    """
+    ordered = np.sort(values.T, axis=1)
+    n_valid = np.count_nonzero(~np.isnan(ordered), axis=1)
+    position = np.asarray(percentiles, dtype=np.float64)[:, None] / 100 * np.maximum(n_valid - 1, 0)
+    below = np.floor(position).astype(np.int64)
+    above = np.ceil(position).astype(np.int64)
+    rows = np.arange(len(ordered))
+    low, high = ordered[rows, below], ordered[rows, above]
+    result = low + (high - low) * (position - below)
+    result[:, n_valid == 0] = np.nan
+    return result
+
+
+def percentile_bands(windows: np.ndarray, percentiles: Sequence[float] = (25, 50, 75)) -> np.ndarray:
+    """Percentiles across events of an ``events x days x assets`` cube, as ``percentiles x days x assets``."""
+    if not len(windows):
+        return np.full((len(percentiles),) + windows.shape[1:], np.nan)
+    bands = column_percentiles(windows.reshape(len(windows), -1), percentiles)
+    return bands.reshape((len(percentiles),) + windows.shape[1:])
+
+
+def bootstrap_mean_ci(windows: np.ndarray, confidence: float = 0.90, n_resamples: int = 2000,
+                      seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Bootstrap confidence interval of the across-event mean, per day and asset.
+
+    All resamples are drawn at once: each resample is a row of counts of how
+    often every event was drawn, so the resampled means are one matrix
+    product of those counts with the events x (days * assets) values. A fixed
+    seed keeps the output, and so the chart file, reproducible.
+
+    Args:
+        windows: ``events x days x assets`` cube from ``event_windows``.
+        confidence: Central coverage of the interval, e.g. 0.90.
+        n_resamples: Number of bootstrap resamples.
+        seed: Seed for the resampling generator.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Lower and upper bounds, each ``days x assets``.
+    """
+    n_events = len(windows)
+    if not n_events:
+        empty = np.full(windows.shape[1:], np.nan)
+        return empty, empty.copy()
+    values = windows.reshape(n_events, -1)
+    observed = ~np.isnan(values)
+    draws = np.random.default_rng(seed).integers(0, n_events, size=(n_resamples, n_events))
+    offsets = np.arange(n_resamples)[:, None] * n_events
+    counts = np.bincount((draws + offsets).ravel(), minlength=n_resamples * n_events)
+    counts = counts.reshape(n_resamples, n_events).astype(np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        means = (counts @ np.where(observed, values, 0.0)) / (counts @ observed)
+    tail = (1 - confidence) / 2 * 100
+    lower, upper = column_percentiles(means, [tail, 100 - tail])
+    return lower.reshape(windows.shape[1:]), upper.reshape(windows.shape[1:])
@@ -0,0 +1,204 @@
+"""
+Disk-backed HTTP response cache.
+
+Responses are stored under ``RAW_DATA_DIR/http_cache`` keyed by endpoint and
+params, with a TTL chosen per endpoint type: data for closed days never
+expires, anything that includes the current day expires after
+``HTTP_CACHE_TTL`` seconds. Expired entries with an ETag or Last-Modified
+header are revalidated with a conditional request.
+
+In offline mode every stored entry counts as fresh and a miss raises
+``OfflineCacheMiss``, so charts can be re-rendered without network access.
+
+market_chart and market_chart/range bodies are not cached: they are merged
+into the ``MarketChartStore`` (or the anchor price table), which already
+keeps them. ``prune`` drops entries that expired more than
+``HTTP_CACHE_MAX_STALE`` seconds ago.
+"""
+import calendar
+import hashlib
+import json
+import os
+import re
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from src.config import HTTP_CACHE_MAX_STALE, HTTP_CACHE_TTL, OFFLINE, RAW_DATA_DIR
+
+_offline = OFFLINE
+
+# Endpoints whose bodies are merged into the market_chart store instead
+UNCACHED = re.compile(r"coins/[^/]+/market_chart(/range)?$")
+
+
+def set_offline(enabled: bool) -> None:
+    """Switch offline replay mode on or off for every cache in this process."""
+    global _offline
+    _offline = enabled
+
+
+def is_offline() -> bool:
+    return _offline
+
+
+class OfflineCacheMiss(RuntimeError):
+    """Raised in offline mode when a request has no cached response."""
+
+
+@dataclass
+class CacheEntry:
+    """A cached response body and the headers needed to revalidate it."""
+
+    body: bytes
+    stored_at: float
+    ttl: Optional[float]
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    endpoint: Optional[str] = None
+
+    @property
+    def fresh(self) -> bool:
+        return self.ttl is None or time.time() - self.stored_at < self.ttl
+
+    def expired_for(self, now: Optional[float] = None) -> float:
+        """Seconds since the entry went stale; negative while fresh, -inf if it never expires."""
+        if self.ttl is None:
+            return float("-inf")
+        return (time.time() if now is None else now) - self.stored_at - self.ttl
+
+    def json(self) -> Any:
+        return json.loads(self.body)
+
+
+def cacheable(endpoint: str) -> bool:
+    """False for endpoints whose responses are kept in the market_chart store instead."""
+    return UNCACHED.match(endpoint) is None
+
+
+def ttl_for(endpoint: str, params: Optional[Dict] = None, now: Optional[float] = None) -> Optional[float]:
+    """
+    Return how long a response stays fresh, or None if it never expires.
+
+    ``/history`` snapshots and ``market_chart/range`` windows that end before
+    today cover closed days only. Everything else includes live data.
+    """
+    params = params or {}
+    now = time.time() if now is None else now
+    start_of_today = now - now % 86_400
+    if endpoint.endswith("/history"):
+        date = params.get("date", "")
+        match = re.match(r"(\d{2})-(\d{2})-(\d{4})$", date)
+        if match:
+            day, month, year = (int(part) for part in match.groups())
+            if calendar.timegm((year, month, day, 0, 0, 0)) < start_of_today:
+                return None
+    if endpoint.endswith("/market_chart/range") and float(params.get("to", now)) < start_of_today:
+        return None
+    return HTTP_CACHE_TTL
+
+
+class ResponseCache:
+    """Stores response bodies as files, one ``.body``/``.json`` pair per request."""
+
+    def __init__(self, root: Optional[Path] = None, offline: Optional[bool] = None):
+        self.root = Path(root) if root is not None else RAW_DATA_DIR / "http_cache"
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._offline = offline
+
+    @property
+    def offline(self) -> bool:
+        return _offline if self._offline is None else self._offline
+
+    def key(self, endpoint: str, params: Optional[Dict] = None) -> str:
+        raw = json.dumps([endpoint, sorted((params or {}).items())], default=str)
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def get(self, endpoint: str, params: Optional[Dict] = None) -> Optional[CacheEntry]:
+        """Return the stored entry for a request, fresh or not."""
+        key = self.key(endpoint, params)
+        meta_path, body_path = self.root / f"{key}.json", self.root / f"{key}.body"
+        if not meta_path.exists() or not body_path.exists():
+            return None
+        with open(meta_path) as f:
+            meta = json.load(f)
+        return CacheEntry(body=body_path.read_bytes(), **meta)
+
+    def lookup(self, endpoint: str, params: Optional[Dict] = None) -> Optional[CacheEntry]:
+        """Return an entry that can be served without a request, or None."""
+        entry = self.get(endpoint, params)
+        if self.offline:
+            if entry is None:
+                raise OfflineCacheMiss(f"No cached response for {endpoint} {params}")
+            return entry
+        return entry if entry is not None and entry.fresh else None
+
+    def put(self, endpoint: str, params: Optional[Dict], body: bytes,
+            etag: Optional[str] = None, last_modified: Optional[str] = None,
+            ttl: Optional[float] = None) -> CacheEntry:
+        """
+        Store a response body; ``ttl`` defaults to ``ttl_for(endpoint, params)``.
+
+        Bodies of endpoints that are not ``cacheable`` are returned as an entry
+        without being written.
+        """
+        entry = CacheEntry(body=body, stored_at=time.time(),
+                           ttl=ttl_for(endpoint, params) if ttl is None else ttl,
+                           etag=etag, last_modified=last_modified, endpoint=endpoint)
+        if not cacheable(endpoint):
+            return entry
+        key = self.key(endpoint, params)
+        body_path = self.root / f"{key}.body"
+        tmp_path = body_path.with_suffix(".tmp")
+        tmp_path.write_bytes(body)
+        os.replace(tmp_path, body_path)
+        meta = {"stored_at": entry.stored_at, "ttl": entry.ttl,
+                "etag": etag, "last_modified": last_modified, "endpoint": endpoint}
+        with open(self.root / f"{key}.json", "w") as f:
+            json.dump(meta, f)
+        return entry
+
+    def touch(self, endpoint: str, params: Optional[Dict], entry: CacheEntry) -> CacheEntry:
+        """Mark a revalidated (304 Not Modified) entry as fresh again."""
+        return self.put(endpoint, params, entry.body, entry.etag, entry.last_modified, entry.ttl)
+
+    def prune(self, max_stale: float = HTTP_CACHE_MAX_STALE, now: Optional[float] = None) -> int:
+        """
+        Delete entries that expired more than ``max_stale`` seconds ago or are no longer cached.
+
+        Entries written before the endpoint was recorded in their metadata
+        are dropped too. Returns the number of entries removed.
+        """
+        removed = 0
+        for meta_path in self.root.glob("*.json"):
+            try:
+                with open(meta_path) as f:
+                    meta = json.load(f)
+                entry = CacheEntry(body=b"", **meta)
+                keep = (entry.endpoint is not None and cacheable(entry.endpoint)
+                        and entry.expired_for(now) <= max_stale)
+            except (OSError, ValueError, TypeError):
+                keep = False
+            if not keep:
+                for path in (meta_path, meta_path.with_suffix(".body")):
+                    try:
+                        path.unlink()
+                    except FileNotFoundError:
+                        pass
+                removed += 1
+        for body_path in self.root.glob("*.body"):
+            if not body_path.with_suffix(".json").exists():
+                body_path.unlink()
+        return removed
+
+    @staticmethod
+    def conditional_headers(entry: Optional[CacheEntry]) -> Dict[str, str]:
+        """Headers for revalidating a stale entry."""
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+        return headers
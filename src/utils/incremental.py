@@ -0,0 +1,191 @@
+"""
+Incremental daily updates.
+
+A new day adds one point per asset, and coins/markets returns that point
+(current price and market cap) for every listed coin in a single request.
+In incremental mode:
+
+- market_chart history in the local store is topped up from the run's
+  ``MarketSnapshot`` for every coin whose stored history already reaches
+  yesterday, instead of one market_chart request per coin.
+- Charts keep their computed day series in ``PROCESSED_DATA_DIR/series``
+  and only add (or replace) today's row.
+
+A stored series is recomputed in full when it is missing, does not reach
+yesterday, was computed with different parameters, or fails its checksum.
+Series whose columns follow a changing listing (the top N coins) pass the
+columns separately from their parameters: columns that left are dropped and
+only the new ones are loaded. Outside incremental mode every series is
+recomputed.
+"""
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.config import INCREMENTAL, PROCESSED_DATA_DIR
+from src.utils.matrix import DayMatrix
+from src.utils.store import MS_PER_DAY, MarketChartStore, today_index
+
+_incremental = INCREMENTAL
+
+Extras = Dict[str, np.ndarray]
+
+
+def set_incremental(enabled: bool) -> None:
+    """Switch incremental daily updates on or off for this process."""
+    global _incremental
+    _incremental = enabled
+
+
+def is_incremental() -> bool:
+    return _incremental
+
+
+def top_up_from_snapshot(store: MarketChartStore, snapshot: Any, days_by_coin: Dict[str, int]) -> Dict[str, int]:
+    """
+    Store today's price and market cap from ``snapshot`` for coins that are otherwise up to date.
+
+    A coin qualifies when its stored history covers its ``days`` and ends
+    yesterday or today. Returns the ``{coin_id: days}`` that still need a
+    market_chart request.
+    """
+    rows = {coin_id: i for i, coin_id in enumerate(snapshot.table['id'].tolist())}
+    timestamps = np.array([today_index() * MS_PER_DAY], dtype=np.int64)
+    remaining = {}
+    for coin_id, days in days_by_coin.items():
+        row = snapshot.table[rows[coin_id]] if coin_id in rows else None
+        if row is None or np.isnan(row['price']) or store.days_to_fetch(coin_id, days) > 1:
+            remaining[coin_id] = days
+            continue
+        store.merge_arrays(coin_id, {"prices": (timestamps, np.array([row['price']])),
+                                     "market_caps": (timestamps, np.array([row['market_cap']]))})
+    return remaining
+
+
+def checksum(matrix: DayMatrix, params: Dict[str, Any], extras: Extras) -> str:
+    """SHA-256 of a series, the parameters it was computed with and its extra arrays."""
+    digest = hashlib.sha256()
+    digest.update(json.dumps([list(matrix.columns), params], sort_keys=True, default=str).encode())
+    digest.update(np.ascontiguousarray(matrix.days, dtype=np.int64).tobytes())
+    digest.update(np.ascontiguousarray(matrix.values, dtype=np.float64).tobytes())
+    for name in sorted(extras):
+        digest.update(name.encode())
+        digest.update(np.ascontiguousarray(extras[name], dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+class SeriesStore:
+    """Computed days x columns series kept between runs, one ``.npz`` per name."""
+
+    def __init__(self, root: Optional[Path] = None):
+        self.root = Path(root) if root is not None else PROCESSED_DATA_DIR / "series"
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, name: str) -> Path:
+        return self.root / f"{name}.npz"
+
+    def save(self, name: str, matrix: DayMatrix, params: Dict[str, Any], extras: Optional[Extras] = None) -> None:
+        """Atomically write a series with its parameters, extra arrays and checksum."""
+        extras = extras or {}
+        path = self._path(name)
+        tmp_path = path.with_suffix(".tmp.npz")
+        np.savez(tmp_path, days=matrix.days.astype(np.int64), values=matrix.values.astype(np.float64),
+                 columns=np.array(matrix.columns, dtype=str), params=np.array(json.dumps(params, default=str)),
+                 checksum=np.array(checksum(matrix, params, extras)),
+                 **{f"extra_{key}": np.asarray(value, dtype=np.float64) for key, value in extras.items()})
+        os.replace(tmp_path, path)
+
+    def load(self, name: str, params: Dict[str, Any]) -> Optional[Tuple[DayMatrix, Extras]]:
+        """Return the stored series and extras, or None if missing, stale or corrupt."""
+        path = self._path(name)
+        if not path.exists():
+            return None
+        try:
+            with np.load(path) as data:
+                matrix = DayMatrix(data["days"], data["columns"].tolist(), data["values"])
+                stored_params = json.loads(str(data["params"]))
+                stored_checksum = str(data["checksum"])
+                extras = {key[len("extra_"):]: data[key] for key in data.files if key.startswith("extra_")}
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"Could not read stored series {name}: {e}")
+            return None
+        if stored_params != json.loads(json.dumps(params, default=str)):
+            logging.info(f"Stored series {name} was computed with other parameters")
+            return None
+        if checksum(matrix, stored_params, extras) != stored_checksum:
+            logging.warning(f"Stored series {name} failed its checksum")
+            return None
+        return matrix, extras
+
+
+def with_day(matrix: DayMatrix, day: int, row: np.ndarray) -> Optional[DayMatrix]:
+    """Set ``row`` on ``day`` if it is the last stored day or the one after it; None otherwise."""
+    if not len(matrix.days) or day - int(matrix.days[-1]) not in (0, 1):
+        return None
+    keep = matrix.days < day
+    return DayMatrix(np.append(matrix.days[keep], day), matrix.columns,
+                     np.vstack([matrix.values[keep], np.asarray(row, dtype=np.float64)[None, :]]))
+
+
+def with_columns(matrix: DayMatrix, columns: Sequence[str],
+                 load_columns: Callable[[List[str], np.ndarray], np.ndarray]) -> DayMatrix:
+    """
+    Return ``matrix`` with exactly ``columns``, in that order.
+
+    Columns not in ``columns`` are dropped; missing ones come from
+    ``load_columns(names, days)``, a ``(days, names)`` array over ``matrix.days``.
+    """
+    new = [column for column in columns if column not in matrix.columns]
+    if new:
+        added = np.asarray(load_columns(new, matrix.days), dtype=np.float64).reshape(len(matrix.days), len(new))
+        matrix = DayMatrix(matrix.days, list(matrix.columns) + new, np.hstack([matrix.values, added]))
+    return matrix.select(list(columns))
+
+
+def daily_series(name: str, params: Dict[str, Any], compute: Callable[[], Tuple[DayMatrix, Extras]],
+                 latest: Callable[[DayMatrix, Extras], np.ndarray],
+                 store: Optional[SeriesStore] = None, columns: Optional[Sequence[str]] = None,
+                 load_columns: Optional[Callable[[List[str], np.ndarray], np.ndarray]] = None
+                 ) -> Tuple[DayMatrix, Extras]:
+    """
+    Return the series ``name``, adding only today's row when possible.
+
+    Args:
+        name: File stem of the stored series.
+        params: Everything the series depends on besides the data (anchor,
+            coin ids, window length); a change forces a full recompute.
+        compute: Builds the full series and its extra arrays (e.g. the
+            values each column is normalized to).
+        latest: Returns today's row from the stored series and extras.
+        store: Defaults to ``PROCESSED_DATA_DIR/series``.
+        columns: Columns of a series that follows a changing listing. A
+            stored series is brought to these columns with ``with_columns``
+            instead of being recomputed; needs ``load_columns``. Extras
+            are kept as stored, so they must not be per column.
+        load_columns: Returns the history of new columns, see ``with_columns``.
+
+    Returns:
+        Tuple[DayMatrix, Extras]: The up-to-date series and extras, also saved to the store.
+    """
+    store = store or SeriesStore()
+    stored = store.load(name, params) if is_incremental() else None
+    updated = None
+    if stored is not None:
+        matrix, extras = stored
+        if columns is not None and list(matrix.columns) != list(columns):
+            matrix = with_columns(matrix, columns, load_columns)
+            logging.info(f"Stored series {name} now has {len(matrix.columns)} columns")
+        updated = with_day(matrix, today_index(), latest(matrix, extras))
+        if updated is None:
+            logging.info(f"Stored series {name} ends on day {int(matrix.days[-1])}, recomputing")
+    if updated is None:
+        updated, extras = compute()
+    else:
+        logging.info(f"Updated today's row of stored series {name}")
+    store.save(name, updated, params, extras)
+    return updated, extras
@@ -0,0 +1,111 @@
+"""
+Incremental parser for CoinGecko ``market_chart`` response bodies.
+
+``market_chart`` and ``market_chart/range`` return
+``{"prices": [[ts, v], ...], "market_caps": [...], "total_volumes": [...]}``.
+Instead of building a Python list per point, the body is scanned in chunks
+and the numbers of the requested series are written straight into int64
+timestamp and float64 value arrays. Unrequested series are skipped without
+being parsed.
+"""
+import re
+from typing import Dict, Iterable, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+_KEY = re.compile(rb'"([A-Za-z_]+)"\s*:\s*\[')
+_SERIES_END = re.compile(rb'\]\s*\]')
+_STRIP = b'[] \t\r\n'
+CHUNK_SIZE = 64 * 1024
+
+
+class _Series:
+    """Growable pair of timestamp/value arrays."""
+
+    def __init__(self, capacity: int):
+        self.timestamps = np.empty(max(capacity, 1), dtype=np.int64)
+        self.values = np.empty(max(capacity, 1), dtype=np.float64)
+        self.size = 0
+
+    def extend(self, flat: np.ndarray) -> None:
+        n = len(flat) // 2
+        if self.size + n > len(self.values):
+            capacity = max(2 * len(self.values), self.size + n)
+            self.timestamps = np.resize(self.timestamps, capacity)
+            self.values = np.resize(self.values, capacity)
+        self.timestamps[self.size:self.size + n] = flat[0::2]
+        self.values[self.size:self.size + n] = flat[1::2]
+        self.size += n
+
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        return self.timestamps[:self.size], self.values[:self.size]
+
+
+class MarketChartParser:
+    """
+    Feed a market_chart body chunk by chunk, then read the parsed series.
+
+    Args:
+        series: Series to keep, e.g. ``("prices", "market_caps")``.
+        size_hint: Expected points per series, used to preallocate the arrays.
+    """
+
+    def __init__(self, series: Sequence[str], size_hint: int = 1024):
+        self.series = {name: _Series(size_hint) for name in series}
+        self._buffer = b''
+        self._current: Optional[str] = None  # series whose array we are inside
+
+    def feed(self, chunk: bytes) -> None:
+        buffer = self._buffer + bytes(chunk)
+        while buffer:
+            if self._current is None:
+                match = _KEY.search(buffer)
+                if match is None:
+                    # Keep a tail in case a key is split across chunks
+                    buffer = buffer[-64:]
+                    break
+                self._current = match.group(1).decode()
+                buffer = buffer[match.end():]
+                continue
+
+            stripped = buffer.lstrip()
+            if stripped.startswith(b']'):
+                # Outer bracket right after a complete pair, or an empty series
+                self._current, buffer = None, stripped[1:]
+                continue
+            end = _SERIES_END.search(buffer)
+            if end is not None:
+                self._consume(buffer[:end.start() + 1])
+                self._current, buffer = None, buffer[end.end():]
+                continue
+            cut = buffer.rfind(b']')
+            if cut < 0:
+                break
+            self._consume(buffer[:cut + 1])
+            buffer = buffer[cut + 1:]
+        self._buffer = buffer
+
+    def _consume(self, segment: bytes) -> None:
+        """Parse complete ``[ts, value]`` pairs into the current series, if it is wanted."""
+        target = self.series.get(self._current)
+        if target is None:
+            return
+        text = segment.translate(None, _STRIP).replace(b'null', b'nan').strip(b',')
+        if text:
+            target.extend(np.fromstring(text.decode('ascii'), sep=','))
+
+    def result(self) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """Return ``{series: (timestamps_ms int64, values float64)}``; absent series are empty."""
+        return {name: column.arrays() for name, column in self.series.items()}
+
+
+def parse_market_chart(body: Union[bytes, Iterable[bytes]], series: Sequence[str] = ("prices", "market_caps"),
+                       size_hint: int = 1024) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """Parse a market_chart body (bytes or an iterable of chunks) into per-series arrays."""
+    parser = MarketChartParser(series, size_hint)
+    if isinstance(body, (bytes, bytearray, memoryview)):
+        view = memoryview(body)
+        body = (view[i:i + CHUNK_SIZE] for i in range(0, len(view), CHUNK_SIZE))
+    for chunk in body:
+        parser.feed(chunk)
+    return parser.result()
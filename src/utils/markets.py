@@ -0,0 +1,119 @@
+"""
+One coins/markets snapshot per run.
+
+The listing is fetched once at the largest size any chart needs, kept as a
+typed NumPy table (id, symbol, name, price, market_cap, rank) and cached to
+disk for ``MARKETS_SNAPSHOT_TTL`` seconds. Charts take slices of it.
+"""
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from src.config import EXCLUDED_COINS, MARKETS_SNAPSHOT_TTL, RAW_DATA_DIR
+from src.utils.http_cache import is_offline
+
+SNAPSHOT_FILE = RAW_DATA_DIR / "markets_snapshot.npz"
+
+
+class MarketSnapshot:
+    """A ranked coins/markets listing stored as a NumPy structured array."""
+
+    def __init__(self, table: np.ndarray, fetched_at: float):
+        self.table = table
+        self.fetched_at = fetched_at
+
+    @classmethod
+    def from_listing(cls, listing: List[Dict[str, Any]], fetched_at: Optional[float] = None) -> "MarketSnapshot":
+        """Build a snapshot from raw coins/markets JSON rows."""
+        def column(key: str) -> np.ndarray:
+            return np.array([coin.get(key) if coin.get(key) is not None else np.nan for coin in listing],
+                            dtype=np.float64)
+
+        ids = np.array([coin['id'] for coin in listing], dtype=str)
+        symbols = np.array([coin['symbol'] for coin in listing], dtype=str)
+        names = np.array([coin.get('name') or coin['id'] for coin in listing], dtype=str)
+        table = np.empty(len(listing), dtype=[
+            ('id', ids.dtype), ('symbol', symbols.dtype), ('name', names.dtype),
+            ('price', 'f8'), ('market_cap', 'f8'), ('rank', 'i4'),
+        ])
+        table['id'], table['symbol'], table['name'] = ids, symbols, names
+        table['price'] = column('current_price')
+        table['market_cap'] = column('market_cap')
+        table['rank'] = np.nan_to_num(column('market_cap_rank')).astype(np.int32)
+        return cls(table, time.time() if fetched_at is None else fetched_at)
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    @property
+    def ids(self) -> List[str]:
+        return self.table['id'].tolist()
+
+    def age(self) -> float:
+        """Seconds since the listing was fetched."""
+        return time.time() - self.fetched_at
+
+    def select(self, limit: Optional[int] = None, exclude: bool = False,
+               symbols: Optional[Iterable[str]] = None, top: Optional[int] = None) -> "MarketSnapshot":
+        """
+        Slice the listing.
+
+        Takes the first ``limit`` ranked coins, drops EXCLUDED_COINS if
+        ``exclude`` is set, keeps only ``symbols`` if given, then keeps the
+        first ``top`` of what is left.
+        """
+        table = self.table[:limit] if limit else self.table
+        keep = np.ones(len(table), dtype=bool)
+        if exclude:
+            keep &= ~np.isin(table['id'], list(EXCLUDED_COINS))
+        if symbols:
+            keep &= np.isin(np.char.lower(table['symbol']), [symbol.lower() for symbol in symbols])
+        table = table[keep]
+        return MarketSnapshot(table[:top] if top else table, self.fetched_at)
+
+    def records(self) -> List[Dict[str, Any]]:
+        """Rows as dicts with coins/markets key names."""
+        return [
+            {'id': coin_id, 'symbol': symbol, 'name': name, 'current_price': price,
+             'market_cap': market_cap, 'market_cap_rank': rank}
+            for coin_id, symbol, name, price, market_cap, rank in self.table.tolist()
+        ]
+
+    def save(self, path: Path = SNAPSHOT_FILE) -> None:
+        """Atomically write the snapshot to disk."""
+        tmp_path = Path(path).with_suffix(".tmp.npz")
+        np.savez(tmp_path, table=self.table, fetched_at=np.array(self.fetched_at))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path = SNAPSHOT_FILE) -> Optional["MarketSnapshot"]:
+        """Read a cached snapshot, or return None if there is none."""
+        if not Path(path).exists():
+            return None
+        with np.load(path) as data:
+            return cls(data['table'], float(data['fetched_at']))
+
+
+async def fetch_snapshot(client: Any, limit: int, ttl: float = MARKETS_SNAPSHOT_TTL,
+                         path: Path = SNAPSHOT_FILE) -> MarketSnapshot:
+    """
+    Return a snapshot with at least ``limit`` coins.
+
+    A cached snapshot is reused while it is younger than ``ttl`` seconds and
+    large enough, or whenever it exists in offline mode; otherwise the
+    listing is fetched once and cached.
+    """
+    cached = MarketSnapshot.load(path)
+    if cached is not None and is_offline():
+        return cached
+    if cached is not None and len(cached) >= limit and cached.age() < ttl:
+        logging.info(f"Using cached coins/markets snapshot ({len(cached)} coins, {cached.age():.0f}s old)")
+        return cached
+    snapshot = MarketSnapshot.from_listing(await client.top_markets(limit))
+    snapshot.save(path)
+    logging.info(f"Fetched coins/markets snapshot with {len(snapshot)} coins")
+    return snapshot
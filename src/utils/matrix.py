@@ -0,0 +1,124 @@
+"""
+Dense days x assets matrices built straight from raw market data.
+
+Rows are contiguous UTC day numbers (days since the Unix epoch), columns are
+asset ids. Values are float64 with NaN where an asset has no data for a day;
+the ``mask`` property tells real observations apart from gaps.
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.utils.cube import open_cube
+from src.utils.store import SERIES, MarketChartStore, pairs_to_days, today_index
+
+
+@dataclass
+class DayMatrix:
+    """A days x assets float64 matrix with an integer day index."""
+
+    days: np.ndarray
+    columns: List[str]
+    values: np.ndarray
+
+    @property
+    def mask(self) -> np.ndarray:
+        """Boolean matrix, True where a value was observed."""
+        return ~np.isnan(self.values)
+
+    @property
+    def dates(self) -> pd.DatetimeIndex:
+        """Row index as timestamps at 00:00 UTC."""
+        return pd.to_datetime(self.days, unit="D")
+
+    def column(self, name: str) -> np.ndarray:
+        """Return one asset's column."""
+        return self.values[:, self.columns.index(name)]
+
+    def select(self, names: Sequence[str]) -> "DayMatrix":
+        """Return a matrix with only the given columns, in that order."""
+        idx = [self.columns.index(name) for name in names]
+        return DayMatrix(self.days, list(names), self.values[:, idx])
+
+    def since(self, first_day: int) -> "DayMatrix":
+        """Return the rows from day ``first_day`` on."""
+        keep = self.days >= first_day
+        return DayMatrix(self.days[keep], self.columns, self.values[keep])
+
+    def ffill(self) -> "DayMatrix":
+        """Forward-fill gaps inside each column; leading gaps stay NaN."""
+        mask = self.mask
+        rows = np.where(mask, np.arange(len(self.days))[:, None], 0)
+        np.maximum.accumulate(rows, axis=0, out=rows)
+        filled = self.values[rows, np.arange(len(self.columns))[None, :]]
+        # Rows before a column's first observation pick up row 0, which may be a gap
+        filled[np.cumsum(mask, axis=0) == 0] = np.nan
+        return DayMatrix(self.days, self.columns, filled)
+
+    def total(self, exclude: Sequence[str] = ()) -> np.ndarray:
+        """Sum across assets, treating gaps as absent rather than zero-valued."""
+        keep = [i for i, name in enumerate(self.columns) if name not in set(exclude)]
+        return np.nansum(self.values[:, keep], axis=1)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Return the matrix as a DataFrame indexed by date."""
+        return pd.DataFrame(self.values, index=self.dates, columns=self.columns)
+
+
+def bin_by_day(day_arrays: Sequence[np.ndarray], value_arrays: Sequence[np.ndarray],
+               columns: Sequence[str], first_day: Optional[int] = None,
+               last_day: Optional[int] = None) -> DayMatrix:
+    """
+    Average per-asset ``(day, value)`` arrays into a dense days x assets matrix.
+
+    Several observations on the same day are averaged with ``np.bincount``.
+    Days outside ``[first_day, last_day]`` are dropped; by default the range
+    spans all observed days.
+    """
+    lengths = np.array([len(days) for days in day_arrays], dtype=np.int64)
+    all_days = np.concatenate([np.asarray(d, dtype=np.int64) for d in day_arrays] + [np.empty(0, np.int64)])
+    all_values = np.concatenate([np.asarray(v, dtype=np.float64) for v in value_arrays] + [np.empty(0)])
+    col_idx = np.repeat(np.arange(len(columns)), lengths)
+
+    valid = ~np.isnan(all_values)
+    if first_day is None:
+        first_day = int(all_days[valid].min()) if valid.any() else 0
+    if last_day is None:
+        last_day = int(all_days[valid].max()) if valid.any() else first_day - 1
+    valid &= (all_days >= first_day) & (all_days <= last_day)
+
+    n_days, n_cols = last_day - first_day + 1, len(columns)
+    flat = (all_days[valid] - first_day) * n_cols + col_idx[valid]
+    sums = np.bincount(flat, weights=all_values[valid], minlength=n_days * n_cols)
+    counts = np.bincount(flat, minlength=n_days * n_cols)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        values = np.where(counts > 0, sums / counts, np.nan).reshape(n_days, n_cols)
+    return DayMatrix(np.arange(first_day, last_day + 1, dtype=np.int64), list(columns), values)
+
+
+def build_day_matrix(series: Dict[str, Sequence[Sequence[float]]], first_day: Optional[int] = None,
+                     last_day: Optional[int] = None) -> DayMatrix:
+    """Build a DayMatrix from market_chart style ``[timestamp_ms, value]`` lists keyed by asset."""
+    split = [pairs_to_days(pairs) for pairs in series.values()]
+    return bin_by_day([d for d, _ in split], [v for _, v in split], list(series), first_day, last_day)
+
+
+def from_store(store: MarketChartStore, coin_ids: Sequence[str], days: int,
+               series: str = "prices") -> DayMatrix:
+    """
+    Load one series for several coins from the store over the last ``days`` days.
+
+    Slices the memory-mapped price cube when it was built from this store
+    and covers the request; otherwise reads each coin's file.
+    """
+    today = today_index()
+    cube = open_cube()
+    if cube is not None and cube.covers(store, coin_ids, today - days, today):
+        return DayMatrix(np.arange(today - days, today + 1, dtype=np.int64), list(coin_ids),
+                         cube.slice(coin_ids, today - days, today, series))
+    col = SERIES.index(series)
+    loaded = [store.load(coin_id) for coin_id in coin_ids]
+    return bin_by_day([d for d, _ in loaded], [v[:, col] for _, v in loaded], coin_ids,
+                      first_day=today - days, last_day=today)
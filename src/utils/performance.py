@@ -0,0 +1,81 @@
+"""
+Performance since anchor dates over a days x assets matrix.
+
+Every asset is normalized to its value on the anchor day. Gaps (weekends,
+missing days) are forward-filled. An asset with no value on the anchor day
+is measured from its first later value and held at 0% until then; an
+asset with no data after the anchor stays NaN.
+"""
+from typing import Sequence
+
+import numpy as np
+
+from src.utils.matrix import DayMatrix
+
+
+def next_observed(mask: np.ndarray) -> np.ndarray:
+    """For every cell, the first row at or below it with an observation (``len(mask)`` if none)."""
+    n = len(mask)
+    rows = np.where(mask, np.arange(n)[:, None], n)
+    return np.minimum.accumulate(rows[::-1], axis=0)[::-1]
+
+
+def performance_since(matrix: DayMatrix, anchor_days: Sequence[int]) -> np.ndarray:
+    """
+    Percent change since each anchor day, for every day and asset.
+
+    Args:
+        matrix: Days x assets values (prices, closes, market caps).
+        anchor_days: UTC day numbers to normalize to.
+
+    Returns:
+        np.ndarray: ``anchors x days x assets`` % changes; NaN before each anchor.
+    """
+    anchor_rows = np.searchsorted(matrix.days, np.asarray(anchor_days, dtype=np.int64))
+    values = matrix.ffill().values
+    n_days, n_assets = values.shape
+    if not n_days or not n_assets:
+        return np.full((len(anchor_rows), n_days, n_assets), np.nan)
+
+    # First observation at or after each anchor, per asset
+    first = next_observed(matrix.mask)[np.minimum(anchor_rows, n_days - 1)]
+    first[anchor_rows >= n_days] = n_days
+    has_data = first < n_days
+    base = np.where(has_data, values[np.minimum(first, n_days - 1), np.arange(n_assets)], np.nan)
+
+    rows = np.arange(n_days)[None, :, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = (values[None] / base[:, None, :] - 1) * 100
+    before_anchor = np.broadcast_to(rows < anchor_rows[:, None, None], out.shape)
+    before_first = (rows < first[:, None, :]) & has_data[:, None, :]
+    out[before_first] = 0.0
+    out[before_anchor] = np.nan
+    return out
+
+
+def since(matrix: DayMatrix, anchor_day: int) -> DayMatrix:
+    """Percent change since one anchor day, as a matrix starting on that day."""
+    pct = performance_since(matrix, [anchor_day])[0]
+    keep = matrix.days >= anchor_day
+    return DayMatrix(matrix.days[keep], matrix.columns, pct[keep])
+
+
+def base_values(matrix: DayMatrix, anchor_day: int) -> np.ndarray:
+    """Value each column is normalized to by ``since``: its first observation on or after the anchor."""
+    after = matrix.since(anchor_day)
+    observed = after.mask
+    if not len(after.days):
+        return np.full(len(matrix.columns), np.nan)
+    base = after.values[observed.argmax(axis=0), np.arange(len(matrix.columns))]
+    base[~observed.any(axis=0)] = np.nan
+    return base
+
+
+def percent_change(start: np.ndarray, current: np.ndarray) -> np.ndarray:
+    """Element-wise % change from ``start`` to ``current``; NaN where start is missing or zero."""
+    start = np.asarray(start, dtype=np.float64)
+    current = np.asarray(current, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change = (current / start - 1) * 100
+    change[~np.isfinite(change)] = np.nan
+    return change
@@ -0,0 +1,75 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Callable, Optional
+
+from src.utils.timing import count
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter shared by threaded and asyncio callers.
+
+    Tokens refill continuously at ``rate_per_minute / 60`` per second up to
+    ``burst``. Callers reserve a token up front and are told how long to wait,
+    so concurrent callers queue in order instead of all sleeping a fixed delay.
+    ``clock`` and ``sleep`` can be swapped out in tests.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: Optional[int] = None,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        self.rate = rate_per_minute / 60.0
+        self.base_rate = self.rate
+        self.capacity = float(burst if burst is not None else max(1, int(rate_per_minute // 6)))
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = self.capacity
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """Take ``tokens`` from the bucket and return the seconds to wait before using them."""
+        with self._lock:
+            self._refill()
+            self.tokens -= tokens
+            return max(0.0, -self.tokens / self.rate)
+
+    def slow_down(self, factor: float = 0.5, floor_per_minute: float = 1.0) -> None:
+        """Cut the refill rate after a 429 and drop any saved-up burst."""
+        with self._lock:
+            self._refill()
+            self.rate = max(self.rate * factor, min(floor_per_minute / 60.0, self.base_rate))
+            self.tokens = min(self.tokens, 0.0)
+            logging.info(f"Rate limiter slowed to {self.rate * 60:.1f} requests/minute")
+
+    def recover(self, factor: float = 1.1) -> None:
+        """Move the refill rate back towards its configured value after a success."""
+        if self.rate >= self.base_rate:
+            return
+        with self._lock:
+            self._refill()
+            self.rate = min(self.base_rate, self.rate * factor)
+
+    def acquire(self) -> float:
+        """Block until a token is available. Returns the time spent waiting."""
+        wait = self.reserve()
+        if wait > 0:
+            logging.debug(f"Rate limiting: sleeping for {wait:.2f} seconds")
+            count("rate_limit_wait", wait)
+            self.sleep(wait)
+        return wait
+
+    async def acquire_async(self) -> float:
+        """Wait without blocking the event loop until a token is available."""
+        wait = self.reserve()
+        if wait > 0:
+            logging.debug(f"Rate limiting: sleeping for {wait:.2f} seconds")
+            count("rate_limit_wait", wait)
+            await asyncio.sleep(wait)
+        return wait
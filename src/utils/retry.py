@@ -0,0 +1,185 @@
+"""
+Retries, backoff and a circuit breaker for CoinGecko requests.
+
+Every request a ``CoinGeckoAPI`` sends, from synchronous code or from the
+async client's worker threads, goes through its ``RetryPolicy``:
+
+- 429s, 5xx responses and connection errors are retried up to
+  ``max_retries`` times. The wait follows ``Retry-After`` when the server
+  sends one, otherwise exponential backoff with jitter.
+- Each 429 halves the shared token bucket's rate (down to a floor) so all
+  concurrent callers slow down together; successes bring it back gradually.
+- Once ``breaker_failures`` requests in a row have failed for good, or
+  ``budget`` seconds have gone into retry waits, the breaker opens and every
+  further request raises ``CircuitOpen`` straight away.
+
+Per-endpoint counters of requests, retries, 429s, seconds waited and
+failures are kept for the run summary.
+"""
+import email.utils
+import logging
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, TypeVar
+
+from src.config import (
+    COINGECKO_BACKOFF_BASE, COINGECKO_BACKOFF_MAX, COINGECKO_BREAKER_FAILURES,
+    COINGECKO_MAX_RETRIES, COINGECKO_RETRY_BUDGET
+)
+from src.utils.rate_limit import TokenBucket
+from src.utils.timing import count
+
+T = TypeVar("T")
+
+
+class CircuitOpen(RuntimeError):
+    """Raised for every request once the breaker has tripped."""
+
+
+class RetryableError(Exception):
+    """
+    A failed attempt worth retrying.
+
+    Args:
+        message: What went wrong, for the log.
+        error: Exception re-raised once the retries are used up.
+        retry_after: Seconds the server asked us to wait, if it said.
+        rate_limited: True for 429 responses.
+    """
+
+    def __init__(self, message: str, error: Exception, retry_after: Optional[float] = None,
+                 rate_limited: bool = False):
+        super().__init__(message)
+        self.error = error
+        self.retry_after = retry_after
+        self.rate_limited = rate_limited
+
+
+@dataclass
+class EndpointStats:
+    """Counters for one endpoint pattern over a run."""
+
+    requests: int = 0
+    retries: int = 0
+    rate_limited: int = 0
+    waited: float = 0.0
+    failures: int = 0
+
+
+def endpoint_key(endpoint: str) -> str:
+    """Collapse coin ids so ``coins/bitcoin/market_chart`` counts as ``coins/{id}/market_chart``."""
+    return re.sub(r"^coins/(?!markets$|list$)[^/]+", "coins/{id}", endpoint)
+
+
+def parse_retry_after(value: Optional[str], now: Optional[float] = None) -> Optional[float]:
+    """Return the seconds a ``Retry-After`` header asks for (delta seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - (time.time() if now is None else now))
+
+
+class RetryPolicy:
+    """Retry loop, limiter feedback and circuit breaker shared by every request of one client."""
+
+    def __init__(self, limiter: TokenBucket, max_retries: int = COINGECKO_MAX_RETRIES,
+                 backoff_base: float = COINGECKO_BACKOFF_BASE, backoff_max: float = COINGECKO_BACKOFF_MAX,
+                 breaker_failures: int = COINGECKO_BREAKER_FAILURES, budget: float = COINGECKO_RETRY_BUDGET,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker_failures = breaker_failures
+        self.budget = budget
+        self.sleep = sleep
+        self.stats: Dict[str, EndpointStats] = {}
+        self.open_reason: Optional[str] = None
+        self._failures_in_row = 0
+        self._waited = 0.0
+        self._lock = threading.Lock()
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Seconds to wait before retry ``attempt`` (0-based)."""
+        if retry_after is not None:
+            # Follow the server, plus a little jitter so waiting callers do not return in lockstep
+            return min(retry_after, self.backoff_max) + random.uniform(0, 1)
+        cap = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+        return cap / 2 + random.uniform(0, cap / 2)
+
+    def _count(self, endpoint: str, **changes: float) -> None:
+        with self._lock:
+            stats = self.stats.setdefault(endpoint_key(endpoint), EndpointStats())
+            for name, value in changes.items():
+                setattr(stats, name, getattr(stats, name) + value)
+
+    def _trip(self, reason: str) -> None:
+        with self._lock:
+            if self.open_reason is None:
+                self.open_reason = reason
+                logging.error(f"Circuit breaker open, no further API requests this run: {reason}")
+
+    def call(self, endpoint: str, send: Callable[[], T]) -> T:
+        """Run ``send`` (one attempt at a request) with retries; raises ``CircuitOpen`` once tripped."""
+        for attempt in range(self.max_retries + 1):
+            if self.open_reason is not None:
+                raise CircuitOpen(self.open_reason)
+            self._count(endpoint, requests=1)
+            try:
+                result = send()
+            except RetryableError as e:
+                if e.rate_limited:
+                    self._count(endpoint, rate_limited=1)
+                    self.limiter.slow_down()
+                if attempt == self.max_retries:
+                    self._give_up(endpoint, f"{e} after {self.max_retries} retries")
+                    raise e.error
+                wait = self.backoff(attempt, e.retry_after)
+                with self._lock:
+                    self._waited += wait
+                    over_budget = self._waited > self.budget
+                if over_budget:
+                    self._give_up(endpoint, str(e))
+                    self._trip(f"retry waits exceeded {self.budget:.0f}s")
+                    raise CircuitOpen(self.open_reason) from e.error
+                self._count(endpoint, retries=1, waited=wait)
+                logging.warning(f"{e} for {endpoint}; retry {attempt + 1}/{self.max_retries} in {wait:.1f}s")
+                count("retry_wait", wait)
+                self.sleep(wait)
+                self.limiter.acquire()
+                continue
+            except Exception:
+                self._count(endpoint, failures=1)
+                raise
+            with self._lock:
+                self._failures_in_row = 0
+            self.limiter.recover()
+            return result
+        raise AssertionError("unreachable")
+
+    def _give_up(self, endpoint: str, reason: str) -> None:
+        logging.error(f"Giving up on {endpoint}: {reason}")
+        self._count(endpoint, failures=1)
+        with self._lock:
+            self._failures_in_row += 1
+            tripped = self._failures_in_row >= self.breaker_failures
+        if tripped:
+            self._trip(f"{self.breaker_failures} requests in a row failed")
+
+    def log_stats(self) -> None:
+        """Log one line of counters per endpoint pattern."""
+        for endpoint, stats in sorted(self.stats.items()):
+            logging.info(f"  {endpoint}: {stats.requests} requests, {stats.retries} retries, "
+                         f"{stats.rate_limited} rate limited, {stats.waited:.1f}s waited, {stats.failures} failed")
+        if self.open_reason is not None:
+            logging.error(f"  Circuit breaker opened: {self.open_reason}")
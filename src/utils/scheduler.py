@@ -0,0 +1,341 @@
+"""
+Dependency-aware chart scheduler.
+
+Charts declare the data they need as ``DataNeed`` objects. A run collects
+every chart's needs, fetches each distinct piece of data once in the main
+process (where the shared CoinGecko rate limiter lives), then renders the
+charts in a process pool so one failing chart does not stop the others.
+"""
+import asyncio
+import json
+import logging
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from multiprocessing.context import BaseContext
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from src.charts.registry import ChartSpec
+from src.config import CHART_OUTPUT, RUN_REPORT_FILE
+from src.utils.chart_output import sync_index_page
+from src.utils.coingecko_api import AsyncCoinGeckoClient, get_client
+from src.utils.cube import build_cube
+from src.utils.http_cache import is_offline, set_offline
+from src.utils.incremental import is_incremental, set_incremental, top_up_from_snapshot
+from src.utils.markets import fetch_snapshot
+from src.utils.store import MarketChartStore, today_index
+from src.utils.timing import stage, stage_metrics
+
+
+@dataclass(frozen=True)
+class DataNeed:
+    """
+    One piece of data a chart needs before it can render.
+
+    Needs are hashable so identical needs from different charts collapse
+    into a single fetch. Supported kinds:
+
+    - ``markets``: the top ``limit`` coins of the run's coins/markets
+      ``MarketSnapshot``.
+    - ``market_chart``: daily history in the local store for the selected
+      coins over ``days`` days; resolves to the list of coin ids. In
+      incremental mode, today's point comes from the coins/markets listing
+      for coins whose history already reaches yesterday. All selected
+      coins are then packed into the memory-mapped price cube
+      (``src/utils/cube.py``) that ``from_store`` slices.
+    - ``anchor_prices``: price of the selected coins on each date in
+      ``anchors`` (dd-mm-yyyy); resolves to ``{coin_id: prices}``.
+    - ``yfinance``: daily closes for ``symbols`` since ``start``
+      (YYYY-MM-DD), topped up with one batched download; resolves to a
+      calendar-day ``DayMatrix`` with NaN on non-trading days.
+
+    Coin selection follows ``MarketSnapshot.select``: the first ``limit``
+    coins of the listing, filtered by ``exclude`` and ``symbols``, then the
+    first ``top`` of those.
+    """
+
+    kind: str
+    params: Tuple[Tuple[str, Any], ...] = ()
+
+    @classmethod
+    def of(cls, kind: str, **params: Any) -> "DataNeed":
+        return cls(kind, tuple(sorted(params.items())))
+
+    def get(self, name: str, default: Any = None) -> Any:
+        return dict(self.params).get(name, default)
+
+
+@dataclass
+class ChartResult:
+    """Outcome of one chart in a scheduled run, with its render process's stage metrics."""
+
+    name: str
+    ok: bool
+    seconds: float = 0.0
+    error: str = ""
+    stages: Dict[str, Dict[str, float]] = field(default_factory=dict)
+
+
+def _selected_ids(need: DataNeed, results: Dict[DataNeed, Any]) -> List[str]:
+    markets = results.get(DataNeed.of("markets", limit=need.get("limit")))
+    if markets is None:
+        raise RuntimeError("coins/markets listing unavailable")
+    return markets.select(need.get("limit"), need.get("exclude", False),
+                          need.get("symbols"), need.get("top")).ids
+
+
+def anchor_timestamp_ms(date: str) -> int:
+    """Convert a dd-mm-yyyy date to a millisecond timestamp at 00:00 UTC."""
+    anchor = datetime.strptime(date, "%d-%m-%Y").replace(tzinfo=timezone.utc)
+    return int(anchor.timestamp() * 1000)
+
+
+async def _fetch_markets(client: AsyncCoinGeckoClient, needs: List[DataNeed],
+                         results: Dict[DataNeed, Any], store: MarketChartStore) -> None:
+    snapshot = await fetch_snapshot(client, max(need.get("limit") for need in needs))
+    for need in needs:
+        results[need] = snapshot.select(limit=need.get("limit"))
+
+
+async def _fetch_market_charts(client: AsyncCoinGeckoClient, needs: List[DataNeed],
+                               results: Dict[DataNeed, Any], store: MarketChartStore) -> None:
+    days_by_coin: Dict[str, int] = {}
+    ids_by_need = {need: _selected_ids(need, results) for need in needs}
+    for need, coin_ids in ids_by_need.items():
+        for coin_id in coin_ids:
+            days_by_coin[coin_id] = max(days_by_coin.get(coin_id, 0), need.get("days"))
+    coin_ids, first_day = list(days_by_coin), today_index() - max(days_by_coin.values(), default=0)
+    if is_incremental() and not is_offline():
+        # Today's point for coins that are otherwise up to date comes from the listing
+        snapshot = max((result for need, result in results.items() if need.kind == "markets"), key=len)
+        remaining = top_up_from_snapshot(store, snapshot, days_by_coin)
+        logging.info(f"Added today's point to {len(days_by_coin) - len(remaining)} coins from coins/markets")
+        days_by_coin = remaining
+    requests_made = await client.update_store(store, days_by_coin)
+    logging.info(f"Updated {requests_made} of {len(days_by_coin)} coins in the market_chart store")
+    # One memory-mapped array for the render processes to slice
+    if coin_ids:
+        await asyncio.to_thread(build_cube, store, coin_ids, first_day, today_index())
+    results.update(ids_by_need)
+
+
+async def _fetch_anchor_prices(client: AsyncCoinGeckoClient, needs: List[DataNeed],
+                               results: Dict[DataNeed, Any], store: MarketChartStore) -> None:
+    ids_by_need = {need: _selected_ids(need, results) for need in needs}
+    anchors = sorted({date for need in needs for date in need.get("anchors")}, key=anchor_timestamp_ms)
+    coin_ids = list(dict.fromkeys(coin_id for ids in ids_by_need.values() for coin_id in ids))
+    prices = await client.anchor_prices(store, coin_ids, [anchor_timestamp_ms(date) for date in anchors])
+    for need, ids in ids_by_need.items():
+        columns = [anchors.index(date) for date in need.get("anchors")]
+        results[need] = {coin_id: prices[coin_id][columns] for coin_id in ids if coin_id in prices}
+
+
+async def _fetch_yfinance(client: AsyncCoinGeckoClient, needs: List[DataNeed],
+                          results: Dict[DataNeed, Any], store: MarketChartStore) -> None:
+    # pandas is only needed for the yfinance download and resampling
+    from src.utils.yahoo import closes_matrix, closes_store, update_closes
+
+    closes = closes_store()
+    start = min(need.get("start") for need in needs)
+    symbols = sorted({symbol for need in needs for symbol in need.get("symbols")})
+    await asyncio.to_thread(update_closes, closes, symbols, start)
+    for need in needs:
+        results[need] = closes_matrix(closes, need.get("symbols"), need.get("start"))
+
+
+# kind -> (fetcher, kinds it depends on)
+FETCHERS: Dict[str, Tuple[Callable, Tuple[str, ...]]] = {
+    "markets": (_fetch_markets, ()),
+    "market_chart": (_fetch_market_charts, ("markets",)),
+    "anchor_prices": (_fetch_anchor_prices, ("markets",)),
+    "yfinance": (_fetch_yfinance, ()),
+}
+
+
+def _with_dependencies(needs: Iterable[DataNeed]) -> List[DataNeed]:
+    """Add the markets listings that coin selections are resolved against."""
+    needs = list(dict.fromkeys(needs))
+    for need in list(needs):
+        if "markets" in FETCHERS[need.kind][1]:
+            markets = DataNeed.of("markets", limit=need.get("limit"))
+            if markets not in needs:
+                needs.append(markets)
+    return needs
+
+
+async def fetch_all(needs: Iterable[DataNeed], client: Optional[AsyncCoinGeckoClient] = None,
+                    store: Optional[MarketChartStore] = None
+                    ) -> Tuple[Dict[DataNeed, Any], Dict[DataNeed, str]]:
+    """
+    Fetch every distinct need once, running each kind after the kinds it depends on.
+
+    Returns ``(results, errors)``; a failed kind marks all of its needs as errors.
+    """
+    client = client or get_client()
+    store = store or MarketChartStore()
+    by_kind: Dict[str, List[DataNeed]] = {}
+    for need in _with_dependencies(needs):
+        by_kind.setdefault(need.kind, []).append(need)
+
+    results: Dict[DataNeed, Any] = {}
+    errors: Dict[DataNeed, str] = {}
+    done: set = set()
+    while len(done) < len(by_kind):
+        ready = [kind for kind in by_kind if kind not in done
+                 and all(dep in done or dep not in by_kind for dep in FETCHERS[kind][1])]
+
+        async def run_kind(kind: str) -> None:
+            start = time.time()
+            try:
+                await FETCHERS[kind][0](client, by_kind[kind], results, store)
+                logging.info(f"Fetched {len(by_kind[kind])} {kind} need(s) in {time.time() - start:.1f}s")
+            except Exception as e:
+                logging.error(f"Failed to fetch {kind}: {e}")
+                for need in by_kind[kind]:
+                    errors[need] = f"{kind}: {e}"
+
+        await asyncio.gather(*(run_kind(kind) for kind in ready))
+        done.update(ready)
+    return results, errors
+
+
+def fetch_needs(needs: Dict[str, DataNeed]) -> Dict[str, Any]:
+    """Fetch a single chart's needs and return its data keyed like ``needs``."""
+    results, errors = asyncio.run(fetch_all(needs.values()))
+    for need in needs.values():
+        if need in errors:
+            raise RuntimeError(errors[need])
+    return {key: results[need] for key, need in needs.items()}
+
+
+def _init_worker(incremental: bool, offline: bool) -> None:
+    """
+    Process-pool initializer: carry the run's mode flags over to a render worker.
+
+    Under spawn or forkserver a worker imports the modules afresh, so flags
+    set in the parent after import would otherwise fall back to the config.
+    """
+    set_incremental(incremental)
+    set_offline(offline)
+
+
+def _render_chart(chart: ChartSpec, data: Dict[str, Any]) -> Tuple[float, Dict[str, Dict[str, float]]]:
+    """
+    Process-pool entry point: import a chart's module and render it from prefetched data.
+
+    Returns the wall time and the stage metrics recorded in the worker.
+    """
+    stage_metrics()  # drop anything inherited from the parent process
+    start = time.time()
+    try:
+        chart.render_chart(data)
+    except SystemExit as e:
+        raise RuntimeError(f"chart exited with status {e.code}")
+    return time.time() - start, stage_metrics()
+
+
+def run_charts(charts: Sequence[ChartSpec], max_workers: Optional[int] = None,
+               report_path: Path = RUN_REPORT_FILE, mp_context: Optional[BaseContext] = None
+               ) -> List[ChartResult]:
+    """
+    Fetch the data for all charts once, then render them in parallel.
+
+    A chart's module is imported only here, so a chart that fails to import, declare its needs,
+    fetch or render is reported in the returned results without stopping the others.
+    Stage metrics for the run are written to ``report_path``. ``mp_context`` picks the
+    render pool's start method (the platform default otherwise).
+    """
+    started = datetime.now(timezone.utc)
+    run_start = time.time()
+    outcomes: Dict[str, ChartResult] = {}
+    chart_needs: Dict[str, Dict[str, DataNeed]] = {}
+    by_name = {chart.name: chart for chart in charts}
+    for chart in charts:
+        try:
+            chart_needs[chart.name] = chart.data_needs()
+        except Exception as e:
+            logging.error(f"Could not load chart {chart.name}: {type(e).__name__}: {e}")
+            outcomes[chart.name] = ChartResult(chart.name, False, error=f"load: {e}")
+
+    start = time.time()
+    stage_metrics()
+    with stage("fetch"):
+        results, errors = asyncio.run(fetch_all(need for needs in chart_needs.values() for need in needs.values()))
+    logging.info(f"Fetch stage finished in {time.time() - start:.1f}s")
+    if not is_offline():
+        removed = get_client().api.cache.prune()
+        if removed:
+            logging.info(f"Pruned {removed} expired HTTP cache entries")
+    fetch_metrics = stage_metrics()
+
+    with ProcessPoolExecutor(max_workers=max_workers or max(1, len(chart_needs)), mp_context=mp_context,
+                             initializer=_init_worker, initargs=(is_incremental(), is_offline())) as pool:
+        futures = {}
+        for name, needs in chart_needs.items():
+            failed = [errors[need] for need in needs.values() if need in errors]
+            if failed:
+                outcomes[name] = ChartResult(name, False, error="; ".join(failed))
+                continue
+            data = {key: results[need] for key, need in needs.items()}
+            futures[pool.submit(_render_chart, by_name[name], data)] = name
+
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                seconds, stages = future.result()
+                outcomes[name] = ChartResult(name, True, seconds=seconds, stages=stages)
+            except Exception as e:
+                logging.error(f"Chart {name} failed: {e}")
+                logging.debug(traceback.format_exc())
+                outcomes[name] = ChartResult(name, False, error=str(e))
+
+    ordered = [outcomes[chart.name] for chart in charts]
+    if CHART_OUTPUT in ("json", "both") and any(result.ok for result in ordered):
+        # The specs just written target the installed plotly's plotly.js
+        sync_index_page()
+    log_summary(ordered)
+    retry = get_client().api.retry
+    logging.info("API requests by endpoint:")
+    retry.log_stats()
+    write_run_report(ordered, fetch_metrics, retry, started, time.time() - run_start, report_path)
+    return ordered
+
+
+def write_run_report(results: List[ChartResult], fetch_metrics: Dict[str, Dict[str, float]], retry: Any,
+                     started: datetime, seconds: float, path: Path = RUN_REPORT_FILE) -> Dict[str, Any]:
+    """
+    Write the run's stage metrics as JSON and return them.
+
+    ``waits`` adds up the seconds spent sleeping on the rate limiter and
+    between retries; concurrent requests wait in parallel, so it can exceed
+    the fetch stage's wall time.
+    """
+    stages = [fetch_metrics] + [result.stages for result in results]
+    waits = {key: sum(metrics.get(key, 0.0) for group in stages for metrics in group.values())
+             for key in ("rate_limit_wait", "retry_wait")}
+    report = {
+        "started": started.isoformat(timespec="seconds"),
+        "seconds": seconds,
+        "fetch": fetch_metrics,
+        "charts": [asdict(result) for result in results],
+        "api": {endpoint: asdict(stats) for endpoint, stats in sorted(retry.stats.items())},
+        "circuit_open": retry.open_reason,
+        "waits": waits,
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    logging.info(f"Run report written to {path} ({sum(waits.values()):.1f}s of waits in {seconds:.1f}s)")
+    return report
+
+
+def log_summary(results: List[ChartResult]) -> None:
+    """Log one line per chart and an overall count."""
+    for result in results:
+        status = "ok" if result.ok else f"FAILED ({result.error})"
+        logging.info(f"  {result.name}: {status} [{result.seconds:.1f}s]")
+    failed = sum(not result.ok for result in results)
+    logging.info(f"{len(results) - failed} of {len(results)} charts generated")
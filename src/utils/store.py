@@ -0,0 +1,279 @@
+"""
+Local columnar store for CoinGecko market_chart data.
+
+Each coin is kept as one ``.npz`` file holding an int32 array of UTC day
+numbers (days since the Unix epoch) and a float64 ``(days, 3)`` array with
+the price, market cap and total volume for that day. Runs only fetch the
+days after the last stored one and merge them in. Prices on fixed anchor dates for the whole
+coin universe live in a single ``AnchorPriceTable`` file alongside.
+
+Coins listed (or, for the backfill, served by the API plan) from a day
+inside the requested window can never cover all of it. The first day the API
+has for such a coin is recorded in ``_history_starts.json`` next to the
+per-coin files, so their history counts as complete from that day and later
+runs fetch only the new days.
+"""
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.config import RAW_DATA_DIR
+
+MS_PER_DAY = 86_400_000
+
+# Series names as returned by the market_chart endpoint, in column order
+SERIES = ("prices", "market_caps", "total_volumes")
+
+# Kept next to the per-coin files; coin ids never start with an underscore
+ANCHOR_TABLE_FILE = "_anchor_prices.npz"
+HISTORY_STARTS_FILE = "_history_starts.json"
+
+
+def today_index() -> int:
+    """Return the current UTC day as days since the Unix epoch."""
+    return int(time.time() // 86_400)
+
+
+def split_pairs(pairs: Sequence[Sequence[float]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Split ``[timestamp_ms, value]`` pairs into int64 timestamps and float64 values."""
+    if not len(pairs):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    arr = np.asarray(pairs, dtype=np.float64)
+    return arr[:, 0].astype(np.int64), arr[:, 1]
+
+
+def pairs_to_days(pairs: Sequence[Sequence[float]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Split ``[timestamp_ms, value]`` pairs into day numbers and values."""
+    timestamps, values = split_pairs(pairs)
+    return (timestamps // MS_PER_DAY).astype(np.int32), values
+
+
+def lookup_prices(pairs: Sequence[Sequence[float]], timestamps_ms: Sequence[int],
+                  tolerance_ms: int = MS_PER_DAY) -> np.ndarray:
+    """
+    Look up the value nearest to each timestamp in ``[timestamp_ms, value]`` pairs.
+
+    Timestamps with no point within ``tolerance_ms`` come back as NaN.
+    """
+    targets = np.asarray(timestamps_ms, dtype=np.float64)
+    if not len(pairs):
+        return np.full(len(targets), np.nan)
+    arr = np.asarray(pairs, dtype=np.float64)
+    arr = arr[np.argsort(arr[:, 0], kind="stable")]
+    idx = np.clip(np.searchsorted(arr[:, 0], targets), 1, max(len(arr) - 1, 1))
+    left = np.minimum(idx - 1, len(arr) - 1)
+    right = np.minimum(idx, len(arr) - 1)
+    nearest = np.where(np.abs(arr[left, 0] - targets) <= np.abs(arr[right, 0] - targets), left, right)
+    values = arr[nearest, 1]
+    values[np.abs(arr[nearest, 0] - targets) > tolerance_ms] = np.nan
+    return values
+
+
+def _last_per_day(days: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Keep the last value seen for each day, sorted by day."""
+    _, rev_idx = np.unique(days[::-1], return_index=True)
+    keep = len(days) - 1 - rev_idx
+    return days[keep], values[keep]
+
+
+class MarketChartStore:
+    """Per-coin daily arrays for prices, market caps and volumes, keyed by UTC day."""
+
+    def __init__(self, root: Optional[Path] = None):
+        self.root = Path(root) if root is not None else RAW_DATA_DIR / "market_chart"
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._history_starts: Optional[Dict[str, int]] = None
+
+    def _path(self, coin_id: str) -> Path:
+        return self.root / f"{coin_id}.npz"
+
+    def history_starts(self) -> Dict[str, int]:
+        """Return ``{coin_id: day}`` for coins whose first available day is known."""
+        if self._history_starts is None:
+            path = self.root / HISTORY_STARTS_FILE
+            self._history_starts = json.loads(path.read_text()) if path.exists() else {}
+        return self._history_starts
+
+    def history_start(self, coin_id: str) -> Optional[int]:
+        """Return the first day the API has data for a coin, or None if not known."""
+        return self.history_starts().get(coin_id)
+
+    def set_history_starts(self, starts: Dict[str, int]) -> None:
+        """Record the first available day of some coins and write the file atomically."""
+        if not starts:
+            return
+        merged = {**self.history_starts(), **{coin_id: int(day) for coin_id, day in starts.items()}}
+        path = self.root / HISTORY_STARTS_FILE
+        tmp_path = path.with_suffix(".tmp.json")
+        tmp_path.write_text(json.dumps(dict(sorted(merged.items())), indent=1))
+        os.replace(tmp_path, path)
+        self._history_starts = merged
+
+    def load(self, coin_id: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Return ``(days, values)`` for a coin, or empty arrays if nothing is stored."""
+        path = self._path(coin_id)
+        if not path.exists():
+            return np.empty(0, dtype=np.int32), np.empty((0, len(SERIES)), dtype=np.float64)
+        with np.load(path) as data:
+            return data["days"], data["values"]
+
+    def save(self, coin_id: str, days: np.ndarray, values: np.ndarray) -> None:
+        """Atomically write a coin's arrays to disk."""
+        path = self._path(coin_id)
+        tmp_path = path.with_suffix(".tmp.npz")
+        np.savez(tmp_path, days=days.astype(np.int32), values=values.astype(np.float64))
+        os.replace(tmp_path, path)
+
+    def last_day(self, coin_id: str) -> Optional[int]:
+        """Return the last stored day for a coin, or None if it has no data."""
+        days, _ = self.load(coin_id)
+        return int(days[-1]) if len(days) else None
+
+    def days_to_fetch(self, coin_id: str, days: int) -> int:
+        """
+        Number of days of market_chart history needed to cover the last ``days`` days.
+
+        Returns 0 when the store is already up to date. The last stored day is
+        always refetched because today's point is only a partial snapshot.
+        History only has to reach back to the coin's first available day,
+        where that is known.
+        """
+        stored_days, _ = self.load(coin_id)
+        today = today_index()
+        first_needed = max(today - days, self.history_start(coin_id) or today - days)
+        if not len(stored_days) or stored_days[0] > first_needed:
+            return days
+        return max(today - int(stored_days[-1]), 1)
+
+    def merge(self, coin_id: str, payload: Dict[str, List[List[float]]]) -> int:
+        """
+        Merge a market_chart payload into the store.
+
+        Newer points replace stored points for the same day; series missing
+        from the payload keep their stored values. Returns the number of
+        stored days.
+        """
+        return self.merge_arrays(coin_id, {name: split_pairs(pairs) for name, pairs in payload.items()
+                                           if name in SERIES})
+
+    def merge_arrays(self, coin_id: str, series: Dict[str, Tuple[np.ndarray, np.ndarray]]) -> int:
+        """Like ``merge``, for ``{series: (timestamps_ms, values)}`` arrays as parsed by ``json_stream``."""
+        empty = (np.empty(0, dtype=np.int64), np.empty(0))
+        columns = []
+        for name in SERIES:
+            timestamps, values = series.get(name, empty)
+            columns.append(_last_per_day((np.asarray(timestamps) // MS_PER_DAY).astype(np.int32),
+                                         np.asarray(values, dtype=np.float64)))
+        new_days = np.unique(np.concatenate([days for days, _ in columns]))
+        old_days, old_values = self.load(coin_id)
+        if not len(new_days):
+            return len(old_days)
+
+        merged_days = np.union1d(old_days, new_days).astype(np.int32)
+        merged_values = np.full((len(merged_days), len(SERIES)), np.nan)
+        merged_values[np.searchsorted(merged_days, old_days)] = old_values
+        for col, (days, values) in enumerate(columns):
+            idx = np.searchsorted(merged_days, days)
+            merged_values[idx, col] = values
+
+        self.save(coin_id, merged_days, merged_values)
+        logging.debug(f"Stored {len(merged_days)} days for {coin_id}")
+        return len(merged_days)
+
+    def window(self, coin_id: str, days: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return ``(days, values)`` for the last ``days`` days up to today."""
+        stored_days, values = self.load(coin_id)
+        mask = stored_days >= today_index() - days
+        return stored_days[mask], values[mask]
+
+    def values_on(self, coin_id: str, days: Sequence[int], series: str = "prices") -> np.ndarray:
+        """Return one series on specific days, NaN where the day is not stored."""
+        stored_days, values = self.load(coin_id)
+        days = np.asarray(days, dtype=np.int64)
+        out = np.full(len(days), np.nan)
+        if len(stored_days):
+            idx = np.minimum(np.searchsorted(stored_days, days), len(stored_days) - 1)
+            found = stored_days[idx] == days
+            out[found] = values[idx[found], SERIES.index(series)]
+        return out
+
+    def pairs(self, coin_id: str, days: int, series: str = "prices") -> List[List[float]]:
+        """Return one series as market_chart style ``[timestamp_ms, value]`` pairs."""
+        stored_days, values = self.window(coin_id, days)
+        col = values[:, SERIES.index(series)]
+        valid = ~np.isnan(col)
+        timestamps = stored_days[valid].astype(np.int64) * MS_PER_DAY
+        return np.column_stack([timestamps, col[valid]]).tolist()
+
+
+class AnchorPriceTable:
+    """
+    Prices of many coins on a few fixed days, kept in one ``.npz``.
+
+    Anchor days are in the past, so a price never changes once found. A coin
+    with no price on a day (listed later) is recorded as known-missing so it
+    is not asked for again. One file read answers a lookup for every coin,
+    instead of one store file or cached response per coin.
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path is not None else RAW_DATA_DIR / "market_chart" / ANCHOR_TABLE_FILE
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def load(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Return ``(ids, days, values, known)``; values and known are ``(ids, days)`` arrays."""
+        if not self.path.exists():
+            return (np.empty(0, dtype=str), np.empty(0, dtype=np.int64),
+                    np.empty((0, 0)), np.empty((0, 0), dtype=bool))
+        with np.load(self.path) as data:
+            return data["ids"], data["days"], data["values"], data["known"]
+
+    def lookup(self, coin_ids: Sequence[str], days: Sequence[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return ``(values, known)`` as ``(coins, days)`` arrays for the requested coins and days.
+
+        ``known`` is False where the table has never recorded the coin on that
+        day; ``values`` is NaN there and where the coin had no price.
+        """
+        ids, stored_days, stored_values, stored_known = self.load()
+        days = np.asarray(days, dtype=np.int64)
+        values = np.full((len(coin_ids), len(days)), np.nan)
+        known = np.zeros((len(coin_ids), len(days)), dtype=bool)
+        if not len(ids):
+            return values, known
+        rows = {coin_id: i for i, coin_id in enumerate(ids.tolist())}
+        found = np.array([coin_id in rows for coin_id in coin_ids], dtype=bool)
+        src_rows = np.array([rows[coin_id] for coin_id in coin_ids if coin_id in rows], dtype=np.int64)
+        cols = np.minimum(np.searchsorted(stored_days, days), max(len(stored_days) - 1, 0))
+        has_day = stored_days[cols] == days if len(stored_days) else np.zeros(len(days), dtype=bool)
+        values[np.ix_(found, has_day)] = stored_values[np.ix_(src_rows, cols[has_day])]
+        known[np.ix_(found, has_day)] = stored_known[np.ix_(src_rows, cols[has_day])]
+        return values, known
+
+    def update(self, coin_ids: Sequence[str], days: Sequence[int], values: np.ndarray) -> None:
+        """Record a ``(coins, days)`` block of prices (NaN for no price) and write the table atomically."""
+        if not len(coin_ids):
+            return
+        ids, stored_days, stored_values, stored_known = self.load()
+        merged_ids = np.array(list(dict.fromkeys(ids.tolist() + list(coin_ids))), dtype=str)
+        merged_days = np.union1d(stored_days, np.asarray(days, dtype=np.int64))
+        merged_values = np.full((len(merged_ids), len(merged_days)), np.nan)
+        merged_known = np.zeros(merged_values.shape, dtype=bool)
+        cols = np.searchsorted(merged_days, stored_days)
+        merged_values[np.ix_(np.arange(len(ids)), cols)] = stored_values
+        merged_known[np.ix_(np.arange(len(ids)), cols)] = stored_known
+
+        rows = {coin_id: i for i, coin_id in enumerate(merged_ids.tolist())}
+        new_rows = np.array([rows[coin_id] for coin_id in coin_ids], dtype=np.int64)
+        new_cols = np.searchsorted(merged_days, np.asarray(days, dtype=np.int64))
+        merged_values[np.ix_(new_rows, new_cols)] = values
+        merged_known[np.ix_(new_rows, new_cols)] = True
+
+        tmp_path = self.path.with_suffix(".tmp.npz")
+        np.savez(tmp_path, ids=merged_ids, days=merged_days, values=merged_values, known=merged_known)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,110 @@
+"""
+Named stages and counters for chart runs.
+
+Chart code wraps each phase in ``with stage("parse"):`` and friends; the
+fetch layer bumps counters with ``count()`` (HTTP requests and bytes,
+seconds slept on the rate limiter or between retries). Each stage records
+its wall time, the counters that moved while it ran and its memory use,
+accumulating per process until ``stage_metrics()`` collects them.
+
+``rss_growth_mb`` is how much the resident set grew while the stage ran,
+sampled from ``/proc/self/statm`` at entry and exit (Linux only).
+``process_max_rss_mb`` is the process's resident-set high-water mark when
+the stage ended (``resource``, not available on Windows); it covers the
+whole process, not the stage. When Python runs with ``-X tracemalloc`` the
+peak of traced allocations inside each stage is recorded as well.
+"""
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Counters every stage reports, even when they stay at zero
+COUNTERS = ("http_requests", "http_bytes", "rate_limit_wait", "retry_wait")
+
+_lock = threading.Lock()
+_counters: Dict[str, float] = dict.fromkeys(COUNTERS, 0.0)
+_stages: Dict[str, Dict[str, float]] = {}
+
+
+def count(name: str, value: float = 1) -> None:
+    """Add ``value`` to a process-wide counter; safe to call from worker threads."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0.0) + value
+
+
+def counters() -> Dict[str, float]:
+    with _lock:
+        return dict(_counters)
+
+
+def current_rss_mb() -> Optional[float]:
+    """Current resident memory of this process in MB, or None where ``/proc`` is missing."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident memory of this process in MB, or None where ``resource`` is missing."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Record wall time, counter deltas and memory use for the block under ``name``."""
+    before = counters()
+    rss_before = current_rss_mb()
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        after = counters()
+        with _lock:
+            metrics = _stages.setdefault(name, {"seconds": 0.0, "calls": 0})
+            metrics["seconds"] += seconds
+            metrics["calls"] += 1
+            for key in sorted(set(before) | set(after)):
+                metrics[key] = metrics.get(key, 0.0) + after.get(key, 0.0) - before.get(key, 0.0)
+            rss_after = current_rss_mb()
+            if rss_before is not None and rss_after is not None:
+                metrics["rss_growth_mb"] = metrics.get("rss_growth_mb", 0.0) + rss_after - rss_before
+            rss = peak_rss_mb()
+            if rss is not None:
+                metrics["process_max_rss_mb"] = max(metrics.get("process_max_rss_mb", 0.0), rss)
+            if tracing:
+                traced = tracemalloc.get_traced_memory()[1] / 2 ** 20
+                metrics["peak_traced_mb"] = max(metrics.get("peak_traced_mb", 0.0), traced)
+
+
+def stage_metrics(reset: bool = True) -> Dict[str, Dict[str, float]]:
+    """Return the metrics recorded per stage since the last reset."""
+    with _lock:
+        metrics = {name: dict(values) for name, values in _stages.items()}
+        if reset:
+            _stages.clear()
+    return metrics
+
+
+def stage_timings(reset: bool = True) -> Dict[str, float]:
+    """Return seconds spent per stage since the last reset."""
+    return {name: metrics["seconds"] for name, metrics in stage_metrics(reset).items()}
@@ -1,9 +1,18 @@
 import plotly.graph_objs as go
 from datetime import datetime
 import logging
+import numpy as np
 import pandas as pd
 from typing import Optional
 
+from src.utils.chart_output import write_chart
+
+def change_colors(change: np.ndarray) -> np.ndarray:
+    """Red for losses, blue for gains, with opacity growing to full at a 100% move."""
+    change = np.asarray(change, dtype=np.float64)
+    alpha = np.char.mod("%g)", np.minimum(np.abs(change) / 100, 1))
+    return np.char.add(np.where(change < 0, "rgba(255,0,0,", "rgba(0,0,255,"), alpha)
+
 def create_scatter_plot(df: pd.DataFrame, output_file: str, title: str) -> None:
     """Create an interactive scatter plot."""
     if df.empty:
@@ -11,10 +20,7 @@ def create_scatter_plot(df: pd.DataFrame, output_file: str, title: str) -> None:
         return
         
     # Create color gradient based on percentage change
-    colors = df['percent_change'].apply(lambda x: 
-        f'rgba(255,0,0,{min(abs(x)/100, 1)})' if x < 0 
-        else f'rgba(0,0,255,{min(abs(x)/100, 1)})'
-    )
+    colors = change_colors(df['percent_change'].to_numpy())
     
     # Create trace
     trace = go.Scatter(
@@ -80,14 +86,15 @@ def create_scatter_plot(df: pd.DataFrame, output_file: str, title: str) -> None:
     
     # Save to HTML
     try:
-        fig.write_html(
+        if write_chart(
+            fig,
             output_file,
             include_plotlyjs='cdn',
             full_html=True,
             include_mathjax=False,
             config={'displayModeBar': False}
-        )
-        logging.info(f"Chart saved to {output_file}")
+        ):
+            logging.info(f"Chart saved to {output_file}")
     except Exception as e:
         logging.error(f"Error saving chart: {e}")
         raise 
\ No newline at end of file
@@ -0,0 +1,102 @@
+"""
+Daily closes for traditional assets from Yahoo Finance.
+
+Closes are kept in a ``MarketChartStore`` (the ``prices`` column) under
+``RAW_DATA_DIR/yfinance``. A run makes at most one batched ``yf.download``
+for all symbols, starting from the earliest day any symbol is missing, so
+adding a benchmark does not add a round trip.
+
+The first trading day on or after a requested start can be days later
+(weekends, holidays), so the start each symbol was downloaded from is
+recorded in the store's history starts and counts as covered on later runs.
+"""
+import logging
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.config import RAW_DATA_DIR
+from src.utils.http_cache import is_offline
+from src.utils.matrix import DayMatrix, bin_by_day
+from src.utils.store import MS_PER_DAY, MarketChartStore, today_index
+from src.utils.timing import count
+
+
+def closes_store() -> MarketChartStore:
+    return MarketChartStore(RAW_DATA_DIR / "yfinance")
+
+
+def _download_closes(symbols: Sequence[str], start: str) -> pd.DataFrame:
+    """One batched download; returns a dates x symbols frame of closes."""
+    import yfinance as yf
+    count("http_requests")
+    frame = yf.download(list(symbols), start=start, interval='1d', group_by='column',
+                        progress=False, threads=True, multi_level_index=True)
+    if frame is None or frame.empty:
+        return pd.DataFrame(columns=list(symbols), dtype=float)
+    return frame["Close"]
+
+
+def _day_index(index: pd.Index) -> np.ndarray:
+    """Trading dates as UTC day numbers, ignoring the exchange time zone."""
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.values.astype("datetime64[D]").astype(np.int64)
+
+
+def fetch_start_day(store: MarketChartStore, symbols: Sequence[str], start_day: int) -> Optional[int]:
+    """
+    First day that has to be downloaded so every symbol covers ``start_day`` to today.
+
+    A symbol not yet downloaded from ``start_day`` or earlier is fetched in full;
+    otherwise from its last stored day, which may have been a partial close.
+    Returns None when every symbol already has today's close.
+    """
+    firsts = []
+    for symbol in symbols:
+        days, _ = store.load(symbol)
+        downloaded_from = store.history_start(symbol)
+        covered = len(days) and (days[0] <= start_day
+                                 or (downloaded_from is not None and downloaded_from <= start_day))
+        if not covered:
+            firsts.append(start_day)
+        elif days[-1] < today_index():
+            firsts.append(int(days[-1]))
+    return min(firsts) if firsts else None
+
+
+def update_closes(store: MarketChartStore, symbols: Sequence[str], start: str) -> int:
+    """Top up the closes store for ``symbols`` since ``start`` (YYYY-MM-DD); returns requests made."""
+    if is_offline():
+        logging.info("Offline mode: using stored yfinance closes as is")
+        return 0
+    start_day = int(np.datetime64(start, "D").astype(np.int64))
+    first = fetch_start_day(store, symbols, start_day)
+    if first is None:
+        return 0
+    from_date = str(np.datetime64(first, "D"))
+    closes = _download_closes(symbols, from_date)
+    days = _day_index(closes.index)
+    downloaded_from = {}
+    for symbol in symbols:
+        if symbol not in closes:
+            logging.warning(f"No yfinance data for {symbol} since {from_date}")
+            continue
+        values = closes[symbol].to_numpy(dtype=np.float64)
+        valid = ~np.isnan(values)
+        store.merge_arrays(symbol, {"prices": (days[valid] * MS_PER_DAY, values[valid])})
+        if first <= start_day and valid.any():
+            downloaded_from[symbol] = min(start_day, store.history_start(symbol) or start_day)
+    store.set_history_starts(downloaded_from)
+    logging.info(f"Downloaded {len(symbols)} yfinance symbols since {from_date} in one request")
+    return 1
+
+
+def closes_matrix(store: MarketChartStore, symbols: Sequence[str], start: str) -> DayMatrix:
+    """Calendar days x symbols matrix of stored closes from ``start`` to today; NaN on non-trading days."""
+    loaded = [store.load(symbol) for symbol in symbols]
+    first_day = int(np.datetime64(start, "D").astype(np.int64))
+    return bin_by_day([days for days, _ in loaded], [values[:, 0] for _, values in loaded],
+                      list(symbols), first_day=first_day, last_day=today_index())
@@ -1,9 +1,36 @@
+import functools
+import tempfile
 import unittest
-from datetime import datetime
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+from benchmarks.fake_coingecko import FakeCoinGecko
+from src.utils import api
 from src.utils.api import fetch_top_coins, fetch_historical_price
-from src.utils.data_processing import format_price, format_market_cap
+from src.utils.coingecko_api import AsyncCoinGeckoClient, CoinGeckoAPI
+from src.utils.data_processing import coin_table, format_market_caps, format_prices, format_price, format_market_cap
+from src.utils.http_cache import ResponseCache
+from src.utils.markets import fetch_snapshot
+from src.utils.visualization import change_colors
 
 class TestAPI(unittest.TestCase):
+    """Runs against the local CoinGecko stand-in instead of the live API."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        coingecko = CoinGeckoAPI(calls_per_minute=1e6, cache=ResponseCache(Path(tmp.name) / 'http', offline=False))
+        self.adapter = FakeCoinGecko(n_coins=50)
+        coingecko.session.mount('https://', self.adapter)
+        snapshot = functools.partial(fetch_snapshot, path=Path(tmp.name) / 'markets.npz')
+        for target, value in (('get_client', lambda: AsyncCoinGeckoClient(coingecko)),
+                              ('fetch_snapshot', snapshot)):
+            patcher = mock.patch.object(api, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
     def test_fetch_top_coins(self):
         coins = fetch_top_coins(limit=10)
         self.assertIsInstance(coins, list)
@@ -20,6 +47,14 @@ class TestAPI(unittest.TestCase):
         if price is not None:
             self.assertGreater(price, 0)
 
+    def test_fetch_historical_price_dd_mm_yyyy(self):
+        price = fetch_historical_price('bitcoin', '01-01-2024')
+        self.assertIsInstance(price, float)
+        self.assertGreater(price, 0)
+        # Closed days come from the response cache the second time
+        self.assertEqual(fetch_historical_price('bitcoin', '01-01-2024'), price)
+        self.assertEqual(self.adapter.stats['requests'], 1)
+
 class TestDataProcessing(unittest.TestCase):
     def test_format_price(self):
         self.assertEqual(format_price(1234.5678), '$1,234.57')
@@ -32,5 +67,19 @@ class TestDataProcessing(unittest.TestCase):
         self.assertEqual(format_market_cap(1000), '$1.00K')
         self.assertEqual(format_market_cap(1000000000000), '$1.00T')
 
+    def test_array_formatting_matches_scalar(self):
+        values = np.array([0.00012345, 0.01, 0.5, 999.999, 1234.5678, 1e6, 2.5e9, 3e12, 123456789012.3, np.nan])
+        self.assertEqual(format_prices(values).tolist(), [format_price(v) for v in values])
+        self.assertEqual(format_market_caps(values).tolist(), [format_market_cap(v) for v in values])
+        self.assertEqual(len(format_prices(np.array([]))), 0)
+
+    def test_coin_table(self):
+        df = coin_table(['a', 'b', 'c'], ['A', 'B', 'C'], [2e9, 5e6, 1e3],
+                        [1.0, np.nan, 2.0], [1.5, 3.0, 1.0])
+        self.assertEqual(df['id'].tolist(), ['a', 'c'])
+        self.assertEqual(df['percent_change_rounded'].tolist(), [50, -50])
+        self.assertEqual(df['market_cap_formatted'].tolist(), ['$2.00B', '$1.00K'])
+        self.assertEqual(change_colors(df['percent_change']).tolist(), ['rgba(0,0,255,0.5)', 'rgba(255,0,0,0.5)'])
+
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
@@ -0,0 +1,81 @@
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.fake_coingecko import FakeCoinGecko
+from src.utils.backfill import BackfillState, backfill, next_window
+from src.utils.coingecko_api import AsyncCoinGeckoClient, CoinGeckoAPI
+from src.utils.http_cache import ResponseCache
+from src.utils.store import MarketChartStore, today_index
+
+
+class TestBackfill(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        root = Path(tmp.name)
+        api = CoinGeckoAPI(calls_per_minute=1e6, cache=ResponseCache(root / 'http', offline=False))
+        self.adapter = FakeCoinGecko(n_coins=20)
+        api.session.mount('https://', self.adapter)
+        self.client = AsyncCoinGeckoClient(api)
+        self.store = MarketChartStore(root / 'store')
+        self.checkpoint = root / 'backfill.json'
+        self.coins = ['bitcoin', 'ethereum', 'ripple']
+        self.start_day = today_index() - 250
+
+    def run_backfill(self, **kwargs):
+        return asyncio.run(backfill(self.client, self.store, self.coins, self.start_day,
+                                    checkpoint=self.checkpoint, chunk_days=100, **kwargs))
+
+    def test_next_window_stops_at_start_day(self):
+        self.assertEqual(next_window(1000, 950, 100), range(950, 1000))
+        self.assertEqual(next_window(1000, 800, 100), range(900, 1000))
+
+    def test_interrupted_run_resumes_from_checkpoint(self):
+        # One batch of two coins, then the time budget is spent
+        self.run_backfill(batch_size=2, max_seconds=0)
+        state = BackfillState.load(self.checkpoint)
+        self.assertEqual(sorted(state.reached), ['bitcoin', 'ethereum'])
+        self.assertEqual(self.adapter.stats['requests'], 2)
+
+        state = self.run_backfill(batch_size=2)
+        self.assertTrue(all(state.done(self.store, coin_id, self.start_day) for coin_id in self.coins))
+        # 3 windows per coin: today-99.., today-199.., today-250..
+        self.assertEqual(self.adapter.stats['requests'], 9)
+        days, values = self.store.load('ripple')
+        self.assertEqual(int(days[0]), self.start_day)
+        np.testing.assert_array_equal(np.diff(days[days <= today_index() - 1]), 1)
+        self.assertFalse(np.isnan(values[:, :2]).any())
+
+        # Nothing left to do
+        self.run_backfill()
+        self.assertEqual(self.adapter.stats['requests'], 9)
+
+    def test_plan_limited_coins_are_marked_done(self):
+        # The second window of every coin reaches past what the plan serves
+        self.adapter.history_days = 150
+        state = self.run_backfill()
+        self.assertEqual(state.exhausted, set(self.coins))
+        self.assertEqual(self.adapter.stats['requests'], 6)
+        self.assertEqual(int(self.store.load('bitcoin')[0][0]), today_index() - 99)
+
+        self.run_backfill()
+        self.assertEqual(self.adapter.stats['requests'], 6)
+        # Daily runs only ask for the new days of what the plan serves
+        self.assertEqual(self.store.days_to_fetch('bitcoin', 250), 1)
+
+    def test_late_listing_is_recorded_and_not_refetched(self):
+        self.adapter.listed = {'ripple': today_index() - 40}
+        self.assertEqual(asyncio.run(self.client.update_store(self.store, {'ripple': 250})), 1)
+        self.assertEqual(self.store.history_start('ripple'), today_index() - 40)
+        self.assertEqual(self.store.days_to_fetch('ripple', 250), 1)
+        self.run_backfill()
+        self.assertEqual(self.store.history_start('ripple'), today_index() - 40)
+        self.assertEqual(int(self.store.load('ripple')[0][0]), today_index() - 40)
+
+
+if __name__ == '__main__':
+    unittest.main()
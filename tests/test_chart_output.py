@@ -0,0 +1,80 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objs as go
+
+from src.utils.chart_output import (
+    MANIFEST_NAME, TEMPLATES_NAME, figure_spec, plotlyjs_url, sync_index_page, write_chart
+)
+
+
+def figure(y):
+    return go.Figure(go.Scatter(x=[0, 1, 2], y=y, mode='lines'), layout=dict(title='Test'))
+
+
+class TestWriteChart(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = Path(tmp.name) / 'test_chart.html'
+
+    def test_unchanged_inputs_skip_render(self):
+        self.assertTrue(write_chart(figure([1, 2, 3]), self.path, include_plotlyjs='cdn'))
+        mtime = self.path.stat().st_mtime_ns
+        self.assertFalse(write_chart(figure([1, 2, 3]), self.path, include_plotlyjs='cdn'))
+        self.assertEqual(self.path.stat().st_mtime_ns, mtime)
+        self.assertTrue(write_chart(figure([1, 2, 4]), self.path, include_plotlyjs='cdn'))
+        manifest = json.loads((self.path.parent / MANIFEST_NAME).read_text())
+        self.assertEqual(list(manifest), ['test_chart.html'])
+
+    def test_output_is_deterministic(self):
+        write_chart(figure([1, 2, 3]), self.path, include_plotlyjs='cdn')
+        first = self.path.read_bytes()
+        (self.path.parent / MANIFEST_NAME).unlink()
+        self.assertTrue(write_chart(figure([1, 2, 3]), self.path, include_plotlyjs='cdn'))
+        self.assertEqual(self.path.read_bytes(), first)
+        self.assertIn(b'id="test-chart"', first)
+
+
+class TestFigureSpec(unittest.TestCase):
+    def test_compact_arrays_and_named_template(self):
+        fig = go.Figure(go.Scatter(x=pd.date_range('2025-04-02', periods=3), y=np.array([1.25, -2.5, 3.0]),
+                                   customdata=np.array([[1, 2], [3, 4], [5, 300]])),
+                        layout=dict(template='simple_white'))
+        spec = figure_spec(fig, {'displayModeBar': False})
+        trace = spec['data'][0]
+        self.assertEqual(trace['x'], ['2025-04-02', '2025-04-03', '2025-04-04'])
+        self.assertEqual(trace['y']['dtype'], 'f4')
+        self.assertEqual(trace['customdata']['dtype'], 'i2')
+        self.assertEqual(trace['customdata']['shape'], '3,2')
+        self.assertEqual(spec['layout']['template'], 'simple_white')
+        self.assertEqual(spec['config'], {'displayModeBar': False})
+
+    def test_json_output_writes_spec_and_templates(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'chart.html'
+            fig = figure([1, 2, 3]).update_layout(template='plotly_white')
+            self.assertTrue(write_chart(fig, path, output='json'))
+            self.assertFalse(path.exists())
+            spec = json.loads(path.with_suffix('.json').read_text())
+            self.assertEqual(spec['layout']['template'], 'plotly_white')
+            self.assertIn('plotly_white', json.loads((Path(tmp) / TEMPLATES_NAME).read_text()))
+            self.assertFalse(write_chart(fig, path, output='json'))
+
+
+class TestSyncIndexPage(unittest.TestCase):
+    def test_script_tag_follows_installed_plotly(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            page = Path(tmp) / 'index.html'
+            page.write_text('<script src="https://cdn.plot.ly/plotly-3.1.0.min.js" charset="utf-8"></script>')
+            self.assertTrue(sync_index_page(page))
+            self.assertEqual(page.read_text(), f'<script src="{plotlyjs_url()}" charset="utf-8"></script>')
+            self.assertFalse(sync_index_page(page))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+
+from benchmarks.fake_coingecko import FakeCoinGecko
+from src.utils.coingecko_api import AsyncCoinGeckoClient, CoinGeckoAPI
+from src.utils.http_cache import ResponseCache
+from src.utils.retry import CircuitOpen
+
+
+class TestGather(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        api = CoinGeckoAPI(calls_per_minute=1e6, cache=ResponseCache(Path(tmp.name) / 'http', offline=False))
+        self.adapter = FakeCoinGecko(n_coins=20)
+        api.session.mount('https://', self.adapter)
+        self.client = AsyncCoinGeckoClient(api, max_concurrency=3)
+
+    def test_concurrency_is_bounded_and_results_keep_item_order(self):
+        active, peak = [0], [0]
+
+        async def fetch(item):
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+            # Later items finish first
+            await asyncio.sleep(0.001 * (10 - item))
+            active[0] -= 1
+            if item == 4:
+                raise ValueError("bad item")
+            return item * 2
+
+        results = asyncio.run(self.client.gather(range(10), fetch))
+        self.assertEqual(peak[0], 3)
+        self.assertEqual(list(results), list(range(10)))
+        self.assertIsNone(results[4])
+        self.assertEqual(results[9], 18)
+
+    def test_open_circuit_propagates(self):
+        async def fetch(item):
+            raise CircuitOpen("tripped")
+
+        with self.assertRaises(CircuitOpen):
+            asyncio.run(self.client.gather([1, 2], fetch))
+
+    def test_market_chart_arrays_through_the_fake_api(self):
+        ids = [coin_id for coin_id, _ in self.adapter.coins[:8]][::-1]
+        payloads = asyncio.run(self.client.market_chart_arrays({coin_id: 30 for coin_id in ids}))
+        self.assertEqual(list(payloads), ids)
+        self.assertEqual(self.adapter.stats['requests'], 8)
+        timestamps, prices = payloads['bitcoin']['prices']
+        self.assertEqual(len(timestamps), 32)
+        self.assertEqual(set(payloads['bitcoin']), {'prices', 'market_caps'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import tempfile
+import unittest
+
+import numpy as np
+
+from src.utils.cube import build_cube, open_cube
+from src.utils.store import MS_PER_DAY, MarketChartStore
+
+
+class TestPriceCube(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.store = MarketChartStore(f"{tmp.name}/store")
+        self.root = f"{tmp.name}/cube"
+        for offset, coin_id in enumerate(['bitcoin', 'ethereum']):
+            days = np.arange(100, 110)
+            self.store.merge_arrays(coin_id, {"prices": (days * MS_PER_DAY, days + offset * 1000.0),
+                                              "market_caps": (days * MS_PER_DAY, days * 10.0)})
+
+    def test_slices_match_the_store(self):
+        build_cube(self.store, ['bitcoin', 'ethereum', 'unlisted'], 95, 109, self.root)
+        cube = open_cube(self.root)
+        self.assertIsInstance(cube.values, np.memmap)
+        self.assertTrue(cube.covers(self.store, ['ethereum', 'unlisted'], 100, 109))
+        self.assertFalse(cube.covers(self.store, ['solana'], 100, 109))
+        self.assertFalse(cube.covers(self.store, ['bitcoin'], 90, 109))
+        self.assertFalse(cube.covers(MarketChartStore(f"{self.root}/other"), ['bitcoin'], 100, 109))
+
+        prices = cube.slice(['ethereum', 'bitcoin', 'unlisted'], 98, 101)
+        np.testing.assert_array_equal(prices[:, 0], [np.nan, np.nan, 1100.0, 1101.0])
+        np.testing.assert_array_equal(prices[:, 1], [np.nan, np.nan, 100.0, 101.0])
+        self.assertTrue(np.isnan(prices[:, 2]).all())
+        np.testing.assert_array_equal(cube.slice(['bitcoin'], 109, 109, 'market_caps'), [[1090.0]])
+
+    def test_rebuild_replaces_the_data_file(self):
+        first = build_cube(self.store, ['bitcoin'], 100, 109, self.root)
+        second = build_cube(self.store, ['bitcoin', 'ethereum'], 100, 109, self.root)
+        self.assertEqual(open_cube(self.root).coins, ['bitcoin', 'ethereum'])
+        # The old mapping stays readable after its file is replaced
+        self.assertEqual(float(first.values[0, 0, 0]), float(second.values[0, 0, 0]))
+
+    def test_missing_cube(self):
+        self.assertIsNone(open_cube(self.root))
+
+
+if __name__ == '__main__':
+    unittest.main()
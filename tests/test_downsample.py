@@ -0,0 +1,52 @@
+import unittest
+
+import numpy as np
+
+from src.utils.downsample import downsample_indices, lttb, trace_points
+
+
+class TestDownsample(unittest.TestCase):
+    def test_short_series_is_untouched(self):
+        np.testing.assert_array_equal(lttb(np.arange(5), np.ones(5), 10), np.arange(5))
+        np.testing.assert_array_equal(downsample_indices(np.arange(4), [1.0, np.nan, 2.0, 3.0], 10), [0, 1, 2, 3])
+
+    def test_budget_ends_and_extremes_are_kept(self):
+        rng = np.random.default_rng(3)
+        y = np.cumsum(rng.normal(size=5000))
+        y[1234] = y.max() + 50
+        idx = downsample_indices(np.arange(5000), y, 200)
+        self.assertLessEqual(len(idx), 202)
+        self.assertTrue(np.all(np.diff(idx) > 0))
+        self.assertTrue({0, 4999, 1234, int(np.argmin(y))} <= set(idx.tolist()))
+
+    def test_gaps_stay_gaps(self):
+        y = np.sin(np.arange(3000) / 50.0)
+        y[:100] = np.nan  # not listed yet
+        y[1000:1200] = np.nan
+        y[2000:2001] = np.nan
+        idx = downsample_indices(np.arange(3000), y, 100)
+        self.assertTrue({1000, 2000} <= set(idx.tolist()))
+        self.assertEqual(int(np.count_nonzero(np.isnan(y[idx]))), 2)
+        self.assertEqual(int(idx[0]), 100)
+        points = trace_points(np.arange(3000), y, max_points=100, tiers=True)
+        self.assertTrue(np.isnan(points['y']).any())
+        self.assertEqual(sum(v == v for v in points['meta']['tiers'][-1]['y']), 2699)
+
+    def test_lttb_keeps_a_spike(self):
+        y = np.zeros(1000)
+        y[500] = 10.0
+        self.assertIn(500, lttb(np.arange(1000), y, 20).tolist())
+
+    def test_zoom_tiers_end_at_full_detail(self):
+        dates = np.arange('2024-01-01', '2026-01-01', dtype='datetime64[D]')
+        y = np.sin(np.arange(len(dates)) / 10.0)
+        points = trace_points(dates, y, max_points=100, tiers=True)
+        tiers = points['meta']['tiers']
+        self.assertEqual(len(tiers[0]['x']), len(points['x']))
+        self.assertEqual(len(tiers[-1]['y']), len(dates))
+        self.assertEqual(tiers[-1]['x'][0], '2024-01-01T00:00:00')
+        self.assertNotIn('meta', trace_points(dates, y, max_points=100, tiers=False))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+import warnings
+
+import numpy as np
+
+from src.utils.events import (
+    DropIndex, average_performance, bootstrap_mean_ci, column_percentiles, event_windows, find_drop_events,
+    merge_runs, percentile_bands
+)
+
+
+def _crash_series():
+    """Flat at 100, a two-step crash bottoming at day 30, then a recovery."""
+    values = np.full(200, 100.0)
+    values[20:31] = np.linspace(100, 70, 11)
+    values[31:40] = np.linspace(72, 90, 9)
+    values[40:] = 90.0
+    return values
+
+
+class TestEvents(unittest.TestCase):
+    def test_overlapping_flags_merge_into_one_trough_anchored_event(self):
+        day0 = find_drop_events(_crash_series(), threshold=0.10, lookback=7, horizon=90)
+        np.testing.assert_array_equal(day0, [30])
+
+    def test_events_without_full_horizon_are_dropped(self):
+        self.assertEqual(len(find_drop_events(_crash_series(), horizon=180)), 0)
+
+    def test_merge_runs_respects_gap(self):
+        flagged = np.zeros(30, dtype=bool)
+        flagged[[3, 4, 8, 20]] = True
+        np.testing.assert_array_equal(merge_runs(flagged, max_gap=4), [[3, 8], [20, 20]])
+
+    def test_event_windows_are_normalized_to_day0(self):
+        matrix = np.column_stack([np.arange(1.0, 11.0), np.full(10, 5.0)])
+        windows = event_windows(matrix, np.array([1, 7]), horizon=4)
+        self.assertEqual(windows.shape, (2, 5, 2))
+        np.testing.assert_allclose(windows[0, :, 0], [0, 50, 100, 150, 200])
+        self.assertTrue(np.isnan(windows[1, 3:, 0]).all())
+        np.testing.assert_allclose(average_performance(windows)[:, 1], 0)
+
+
+
+class TestDropIndex(unittest.TestCase):
+    def test_grid_matches_find_drop_events(self):
+        rng = np.random.default_rng(7)
+        values = np.exp(np.cumsum(rng.normal(0, 0.05, 400)))
+        values[[50, 51, 200]] = np.nan
+        index = DropIndex(values, lookbacks=(3, 7, 14))
+        for (threshold, lookback), day0 in index.grid((0.05, 0.10, 0.20), (3, 7, 14)).items():
+            np.testing.assert_array_equal(day0, find_drop_events(values, threshold, lookback, horizon=90))
+
+    def test_range_argmin_prefers_earliest_and_skips_nan(self):
+        index = DropIndex(np.array([3.0, 1.0, np.nan, 1.0, 0.5, 2.0]))
+        np.testing.assert_array_equal(index.range_argmin([0, 0, 2, 5], [3, 5, 2, 5]), [1, 4, 2, 5])
+
+    def test_unindexed_lookback(self):
+        with self.assertRaises(ValueError):
+            DropIndex(_crash_series(), lookbacks=(7,)).events(0.10, 5)
+
+
+
+class TestSpread(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(11)
+        self.windows = rng.normal(0, 10, (12, 30, 2))
+        self.windows[3, 20:, 1] = np.nan
+
+    def test_column_percentiles_match_nanpercentile(self):
+        values = self.windows.reshape(12, -1).copy()
+        values[:, 5] = np.nan
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            expected = np.nanpercentile(values, [5, 50, 95], axis=0)
+        np.testing.assert_allclose(column_percentiles(values, [5, 50, 95]), expected, equal_nan=True)
+        self.assertEqual(percentile_bands(self.windows).shape, (3, 30, 2))
+
+    def test_bootstrap_interval_brackets_the_mean(self):
+        lower, upper = bootstrap_mean_ci(self.windows, confidence=0.9, n_resamples=500)
+        mean = average_performance(self.windows)
+        self.assertTrue(np.all(lower <= mean) and np.all(mean <= upper))
+        # Same seed, same interval
+        np.testing.assert_array_equal(lower, bootstrap_mean_ci(self.windows, 0.9, 500)[0])
+
+    def test_bootstrap_of_one_event_collapses(self):
+        lower, upper = bootstrap_mean_ci(self.windows[:1], n_resamples=50)
+        np.testing.assert_allclose(lower, self.windows[0])
+        np.testing.assert_allclose(upper, self.windows[0])
+        self.assertTrue(np.isnan(bootstrap_mean_ci(self.windows[:0])[0]).all())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import calendar
+import json
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from src.config import HTTP_CACHE_TTL
+from src.utils.http_cache import OfflineCacheMiss, ResponseCache, ttl_for
+
+
+class TestTtl(unittest.TestCase):
+    def setUp(self):
+        self.now = calendar.timegm((2025, 5, 10, 12, 0, 0))
+
+    def test_closed_days_never_expire(self):
+        self.assertIsNone(ttl_for('coins/bitcoin/history', {'date': '09-05-2025'}, self.now))
+        self.assertIsNone(ttl_for('coins/bitcoin/market_chart/range',
+                                  {'from': 0, 'to': self.now - 86_400}, self.now))
+
+    def test_live_data_expires(self):
+        self.assertEqual(ttl_for('coins/bitcoin/history', {'date': '10-05-2025'}, self.now), HTTP_CACHE_TTL)
+        self.assertEqual(ttl_for('coins/markets', {'page': 1}, self.now), HTTP_CACHE_TTL)
+        self.assertEqual(ttl_for('coins/bitcoin/market_chart', {'days': 7}, self.now), HTTP_CACHE_TTL)
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_fresh_entries_are_served(self):
+        cache = ResponseCache(self.tmp.name, offline=False)
+        cache.put('coins/markets', {'page': 1}, b'[1, 2]', etag='"abc"', ttl=60)
+        self.assertEqual(cache.lookup('coins/markets', {'page': 1}).json(), [1, 2])
+        self.assertIsNone(cache.lookup('coins/markets', {'page': 2}))
+
+    def test_stale_entries_need_revalidation(self):
+        cache = ResponseCache(self.tmp.name, offline=False)
+        entry = cache.put('coins/markets', {'page': 1}, b'[]', etag='"abc"', ttl=60)
+        entry.stored_at = time.time() - 120
+        cache.put('coins/markets', {'page': 1}, entry.body, entry.etag, ttl=-1)
+        self.assertIsNone(cache.lookup('coins/markets', {'page': 1}))
+        stale = cache.get('coins/markets', {'page': 1})
+        self.assertEqual(ResponseCache.conditional_headers(stale), {'If-None-Match': '"abc"'})
+
+    def test_offline_serves_stale_and_raises_on_miss(self):
+        ResponseCache(self.tmp.name, offline=False).put('coins/markets', {'page': 1}, b'[]', ttl=-1)
+        cache = ResponseCache(self.tmp.name, offline=True)
+        self.assertEqual(cache.lookup('coins/markets', {'page': 1}).json(), [])
+        with self.assertRaises(OfflineCacheMiss):
+            cache.lookup('coins/markets', {'page': 2})
+
+    def test_store_bound_bodies_are_not_written(self):
+        cache = ResponseCache(self.tmp.name, offline=False)
+        params = {'from': 0, 'to': 86_400}
+        cache.put('coins/bitcoin/market_chart/range', params, b'{}')
+        cache.put('coins/bitcoin/market_chart', {'days': 7}, b'{}')
+        self.assertIsNone(cache.get('coins/bitcoin/market_chart/range', params))
+        self.assertEqual(list(Path(self.tmp.name).iterdir()), [])
+
+    def test_prune_drops_long_expired_and_legacy_entries(self):
+        cache = ResponseCache(self.tmp.name, offline=False)
+        now = time.time()
+        cache.put('coins/markets', {'page': 1}, b'[]', ttl=60)
+        cache.put('coins/markets', {'page': 2}, b'[]', ttl=-1000)
+        cache.put('coins/bitcoin/history', {'date': '01-01-2024'}, b'{}')
+        cache.put('coins/markets', {'page': 3}, b'[]', ttl=60)
+        meta_path = Path(self.tmp.name) / f"{cache.key('coins/markets', {'page': 3})}.json"
+        meta_path.write_text(json.dumps({'stored_at': now, 'ttl': 60, 'etag': None, 'last_modified': None}))
+
+        self.assertEqual(cache.prune(max_stale=500, now=now), 2)
+        self.assertIsNotNone(cache.get('coins/markets', {'page': 1}))
+        self.assertIsNotNone(cache.get('coins/bitcoin/history', {'date': '01-01-2024'}))
+        self.assertIsNone(cache.get('coins/markets', {'page': 2}))
+        self.assertEqual(len(list(Path(self.tmp.name).iterdir())), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
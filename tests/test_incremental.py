@@ -0,0 +1,117 @@
+import tempfile
+import unittest
+
+import numpy as np
+
+from src.utils import incremental
+from src.utils.incremental import SeriesStore, daily_series, top_up_from_snapshot, with_columns, with_day
+from src.utils.markets import MarketSnapshot
+from src.utils.matrix import DayMatrix
+from src.utils.store import MS_PER_DAY, MarketChartStore, today_index
+
+
+def series(last_day, n=3):
+    days = np.arange(last_day - n + 1, last_day + 1)
+    return DayMatrix(days, ['a', 'b'], np.column_stack([np.arange(n, dtype=float), np.ones(n)]))
+
+
+class TestSeriesStore(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.store = SeriesStore(tmp.name)
+        incremental.set_incremental(True)
+        self.addCleanup(incremental.set_incremental, False)
+
+    def test_round_trip_and_param_change(self):
+        self.store.save('s', series(100), {'anchor': 1}, {'base': np.array([2.0, 3.0])})
+        matrix, extras = self.store.load('s', {'anchor': 1})
+        np.testing.assert_array_equal(matrix.values, series(100).values)
+        self.assertEqual(extras['base'].tolist(), [2.0, 3.0])
+        self.assertIsNone(self.store.load('s', {'anchor': 2}))
+
+    def test_corrupt_series_fails_checksum(self):
+        self.store.save('s', series(100), {})
+        path = self.store._path('s')
+        with np.load(path) as data:
+            arrays = dict(data)
+        arrays['values'] = arrays['values'] + 1
+        np.savez(path, **arrays)
+        self.assertIsNone(self.store.load('s', {}))
+
+    def test_with_day(self):
+        self.assertEqual(with_day(series(100), 101, [9, 9]).days[-1], 101)
+        replaced = with_day(series(100), 100, [9, 9])
+        self.assertEqual(len(replaced.days), 3)
+        self.assertEqual(replaced.values[-1].tolist(), [9, 9])
+        self.assertIsNone(with_day(series(100), 103, [9, 9]))
+
+    def test_daily_series_only_adds_today(self):
+        today = today_index()
+        computed = []
+
+        def compute():
+            computed.append(True)
+            return series(today - 1), {}
+
+        latest = lambda matrix, extras: np.array([7.0, 7.0])
+        daily_series('s', {}, compute, latest, self.store)
+        matrix, _ = daily_series('s', {}, compute, latest, self.store)
+        self.assertEqual(len(computed), 1)
+        self.assertEqual(matrix.days[-1], today)
+        self.assertEqual(matrix.values[-1].tolist(), [7.0, 7.0])
+
+        # A gap forces a full recompute
+        self.store.save('s', series(today - 5), {})
+        daily_series('s', {}, compute, latest, self.store)
+        self.assertEqual(len(computed), 2)
+
+    def test_changed_columns_keep_the_stored_series(self):
+        today = today_index()
+        computed, loaded = [], []
+
+        def compute():
+            computed.append(True)
+            return series(today - 1), {}
+
+        def load_columns(names, days):
+            loaded.append((names, days.tolist()))
+            return np.full((len(days), len(names)), 5.0)
+
+        latest = lambda matrix, extras: np.arange(len(matrix.columns), dtype=float)
+        daily_series('s', {}, compute, latest, self.store, columns=['a', 'b'], load_columns=load_columns)
+        matrix, _ = daily_series('s', {}, compute, latest, self.store, columns=['c', 'a'],
+                                 load_columns=load_columns)
+        self.assertEqual(len(computed), 1)
+        self.assertEqual(loaded, [(['c'], list(range(today - 3, today)))])
+        self.assertEqual(matrix.columns, ['c', 'a'])
+        np.testing.assert_array_equal(matrix.values[:-1], [[5.0, 0.0], [5.0, 1.0], [5.0, 2.0]])
+        self.assertEqual(matrix.values[-1].tolist(), [0.0, 1.0])
+
+    def test_with_columns_drops_and_orders(self):
+        matrix = with_columns(series(100), ['b'], None)
+        self.assertEqual(matrix.columns, ['b'])
+        np.testing.assert_array_equal(matrix.values[:, 0], np.ones(3))
+
+
+class TestTopUp(unittest.TestCase):
+    def test_only_up_to_date_coins_are_topped_up(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        store = MarketChartStore(tmp.name)
+        today = today_index()
+        store.merge_arrays('fresh', {'prices': (np.arange(today - 10, today) * MS_PER_DAY, np.ones(10))})
+        store.merge_arrays('stale', {'prices': (np.arange(today - 10, today - 3) * MS_PER_DAY, np.ones(7))})
+        snapshot = MarketSnapshot.from_listing([
+            {'id': coin_id, 'symbol': coin_id, 'current_price': 2.0, 'market_cap': 20.0}
+            for coin_id in ('fresh', 'stale', 'new')
+        ])
+        remaining = top_up_from_snapshot(store, snapshot, {'fresh': 5, 'stale': 5, 'new': 5})
+        self.assertEqual(remaining, {'stale': 5, 'new': 5})
+        days, values = store.load('fresh')
+        self.assertEqual(days[-1], today)
+        self.assertEqual(values[-1, :2].tolist(), [2.0, 20.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import json
+import unittest
+
+import numpy as np
+
+from src.utils.json_stream import MarketChartParser, parse_market_chart
+
+PAYLOAD = {
+    'prices': [[1714521600000, 60666.6], [1714608000000, 57694.1], [1714694400000, None],
+               [1714780800000, 1.5e-05]],
+    'market_caps': [[1714521600000, 1.19e12], [1714608000000, 1.13e12]],
+    'total_volumes': [[1714521600000, 3.1e10]],
+}
+
+
+class TestMarketChartParser(unittest.TestCase):
+    def test_matches_json_loads(self):
+        result = parse_market_chart(json.dumps(PAYLOAD).encode(), ('prices', 'market_caps'))
+        timestamps, values = result['prices']
+        self.assertEqual(timestamps.dtype, np.int64)
+        self.assertEqual(timestamps.tolist(), [t for t, _ in PAYLOAD['prices']])
+        np.testing.assert_array_equal(values, [60666.6, 57694.1, np.nan, 1.5e-05])
+        self.assertEqual(result['market_caps'][1].tolist(), [1.19e12, 1.13e12])
+        self.assertNotIn('total_volumes', result)
+
+    def test_any_chunking_gives_the_same_arrays(self):
+        body = json.dumps(PAYLOAD, indent=1).encode()
+        expected = parse_market_chart(body, ('prices',))['prices']
+        for size in (1, 2, 7, 13):
+            parser = MarketChartParser(('prices',), size_hint=1)
+            for i in range(0, len(body), size):
+                parser.feed(body[i:i + size])
+            timestamps, values = parser.result()['prices']
+            np.testing.assert_array_equal(timestamps, expected[0])
+            np.testing.assert_array_equal(values, expected[1])
+
+    def test_empty_and_missing_series(self):
+        result = parse_market_chart(b'{"prices": [], "total_volumes": [[1, 2]]}', ('prices', 'market_caps'))
+        self.assertEqual(len(result['prices'][0]), 0)
+        self.assertEqual(len(result['market_caps'][1]), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
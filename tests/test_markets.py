@@ -0,0 +1,56 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.utils.coingecko_api import run
+from src.utils.markets import MarketSnapshot, fetch_snapshot
+
+LISTING = [
+    {'id': 'bitcoin', 'symbol': 'btc', 'name': 'Bitcoin', 'current_price': 90000.0,
+     'market_cap': 1.8e12, 'market_cap_rank': 1},
+    {'id': 'tether', 'symbol': 'usdt', 'name': 'Tether', 'current_price': 1.0,
+     'market_cap': 1.4e11, 'market_cap_rank': 2},
+    {'id': 'ethereum', 'symbol': 'eth', 'name': 'Ethereum', 'current_price': 3000.0,
+     'market_cap': 3.6e11, 'market_cap_rank': 3},
+    {'id': 'new-coin', 'symbol': 'NEW', 'name': None, 'current_price': None,
+     'market_cap': None, 'market_cap_rank': None},
+]
+
+
+class FakeClient:
+    def __init__(self):
+        self.calls = 0
+
+    async def top_markets(self, limit):
+        self.calls += 1
+        return LISTING[:limit]
+
+
+class TestMarketSnapshot(unittest.TestCase):
+    def test_select_excludes_and_filters_symbols(self):
+        snapshot = MarketSnapshot.from_listing(LISTING)
+        self.assertEqual(snapshot.select(exclude=True, top=2).ids, ['bitcoin', 'ethereum'])
+        self.assertEqual(snapshot.select(limit=2, exclude=True).ids, ['bitcoin'])
+        self.assertEqual(snapshot.select(symbols=['new', 'eth']).ids, ['ethereum', 'new-coin'])
+
+    def test_records_round_trip(self):
+        records = MarketSnapshot.from_listing(LISTING).records()
+        self.assertEqual(records[0]['current_price'], 90000.0)
+        self.assertEqual(records[3]['name'], 'new-coin')
+        self.assertEqual(records[3]['market_cap_rank'], 0)
+
+    def test_cached_snapshot_is_reused_within_ttl(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "markets.npz"
+            client = FakeClient()
+            run(fetch_snapshot(client, 3, ttl=60, path=path))
+            cached = run(fetch_snapshot(client, 2, ttl=60, path=path))
+            self.assertEqual(client.calls, 1)
+            self.assertEqual(len(cached), 3)
+            # A larger request or an expired snapshot refetches
+            run(fetch_snapshot(client, 4, ttl=60, path=path))
+            self.assertEqual(client.calls, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
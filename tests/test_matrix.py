@@ -0,0 +1,38 @@
+import unittest
+
+import numpy as np
+
+from src.utils.matrix import build_day_matrix
+from src.utils.store import MS_PER_DAY
+
+
+class TestDayMatrix(unittest.TestCase):
+    def setUp(self):
+        self.matrix = build_day_matrix({
+            # Two points on day 10 are averaged; day 11 is a gap
+            "bitcoin": [[10 * MS_PER_DAY, 1.0], [10 * MS_PER_DAY + 3_600_000, 3.0], [12 * MS_PER_DAY, 4.0]],
+            "ethereum": [[11 * MS_PER_DAY, 5.0], [12 * MS_PER_DAY, 6.0]],
+        })
+
+    def test_bins_by_day_and_masks_gaps(self):
+        np.testing.assert_array_equal(self.matrix.days, [10, 11, 12])
+        np.testing.assert_array_equal(self.matrix.column("bitcoin")[[0, 2]], [2.0, 4.0])
+        np.testing.assert_array_equal(self.matrix.mask, [[True, False], [False, True], [True, True]])
+
+    def test_ffill_keeps_leading_gaps(self):
+        filled = self.matrix.ffill()
+        np.testing.assert_array_equal(filled.column("bitcoin"), [2.0, 2.0, 4.0])
+        self.assertTrue(np.isnan(filled.column("ethereum")[0]))
+
+    def test_total_ignores_gaps_and_exclusions(self):
+        np.testing.assert_array_equal(self.matrix.total(), [2.0, 5.0, 10.0])
+        np.testing.assert_array_equal(self.matrix.total(exclude=["bitcoin"]), [0.0, 5.0, 6.0])
+
+    def test_explicit_day_range(self):
+        matrix = build_day_matrix({"bitcoin": [[10 * MS_PER_DAY, 1.0]]}, first_day=9, last_day=11)
+        self.assertEqual(matrix.values.shape, (3, 1))
+        self.assertEqual(matrix.values[1, 0], 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
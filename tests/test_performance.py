@@ -0,0 +1,43 @@
+import unittest
+
+import numpy as np
+
+from src.utils.matrix import DayMatrix
+from src.utils.performance import percent_change, performance_since, since
+
+nan = np.nan
+
+
+class TestPerformanceSince(unittest.TestCase):
+    def setUp(self):
+        # Day 10..15; 'late' has no value on the anchor day, 'gappy' skips a day, 'empty' never trades
+        self.matrix = DayMatrix(np.arange(10, 16), ['steady', 'late', 'gappy', 'empty'], np.array([
+            [50.0, nan, 10.0, nan],
+            [100.0, nan, 10.0, nan],
+            [110.0, nan, nan, nan],
+            [120.0, 20.0, 15.0, nan],
+            [90.0, 30.0, nan, nan],
+            [100.0, 10.0, 5.0, nan],
+        ]))
+
+    def test_single_anchor(self):
+        result = since(self.matrix, 11)
+        np.testing.assert_array_equal(result.days, np.arange(11, 16))
+        np.testing.assert_allclose(result.column('steady'), [0, 10, 20, -10, 0])
+        np.testing.assert_allclose(result.column('late'), [0, 0, 0, 50, -50])
+        np.testing.assert_allclose(result.column('gappy'), [0, 0, 50, 50, -50])
+        self.assertTrue(np.isnan(result.column('empty')).all())
+
+    def test_several_anchors_at_once(self):
+        cube = performance_since(self.matrix, [10, 13])
+        self.assertEqual(cube.shape, (2, 6, 4))
+        np.testing.assert_allclose(cube[0, :, 0], [0, 100, 120, 140, 80, 100])
+        self.assertTrue(np.isnan(cube[1, :3]).all())
+        np.testing.assert_allclose(cube[1, 3:, 1], [0, 50, -50])
+
+    def test_percent_change(self):
+        np.testing.assert_allclose(percent_change([2.0, 0.0, nan], [3.0, 1.0, 1.0]), [50, nan, nan])
+
+
+if __name__ == '__main__':
+    unittest.main()
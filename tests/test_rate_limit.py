@@ -0,0 +1,51 @@
+import unittest
+
+from src.utils.rate_limit import TokenBucket
+
+
+class FakeClock:
+    """Monotonic clock that only moves when told to, or when something sleeps on it."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestTokenBucket(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        # One token per second, bursts of two
+        self.bucket = TokenBucket(60, burst=2, clock=self.clock, sleep=self.clock.sleep)
+
+    def test_burst_then_callers_queue_in_order(self):
+        self.assertEqual([self.bucket.reserve() for _ in range(5)], [0.0, 0.0, 1.0, 2.0, 3.0])
+        self.clock.now = 3.0
+        self.assertEqual(self.bucket.reserve(), 1.0)
+
+    def test_refill_is_capped_at_burst(self):
+        self.bucket.reserve()
+        self.bucket.reserve()
+        self.clock.now = 100.0
+        self.assertEqual([self.bucket.reserve() for _ in range(3)], [0.0, 0.0, 1.0])
+
+    def test_acquire_paces_requests_at_the_rate(self):
+        waits = [self.bucket.acquire() for _ in range(6)]
+        self.assertEqual(waits, [0.0, 0.0, 1.0, 1.0, 1.0, 1.0])
+        self.assertEqual(self.clock.now, 4.0)
+
+    def test_slow_down_drops_burst_and_recovers(self):
+        self.bucket.slow_down()
+        self.assertEqual(self.bucket.rate, 0.5)
+        self.assertEqual(self.bucket.reserve(), 2.0)
+        for _ in range(20):
+            self.bucket.recover()
+        self.assertEqual(self.bucket.rate, self.bucket.base_rate)
+
+
+if __name__ == '__main__':
+    unittest.main()
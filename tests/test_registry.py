@@ -0,0 +1,29 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.charts.registry import CHARTS, ChartSpec, select
+from src.utils.scheduler import run_charts
+
+
+class TestRegistry(unittest.TestCase):
+    def test_select_keeps_registry_order(self):
+        names = [chart.name for chart in select(['liberation_day_performance', 'crypto_performance'])]
+        self.assertEqual(names, ['crypto_performance', 'liberation_day_performance'])
+        self.assertEqual(select(), list(CHARTS))
+
+    def test_unknown_chart(self):
+        with self.assertRaises(ValueError):
+            select(['crypto_performance', 'no_such_chart'])
+
+    def test_broken_import_fails_alone(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            results = run_charts([ChartSpec('broken', 'src.charts.no_such_module')],
+                                 report_path=Path(tmp) / 'run_report.json')
+        self.assertEqual(len(results), 1)
+        self.assertFalse(results[0].ok)
+        self.assertTrue(results[0].error.startswith('load:'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+
+import requests
+
+from src.utils.rate_limit import TokenBucket
+from src.utils.retry import CircuitOpen, RetryableError, RetryPolicy, endpoint_key, parse_retry_after
+
+
+def rate_limited(retry_after=None):
+    return RetryableError("Rate limit exceeded", requests.exceptions.HTTPError("429"),
+                          retry_after=retry_after, rate_limited=True)
+
+
+class Flaky:
+    """Fails with the given errors, then returns 'ok'."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return 'ok'
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def setUp(self):
+        self.waits = []
+        self.limiter = TokenBucket(60000, burst=100)
+        self.policy = RetryPolicy(self.limiter, max_retries=3, backoff_base=1, backoff_max=30,
+                                  breaker_failures=2, budget=100, sleep=self.waits.append)
+
+    def test_follows_retry_after_and_slows_the_limiter(self):
+        send = Flaky(rate_limited(retry_after=7))
+        self.assertEqual(self.policy.call('coins/bitcoin/market_chart', send), 'ok')
+        self.assertEqual(send.calls, 2)
+        self.assertTrue(7 <= self.waits[0] <= 8)
+        self.assertLess(self.limiter.rate, self.limiter.base_rate)
+        stats = self.policy.stats['coins/{id}/market_chart']
+        self.assertEqual((stats.requests, stats.retries, stats.rate_limited, stats.failures), (2, 1, 1, 0))
+
+    def test_exponential_backoff_without_retry_after(self):
+        send = Flaky(rate_limited(), rate_limited(), rate_limited())
+        self.policy.call('coins/markets', send)
+        for attempt, wait in enumerate(self.waits):
+            self.assertTrue(2 ** attempt / 2 <= wait <= 2 ** attempt)
+
+    def test_gives_up_and_breaker_opens(self):
+        for _ in range(2):
+            with self.assertRaises(requests.exceptions.HTTPError):
+                self.policy.call('coins/markets', Flaky(*[rate_limited()] * 4))
+        with self.assertRaises(CircuitOpen):
+            self.policy.call('coins/markets', Flaky())
+        self.assertEqual(self.policy.stats['coins/markets'].failures, 2)
+
+    def test_wait_budget_opens_breaker(self):
+        self.policy.budget = 10
+        with self.assertRaises(CircuitOpen):
+            self.policy.call('coins/markets', Flaky(rate_limited(retry_after=20)))
+
+    def test_non_retryable_errors_are_not_retried(self):
+        send = Flaky(ValueError('bad'))
+        with self.assertRaises(ValueError):
+            self.policy.call('coins/markets', send)
+        self.assertEqual(send.calls, 1)
+
+
+class TestHelpers(unittest.TestCase):
+    def test_retry_after(self):
+        self.assertEqual(parse_retry_after('12'), 12.0)
+        self.assertAlmostEqual(parse_retry_after('Thu, 01 Jan 1970 00:01:00 GMT', now=0), 60.0)
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after('soon'))
+
+    def test_endpoint_key(self):
+        self.assertEqual(endpoint_key('coins/bitcoin/market_chart/range'), 'coins/{id}/market_chart/range')
+        self.assertEqual(endpoint_key('coins/markets'), 'coins/markets')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+import asyncio
+import functools
+import json
+import multiprocessing
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from benchmarks.fake_coingecko import FakeCoinGecko
+from src.charts.registry import ChartSpec
+from src.utils import scheduler
+from src.utils.coingecko_api import AsyncCoinGeckoClient, CoinGeckoAPI
+from src.utils.cube import build_cube
+from src.utils.http_cache import ResponseCache
+from src.utils.incremental import is_incremental, set_incremental
+from src.utils.markets import fetch_snapshot
+from src.utils.scheduler import DataNeed, fetch_all, fetch_needs, run_charts
+from src.utils.store import MarketChartStore
+
+LISTING = DataNeed.of("markets", limit=10)
+HISTORY = DataNeed.of("market_chart", limit=10, days=30)
+CLOSES = DataNeed.of("yfinance", symbols=("^GSPC",), start="2025-01-01")
+
+
+# Chart functions the render workers import from this module
+
+def no_needs():
+    return {}
+
+
+def listing_needs():
+    return {"markets": LISTING, "coins": HISTORY}
+
+
+def closes_needs():
+    return {"closes": CLOSES}
+
+
+def render_listing(data):
+    if len(data["coins"]) != 10:
+        raise RuntimeError(f"expected 10 coins, got {len(data['coins'])}")
+
+
+def render_requires_incremental(data):
+    if not is_incremental():
+        raise RuntimeError("incremental flag lost in the render worker")
+
+
+async def fail_fetch(client, needs, results, store):
+    raise RuntimeError("boom")
+
+
+class SchedulerTestCase(unittest.TestCase):
+    """Runs the scheduler against the local CoinGecko stand-in, with all files in a scratch directory."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name)
+        api = CoinGeckoAPI(calls_per_minute=1e6, cache=ResponseCache(self.root / 'http', offline=False))
+        self.adapter = FakeCoinGecko(n_coins=30)
+        api.session.mount('https://', self.adapter)
+        self.client = AsyncCoinGeckoClient(api)
+        self.store = MarketChartStore(self.root / 'store')
+        for target, value in (('get_client', lambda: self.client),
+                              ('MarketChartStore', lambda: self.store),
+                              ('fetch_snapshot', functools.partial(fetch_snapshot, path=self.root / 'markets.npz')),
+                              ('build_cube', functools.partial(build_cube, root=self.root / 'cube')),
+                              ('sync_index_page', lambda: False)):
+            patcher = mock.patch.object(scheduler, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def fetch(self, needs):
+        return asyncio.run(fetch_all(needs, self.client, self.store))
+
+
+class TestFetchAll(SchedulerTestCase):
+    def test_identical_needs_are_fetched_once(self):
+        # Two charts asking for the same listing and history
+        results, errors = self.fetch([LISTING, HISTORY, LISTING, HISTORY])
+        self.assertEqual(errors, {})
+        self.assertEqual(self.adapter.stats['requests'], 1 + 10)
+        self.assertEqual(results[HISTORY], results[LISTING].ids)
+
+    def test_listing_dependency_is_added_and_fetched_first(self):
+        results, errors = self.fetch([HISTORY])
+        self.assertEqual(errors, {})
+        self.assertIn(LISTING, results)
+        self.assertEqual(len(results[HISTORY]), 10)
+        self.assertEqual(len(self.store.load(results[HISTORY][0])[0]), 31)
+
+    def test_failed_kind_fails_its_needs_and_dependents_only(self):
+        with mock.patch.dict(scheduler.FETCHERS, {"yfinance": (fail_fetch, ())}):
+            results, errors = self.fetch([HISTORY, CLOSES])
+        self.assertEqual(errors, {CLOSES: "yfinance: boom"})
+        self.assertEqual(len(results[HISTORY]), 10)
+
+        with mock.patch.dict(scheduler.FETCHERS, {"markets": (fail_fetch, ())}):
+            results, errors = self.fetch([HISTORY])
+        self.assertEqual(errors[LISTING], "markets: boom")
+        self.assertIn("coins/markets listing unavailable", errors[HISTORY])
+
+    def test_fetch_needs_keys_results_like_the_needs(self):
+        data = fetch_needs({"markets": LISTING, "coins": HISTORY})
+        self.assertEqual(data["coins"], data["markets"].ids)
+        with mock.patch.dict(scheduler.FETCHERS, {"yfinance": (fail_fetch, ())}):
+            with self.assertRaisesRegex(RuntimeError, "yfinance: boom"):
+                fetch_needs({"closes": CLOSES})
+
+
+class TestRunCharts(SchedulerTestCase):
+    def test_failing_fetch_fails_only_its_chart(self):
+        charts = [ChartSpec('listing', __name__, needs='listing_needs', render='render_listing'),
+                  ChartSpec('closes', __name__, needs='closes_needs', render='render_listing')]
+        report_path = self.root / 'run_report.json'
+        with mock.patch.dict(scheduler.FETCHERS, {"yfinance": (fail_fetch, ())}):
+            results = run_charts(charts, report_path=report_path)
+        self.assertEqual([(result.name, result.ok) for result in results], [('listing', True), ('closes', False)])
+        self.assertEqual(results[1].error, "yfinance: boom")
+
+        report = json.loads(report_path.read_text())
+        self.assertEqual([chart['name'] for chart in report['charts']], ['listing', 'closes'])
+        self.assertIn('fetch', report['fetch'])
+        self.assertEqual(report['api']['coins/{id}/market_chart']['requests'], 10)
+        self.assertIsNone(report['circuit_open'])
+
+    def test_incremental_flag_reaches_spawned_workers(self):
+        set_incremental(True)
+        self.addCleanup(set_incremental, False)
+        chart = ChartSpec('flags', __name__, needs='no_needs', render='render_requires_incremental')
+        results = run_charts([chart], report_path=self.root / 'run_report.json',
+                             mp_context=multiprocessing.get_context('spawn'))
+        self.assertTrue(results[0].ok, results[0].error)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import tempfile
+import unittest
+
+import numpy as np
+
+from src.utils.store import MS_PER_DAY, AnchorPriceTable, MarketChartStore, lookup_prices, today_index
+
+
+def _payload(days, price_offset=0.0):
+    return {
+        "prices": [[d * MS_PER_DAY, 100.0 + d + price_offset] for d in days],
+        "market_caps": [[d * MS_PER_DAY, 1e9 + d] for d in days],
+    }
+
+
+class TestMarketChartStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = MarketChartStore(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_empty_store_fetches_full_range(self):
+        self.assertEqual(self.store.days_to_fetch("bitcoin", 365), 365)
+        self.assertIsNone(self.store.last_day("bitcoin"))
+
+    def test_incremental_fetch_after_merge(self):
+        today = today_index()
+        self.store.merge("bitcoin", _payload(range(today - 365, today - 1)))
+        self.assertEqual(self.store.days_to_fetch("bitcoin", 365), 2)
+        self.store.merge("bitcoin", _payload(range(today - 2, today + 1)))
+        self.assertEqual(self.store.days_to_fetch("bitcoin", 365), 1)
+        self.assertEqual(self.store.last_day("bitcoin"), today)
+
+    def test_history_from_first_available_day_is_complete(self):
+        today = today_index()
+        self.store.merge("newcoin", _payload(range(today - 30, today)))
+        self.assertEqual(self.store.days_to_fetch("newcoin", 365), 365)
+        self.store.set_history_starts({"newcoin": today - 30})
+        self.assertEqual(self.store.days_to_fetch("newcoin", 365), 1)
+        self.assertEqual(MarketChartStore(self.tmp.name).history_start("newcoin"), today - 30)
+
+    def test_newer_points_win_and_missing_series_are_kept(self):
+        today = today_index()
+        self.store.merge("bitcoin", _payload([today - 1, today]))
+        # A partial intraday point for today replaces the stored one
+        self.store.merge("bitcoin", {"prices": [[today * MS_PER_DAY + 3_600_000, 5.0]]})
+        days, values = self.store.load("bitcoin")
+        np.testing.assert_array_equal(days, [today - 1, today])
+        self.assertEqual(values[-1, 0], 5.0)
+        self.assertEqual(values[-1, 1], 1e9 + today)
+        self.assertTrue(np.isnan(values[-1, 2]))
+
+    def test_pairs_returns_window(self):
+        today = today_index()
+        self.store.merge("bitcoin", _payload(range(today - 10, today + 1)))
+        pairs = self.store.pairs("bitcoin", 3, "market_caps")
+        self.assertEqual(len(pairs), 4)
+        self.assertEqual(pairs[0], [(today - 3) * MS_PER_DAY, 1e9 + today - 3])
+
+    def test_values_on_missing_days_are_nan(self):
+        today = today_index()
+        self.store.merge("bitcoin", _payload([today - 5, today - 3]))
+        values = self.store.values_on("bitcoin", [today - 5, today - 4, today - 3])
+        self.assertEqual(values[0], 100.0 + today - 5)
+        self.assertTrue(np.isnan(values[1]))
+        self.assertEqual(values[2], 100.0 + today - 3)
+
+
+class TestLookupPrices(unittest.TestCase):
+    def test_nearest_point_within_tolerance(self):
+        hour = 3_600_000
+        pairs = [[10 * MS_PER_DAY - hour, 1.0], [10 * MS_PER_DAY + 2 * hour, 2.0], [12 * MS_PER_DAY, 3.0]]
+        values = lookup_prices(pairs, [10 * MS_PER_DAY, 12 * MS_PER_DAY, 20 * MS_PER_DAY])
+        self.assertEqual(values[0], 1.0)
+        self.assertEqual(values[1], 3.0)
+        self.assertTrue(np.isnan(values[2]))
+
+
+class TestAnchorPriceTable(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.table = AnchorPriceTable(f"{self.tmp.name}/anchors.npz")
+
+    def test_lookup_marks_unknown_and_missing(self):
+        self.table.update(["bitcoin", "newcoin"], [100], np.array([[50.0], [np.nan]]))
+        self.table.update(["ethereum"], [100, 200], np.array([[3.0, 4.0]]))
+        values, known = self.table.lookup(["ethereum", "bitcoin", "newcoin", "solana"], [100, 200])
+        np.testing.assert_array_equal(values[:2], [[3.0, 4.0], [50.0, np.nan]])
+        self.assertEqual(known.tolist(), [[True, True], [True, False], [True, False], [False, False]])
+        self.assertTrue(np.isnan(values[2:]).all())
+
+    def test_empty_table(self):
+        values, known = self.table.lookup(["bitcoin"], [100])
+        self.assertTrue(np.isnan(values).all())
+        self.assertFalse(known.any())
+
+
+if __name__ == '__main__':
+    unittest.main()
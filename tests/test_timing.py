@@ -0,0 +1,47 @@
+import unittest
+
+from src.utils.timing import count, current_rss_mb, stage, stage_metrics, stage_timings
+
+
+class TestStages(unittest.TestCase):
+    def setUp(self):
+        stage_metrics()
+
+    def test_stage_records_counter_deltas(self):
+        count('http_requests', 5)
+        with stage('fetch'):
+            count('http_requests')
+            count('http_bytes', 1024)
+            count('rate_limit_wait', 0.5)
+        with stage('fetch'):
+            count('http_requests')
+        metrics = stage_metrics()['fetch']
+        self.assertEqual(metrics['calls'], 2)
+        self.assertEqual(metrics['http_requests'], 2)
+        self.assertEqual(metrics['http_bytes'], 1024)
+        self.assertEqual(metrics['rate_limit_wait'], 0.5)
+        self.assertEqual(metrics['retry_wait'], 0)
+        self.assertGreaterEqual(metrics['seconds'], 0)
+
+    @unittest.skipUnless(current_rss_mb() is not None, "needs /proc/self/statm")
+    def test_memory_growth_is_per_stage(self):
+        with stage('load'):
+            block = bytearray(64 * 2 ** 20)
+            block[::4096] = b'x' * len(block[::4096])
+        with stage('render'):
+            pass
+        metrics = stage_metrics()
+        self.assertGreater(metrics['load']['rss_growth_mb'], 32)
+        self.assertLess(metrics['render']['rss_growth_mb'], 32)
+        self.assertNotIn('peak_rss_mb', metrics['render'])
+        del block
+
+    def test_reset(self):
+        with stage('render'):
+            pass
+        self.assertIn('render', stage_timings())
+        self.assertEqual(stage_timings(), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from src.utils import yahoo
+from src.utils.store import MS_PER_DAY, MarketChartStore, today_index
+
+
+def closes_frame(symbols, start):
+    index = pd.date_range(start, pd.Timestamp.now().normalize(), freq='B')
+    return pd.DataFrame({s: np.arange(len(index), dtype=float) + i for i, s in enumerate(symbols)}, index=index)
+
+
+class TestCloses(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.store = MarketChartStore(tmp.name)
+        self.start = str(np.datetime64(today_index() - 30, 'D'))
+
+    def test_one_download_for_all_symbols(self):
+        with mock.patch.object(yahoo, '_download_closes', side_effect=closes_frame) as download:
+            self.assertEqual(yahoo.update_closes(self.store, ['^GSPC', 'GLD'], self.start), 1)
+        download.assert_called_once_with(['^GSPC', 'GLD'], self.start)
+
+    def test_top_up_starts_at_last_stored_day(self):
+        day = today_index() - 3
+        self.store.merge_arrays('^GSPC', {'prices': (np.arange(today_index() - 30, day + 1) * MS_PER_DAY,
+                                                      np.ones(31 - 3))})
+        self.assertEqual(yahoo.fetch_start_day(self.store, ['^GSPC'], today_index() - 30), day)
+        # A new symbol needs the full range
+        self.assertEqual(yahoo.fetch_start_day(self.store, ['^GSPC', 'TLT'], today_index() - 30),
+                         today_index() - 30)
+
+    def test_start_on_a_weekend_is_not_downloaded_again(self):
+        today = pd.Timestamp(np.datetime64(today_index(), 'D'))
+        saturday = today - pd.Timedelta(days=14 + (today.dayofweek - 5) % 7)
+
+        def closes_through_today(symbols, start):
+            # Business days, plus today's (partial) close even on a weekend
+            frame = closes_frame(symbols, start)
+            return frame.reindex(frame.index.union([today]), method='ffill')
+
+        with mock.patch.object(yahoo, '_download_closes', side_effect=closes_through_today) as download:
+            yahoo.update_closes(self.store, ['^GSPC'], saturday.strftime('%Y-%m-%d'))
+            self.assertEqual(int(self.store.load('^GSPC')[0][0]), today_index() - (today - saturday).days + 2)
+            self.assertEqual(yahoo.update_closes(self.store, ['^GSPC'], saturday.strftime('%Y-%m-%d')), 0)
+        download.assert_called_once()
+
+    def test_matrix_is_aligned_to_calendar_days(self):
+        with mock.patch.object(yahoo, '_download_closes', side_effect=closes_frame):
+            yahoo.update_closes(self.store, ['^GSPC', 'GLD'], self.start)
+        closes = yahoo.closes_matrix(self.store, ['GLD', '^GSPC'], self.start)
+        self.assertEqual(closes.columns, ['GLD', '^GSPC'])
+        self.assertEqual(len(closes.days), 31)
+        weekends = pd.DatetimeIndex(closes.dates).dayofweek >= 5
+        self.assertTrue(np.isnan(closes.values[weekends]).all())
+        np.testing.assert_array_equal(closes.column('GLD')[~weekends] - closes.column('^GSPC')[~weekends], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()